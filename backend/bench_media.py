@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Media Upload Benchmark
+Compares derivate generation inline on the event loop (previous behaviour)
+with the process pool, while simulated public requests run concurrently.
+
+Measures per-upload wall time and latency (p50/p99/max) of the simulated
+public requests. GridFS writes are excluded so no database is needed.
+
+Usage (from backend/):
+    python bench_media.py [--uploads 6] [--width 3000] [--height 2000]
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from cms_imaging import ImagePool
+
+DERIVATE_SIZES = [320, 960, 1920]
+REQUEST_INTERVAL = 0.005  # one simulated public request every 5ms
+
+
+def make_test_image(width: int, height: int) -> bytes:
+    """Noisy RGB JPEG, roughly as expensive to encode as a photo"""
+    channels = [Image.effect_noise((width, height), 60 + 20 * i) for i in range(3)]
+    img = Image.merge("RGB", channels)
+    output = BytesIO()
+    img.save(output, format="JPEG", quality=90)
+    return output.getvalue()
+
+
+def encode_inline(img: Image.Image, max_width: int) -> bytes:
+    """The derivate encoder before the process pool (kept here as the baseline, production no longer uses it)"""
+    # Full-size LANCZOS from the original for every width, no draft decode, no reducing gap
+    resized = img.resize((max_width, int(img.height * max_width / img.width)), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    resized.save(output, format="WEBP", quality=80, method=6)
+    return output.getvalue()
+
+
+async def upload_inline(data: bytes):
+    """Previous behaviour: one full decode, then every size encoded synchronously inside the coroutine"""
+    img = Image.open(BytesIO(data))
+    img.load()
+    for size in DERIVATE_SIZES:
+        encode_inline(img, size)
+
+
+async def upload_pool(pool: ImagePool, data: bytes):
+    await pool.create_derivates(data, DERIVATE_SIZES, "JPEG")
+
+
+def public_traffic(loop: asyncio.AbstractEventLoop, stop, latencies: list):
+    """
+    Thread that submits small handlers to the loop at a fixed rate
+    Arrival time is taken outside the loop, so a blocked loop shows up as latency
+    """
+    async def handler(arrived: float):
+        await asyncio.sleep(0)
+        latencies.append(time.perf_counter() - arrived)
+
+    while not stop.is_set():
+        arrived = time.perf_counter()
+        loop.call_soon_threadsafe(lambda a=arrived: loop.create_task(handler(a)))
+        time.sleep(REQUEST_INTERVAL)
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(name: str, upload, data: bytes, uploads: int) -> dict:
+    latencies = []
+    stop = threading.Event()
+    traffic = threading.Thread(target=public_traffic, args=(asyncio.get_running_loop(), stop, latencies))
+    traffic.start()
+
+    durations = []
+    for _ in range(uploads):
+        await asyncio.sleep(REQUEST_INTERVAL * 4)
+        started = time.perf_counter()
+        await upload(data)
+        durations.append(time.perf_counter() - started)
+
+    stop.set()
+    traffic.join()
+    # Let handlers submitted last complete
+    await asyncio.sleep(REQUEST_INTERVAL * 4)
+    return {
+        "mode": name,
+        "upload_mean": statistics.mean(durations),
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+        "requests": len(latencies),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark derivate generation")
+    parser.add_argument("--uploads", type=int, default=6)
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    data = make_test_image(args.width, args.height)
+    print(f"Test image: {args.width}x{args.height} JPEG, {len(data) / 1024:.0f} KB, {args.uploads} uploads")
+
+    pool = ImagePool(max_workers=args.workers)
+    # Warm up worker processes so spawn time is not counted
+    await pool.create_derivates(data, DERIVATE_SIZES, "JPEG")
+
+    results = [
+        await run_mode("inline", upload_inline, data, args.uploads),
+        await run_mode("pool", lambda d: upload_pool(pool, d), data, args.uploads),
+    ]
+    pool.shutdown()
+
+    print(f"{'mode':<8} {'upload (s)':>11} {'req p50 (ms)':>13} {'req p99 (ms)':>13} {'req max (ms)':>13} {'requests':>9}")
+    for r in results:
+        print(
+            f"{r['mode']:<8} {r['upload_mean']:>11.3f} {r['p50'] * 1000:>13.1f} "
+            f"{r['p99'] * 1000:>13.1f} {r['max'] * 1000:>13.1f} {r['requests']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,26 +4,125 @@ Handles user management, password hashing, and sessions
 """
 from passlib.context import CryptContext
 from datetime import datetime, timezone, timedelta
-from typing import Optional
+from typing import Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import secrets
+import time
 import uuid
 import logging
 
+from cms_cache import TTLCache
+from cms_sessions import SessionStore, MongoSessionStore, as_utc
+
 logger = logging.getLogger(__name__)
 
 # Password hashing with argon2id
 pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 
 
+class PasswordPoolBusy(Exception):
+    """No hashing worker became free within the queue timeout"""
+
+
+class PasswordHashPool:
+    """
+    Bounded worker pool for argon2 hashing/verification
+    argon2-cffi releases the GIL, so threads keep the event loop responsive;
+    requests waiting longer than max_queue_wait are rejected with PasswordPoolBusy
+    """
+    
+    def __init__(self, max_workers: int = 2, max_queue_wait: float = 5.0):
+        self.max_workers = max_workers
+        self.max_queue_wait = max_queue_wait
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="argon2")
+        self._slots = asyncio.Semaphore(max_workers)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self._busy_seconds = 0.0
+    
+    async def run(self, func, *args):
+        """Run func(*args) on a worker thread once a slot is free"""
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.max_queue_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise PasswordPoolBusy("Password hashing pool saturated")
+        finally:
+            self.waiting -= 1
+        
+        self.active += 1
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._finished(started)
+            raise
+        # The slot follows the thread, not the request: a cancelled request (client gone, timeout)
+        # must not free it while argon2 is still running, or more hashes run than there are workers
+        future.add_done_callback(lambda _: self._call_soon(loop, self._finished, started))
+        return await asyncio.wrap_future(future)
+    
+    @staticmethod
+    def _call_soon(loop, callback, *args):
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # Event loop already closed (shutdown)
+            pass
+    
+    def _finished(self, started: float):
+        self._busy_seconds += time.monotonic() - started
+        self.completed += 1
+        self.active -= 1
+        self._slots.release()
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+    
+    def stats(self) -> Dict:
+        """Pool saturation counters for monitoring"""
+        return {
+            "workers": self.max_workers,
+            "active": self.active,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avgSeconds": round(self._busy_seconds / self.completed, 4) if self.completed else 0.0
+        }
+
+
 class CMSAuth:
     """
     Admin authentication and session management
     """
     
-    def __init__(self, db):
+    def __init__(
+        self,
+        db,
+        hash_pool: Optional[PasswordHashPool] = None,
+        session_store: Optional[SessionStore] = None,
+        session_cache_ttl: float = 30.0,
+        activity_flush_interval: float = 60.0
+    ):
         self.db = db
+        self.hash_pool = hash_pool or PasswordHashPool()
+        self.sessions = session_store or MongoSessionStore(db)
         self.session_timeout = 30  # minutes
         self.session_extended = 12 * 60  # 12 hours for "remember me"
+        
+        # Short-lived caches so parallel admin calls don't each hit MongoDB
+        self.session_cache = TTLCache(max_entries=1024, ttl=session_cache_ttl)
+        self.user_cache = TTLCache(max_entries=256, ttl=session_cache_ttl)
+        
+        # lastActivity updates are coalesced and written in batches
+        self.activity_flush_interval = activity_flush_interval
+        self._pending_activity: Dict[str, str] = {}
+        self._last_flush = time.monotonic()
     
     async def seed_admin_users(self):
         """
@@ -60,7 +159,7 @@ class CMSAuth:
         ]
         
         # Hash initial password: Com_2024!
-        initial_password_hash = pwd_context.hash("Com_2024!")
+        initial_password_hash = await self.hash_password("Com_2024!")
         
         for admin in initial_admins:
             admin["passwordHash"] = initial_password_hash
@@ -68,13 +167,13 @@ class CMSAuth:
         
         logger.info(f"✅ Seeded {len(initial_admins)} admin users")
     
-    def hash_password(self, password: str) -> str:
-        """Hash password with argon2id"""
-        return pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        """Hash password with argon2id (on the hashing pool)"""
+        return await self.hash_pool.run(pwd_context.hash, password)
     
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Verify password against hash"""
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify password against hash (on the hashing pool)"""
+        return await self.hash_pool.run(pwd_context.verify, plain_password, hashed_password)
     
     async def authenticate_user(self, email: str, password: str) -> Optional[dict]:
         """
@@ -86,7 +185,7 @@ class CMSAuth:
             logger.warning(f"Login attempt for non-existent user: {email}")
             return None
         
-        if not self.verify_password(password, user["passwordHash"]):
+        if not await self.verify_password(password, user["passwordHash"]):
             logger.warning(f"Failed login attempt for user: {email}")
             return None
         
@@ -95,6 +194,7 @@ class CMSAuth:
             {"_id": user["_id"]},
             {"$set": {"lastLogin": datetime.now(timezone.utc).isoformat()}}
         )
+        self.user_cache.pop(user["_id"])
         
         logger.info(f"✅ User authenticated: {email}")
         
@@ -117,14 +217,15 @@ class CMSAuth:
         timeout_minutes = self.session_extended if remember_me else self.session_timeout
         expires_at = datetime.now(timezone.utc) + timedelta(minutes=timeout_minutes)
         
-        await self.db.cms_sessions.insert_one({
+        await self.sessions.create({
             "_id": session_id,
             "userId": user_id,
             "email": email,
             "ipAddress": ip_address,
             "userAgent": user_agent,
             "createdAt": datetime.now(timezone.utc).isoformat(),
-            "expiresAt": expires_at.isoformat(),
+            # Datetime so stores can expire the session natively
+            "expiresAt": expires_at,
             "lastActivity": datetime.now(timezone.utc).isoformat()
         })
         
@@ -135,38 +236,64 @@ class CMSAuth:
         """
         Get session by ID
         Returns session dict or None if expired/invalid
+        Served from a short-lived cache; lastActivity is written in batches
         """
-        session = await self.db.cms_sessions.find_one({"_id": session_id})
-        if not session:
-            return None
-        
-        # Check expiration
-        expires_at = datetime.fromisoformat(session["expiresAt"])
-        if expires_at < datetime.now(timezone.utc):
-            # Session expired, delete it
-            await self.db.cms_sessions.delete_one({"_id": session_id})
+        now = datetime.now(timezone.utc)
+        session = self.session_cache.get(session_id)
+        if session is None:
+            session = await self.sessions.get(session_id)
+            if not session:
+                return None
+            self.session_cache.set(session_id, session)
+        elif as_utc(session["expiresAt"]) <= now:
+            self._evict_session(session_id)
             logger.info(f"Session expired: {session_id}")
             return None
         
-        # Update last activity
-        await self.db.cms_sessions.update_one(
-            {"_id": session_id},
-            {"$set": {"lastActivity": datetime.now(timezone.utc).isoformat()}}
-        )
+        # Record last activity (flushed at most once per interval)
+        self._pending_activity[session_id] = datetime.now(timezone.utc).isoformat()
+        if time.monotonic() - self._last_flush >= self.activity_flush_interval:
+            await self.flush_session_activity()
+        
+        return dict(session)
+    
+    async def flush_session_activity(self) -> int:
+        """Write coalesced lastActivity updates in one batch"""
+        pending, self._pending_activity = self._pending_activity, {}
+        self._last_flush = time.monotonic()
+        if not pending:
+            return 0
         
-        return session
+        try:
+            await self.sessions.touch_many(pending)
+        except Exception as e:
+            logger.error(f"Error flushing session activity: {e}")
+        return len(pending)
+    
+    def _evict_session(self, session_id: str):
+        self.session_cache.pop(session_id)
+        self._pending_activity.pop(session_id, None)
+    
+    def _evict_user_sessions(self, user_id: str):
+        for session_id, session in self.session_cache.values():
+            if session.get("userId") == user_id:
+                self._evict_session(session_id)
     
     async def delete_session(self, session_id: str) -> bool:
         """Delete session (logout)"""
-        result = await self.db.cms_sessions.delete_one({"_id": session_id})
-        return result.deleted_count > 0
+        self._evict_session(session_id)
+        return await self.sessions.delete(session_id)
     
     async def get_user(self, user_id: str) -> Optional[dict]:
         """Get user by ID (without password hash)"""
-        user = await self.db.cms_users.find_one({"_id": user_id})
-        if user:
+        user = self.user_cache.get(user_id)
+        if user is None:
+            user = await self.db.cms_users.find_one({"_id": user_id})
+            if not user:
+                return None
             user.pop("passwordHash", None)
-        return user
+            self.user_cache.set(user_id, user)
+        return dict(user)
     
     async def reset_password(self, user_id: str, old_password: str, new_password: str) -> bool:
         """
@@ -177,12 +304,12 @@ class CMSAuth:
             return False
         
         # Verify old password
-        if not self.verify_password(old_password, user["passwordHash"]):
+        if not await self.verify_password(old_password, user["passwordHash"]):
             logger.warning(f"Invalid old password for user: {user['email']}")
             return False
         
         # Update password and remove mustResetPassword flag
-        new_hash = self.hash_password(new_password)
+        new_hash = await self.hash_password(new_password)
         await self.db.cms_users.update_one(
             {"_id": user_id},
             {
@@ -194,12 +321,23 @@ class CMSAuth:
             }
         )
         
+        self.user_cache.pop(user_id)
+        self._evict_user_sessions(user_id)
+        
         logger.info(f"✅ Password reset for user: {user['email']}")
         return True
     
     async def cleanup_expired_sessions(self):
         """Delete all expired sessions (maintenance task)"""
-        now = datetime.now(timezone.utc).isoformat()
-        result = await self.db.cms_sessions.delete_many({"expiresAt": {"$lt": now}})
-        if result.deleted_count > 0:
-            logger.info(f"Cleaned up {result.deleted_count} expired sessions")
+        deleted = await self.sessions.cleanup_expired()
+        if deleted > 0:
+            logger.info(f"Cleaned up {deleted} expired sessions")
+    
+    def stats(self) -> Dict:
+        """Session/user cache counters for monitoring"""
+        return {
+            "sessionCache": self.session_cache.stats(),
+            "userCache": self.user_cache.stats(),
+            "passwordPool": self.hash_pool.stats(),
+            "pendingActivityWrites": len(self._pending_activity)
+        }
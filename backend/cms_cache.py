@@ -0,0 +1,276 @@
+"""
+CMS Cache Module
+In-process caches for hot read paths (public content, sessions)
+"""
+from collections import OrderedDict
+from pymongo import ReturnDocument
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+import asyncio
+import hashlib
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Bounded LRU cache with per-entry time-to-live
+    Not thread-safe - meant to be used from the event loop only
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return cached value or None if missing/expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store value, evicting the least recently used entry if full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove a single entry, returning its value"""
+        entry = self._entries.pop(key, None)
+        return entry[0] if entry else None
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove all entries whose key matches predicate"""
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        """Remove all entries"""
+        self._entries.clear()
+
+    def values(self):
+        """Iterate over (key, value) of all non-expired entries"""
+        now = time.monotonic()
+        return [(key, value) for key, (value, expires_at) in self._entries.items() if expires_at >= now]
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "ttlSeconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent loads of the same key into one call
+    All waiters receive the result (or exception) of the first caller
+    If the first caller is cancelled, its waiters retry (one of them becomes the new leader)
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only a cancelled leader is retried; a cancellation of this waiter propagates
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+
+class ContentEntry:
+    """
+    Cached content plus a strong validator derived from the content itself
+    Identical content yields the same ETag on every worker and after restarts
+    """
+
+    __slots__ = ("data", "etag")
+
+    def __init__(self, data: Any, etag: str):
+        self.data = data
+        self.etag = etag
+
+    @classmethod
+    def build(cls, collection: str, data: Any) -> "ContentEntry":
+        encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+        digest = hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:20]
+        return cls(data, f'"{collection}-{digest}"')
+
+    @classmethod
+    def combine(cls, name: str, data: Any, entries: list) -> "ContentEntry":
+        """Build an entry for aggregated data from the validators of its parts"""
+        joined = "|".join(entry.etag for entry in entries)
+        digest = hashlib.sha1(f"{name}|{joined}".encode("utf-8")).hexdigest()[:20]
+        return cls(data, f'"{name}-{digest}"')
+
+
+class ContentCache:
+    """
+    Read-through cache for public CMS content
+    Keyed by (collection, locale); locale is None for language-neutral collections
+    Values are stored as ContentEntry so conditional requests need no database access
+    With a db, invalidations reach all workers (uvicorn --workers, several instances):
+    each one bumps a per-collection counter in cms_cache_generations, which every worker
+    compares at most once per sync_interval before serving from its cache
+    Without a db invalidations only apply to the current process (single worker only)
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300.0, db=None, sync_interval: float = 1.0):
+        self._cache = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._flight = SingleFlight()
+        # Bumped on invalidation so loads started before a write are not cached
+        self._generation: Dict[str, int] = {}
+        self._epoch = 0
+        self.db = db
+        self.sync_interval = sync_interval
+        # Shared counters as last read from the database (None until the first sync)
+        self._shared: Optional[Dict[str, int]] = None
+        self._synced_at = float("-inf")
+        self.remote_invalidations = 0
+
+    async def get_or_load(
+        self,
+        collection: str,
+        locale: Optional[str],
+        loader: Callable[[], Awaitable[Any]]
+    ) -> ContentEntry:
+        """Return cached entry or load it once for all concurrent callers"""
+        key = (collection, locale)
+        if self.db is not None:
+            await self._sync()
+        entry = self._cache.get(key)
+        if entry is not None:
+            return entry
+
+        generation = self._current_generation(collection)
+
+        async def load():
+            entry = ContentEntry.build(collection, await loader())
+            if self._current_generation(collection) == generation:
+                self._cache.set(key, entry)
+            return entry
+
+        return await self._flight.do((key, generation), load)
+
+    def _current_generation(self, collection: str) -> tuple:
+        return (self._epoch, self._generation.get(collection, 0))
+
+    async def invalidate(self, collection: str, locale: Optional[str] = None):
+        """
+        Drop cached entries of a collection (all locales if locale is None)
+        Other workers drop all locales of the collection on their next sync
+        """
+        self._invalidate_local(collection, locale)
+        if self.db is None:
+            return
+        try:
+            doc = await self.db.cms_cache_generations.find_one_and_update(
+                {"_id": collection},
+                {"$inc": {"generation": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            # Other workers serve the old content until their entries expire (ttl)
+            logger.error(f"Could not share content cache invalidation of {collection}: {e}")
+            return
+        if self._shared is not None and doc["generation"] == self._shared.get(collection, 0) + 1:
+            # Only our own bump: no need to drop the collection again on the next sync
+            self._shared[collection] = doc["generation"]
+
+    def _invalidate_local(self, collection: str, locale: Optional[str]):
+        self._generation[collection] = self._generation.get(collection, 0) + 1
+        removed = self._cache.invalidate(
+            lambda key: key[0] == collection and (locale is None or key[1] == locale)
+        )
+        if removed:
+            logger.debug(f"Content cache invalidated: {collection} ({removed} entries)")
+
+    async def _sync(self):
+        """Apply invalidations of other workers (one small query per sync_interval at most)"""
+        now = time.monotonic()
+        if now - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = now
+        try:
+            docs = await self.db.cms_cache_generations.find({}, {"generation": 1}).to_list(length=None)
+        except Exception as e:
+            logger.error(f"Content cache sync failed: {e}")
+            return
+        shared = {doc["_id"]: doc["generation"] for doc in docs}
+        if self._shared is None:
+            # Entries cached before the first successful sync may predate any invalidation
+            self.clear()
+        else:
+            for collection, generation in shared.items():
+                if self._shared.get(collection) != generation:
+                    self._invalidate_local(collection, None)
+                    self.remote_invalidations += 1
+        self._shared = shared
+
+    def clear(self):
+        """Drop all cached content"""
+        self._epoch += 1
+        self._cache.clear()
+
+    def stats(self) -> Dict:
+        return {
+            **self._cache.stats(),
+            "coalesced": self._flight.coalesced,
+            "shared": self.db is not None,
+            "remoteInvalidations": self.remote_invalidations
+        }
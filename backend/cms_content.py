@@ -4,8 +4,12 @@ Handles all content CRUD operations for pages, modules, FAQ, team, etc.
 """
 from typing import Optional, List, Dict
 from datetime import datetime, timezone
+from pymongo import UpdateOne
+import asyncio
 import logging
 
+from cms_cache import ContentCache, ContentEntry
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,39 +22,118 @@ class CMSContent:
     SUPPORTED_LOCALES = ['de-CH', 'fr-CH', 'it-CH']
     DEFAULT_LOCALE = 'de-CH'
     
-    def __init__(self, db):
+    # Bundle section name -> cached collection
+    BUNDLE_SECTIONS = {
+        "siteGlobal": "site_global",
+        "site": "site_localized",
+        "modules": "modules",
+        "faq": "faq",
+        "team": "team",
+        "events": "events",
+    }
+    
+    # Fields rendered by the public pages (everything else stays in the database)
+    PUBLIC_FIELDS = {
+        "modules": ["slug", "title", "format", "durationDays", "bullets", "order"],
+        "faq": ["question", "answer", "topic", "featured", "order"],
+        "team": ["name", "role", "bio", "image", "buttons", "order"],
+        "events": ["monthGroup", "items", "order"],
+    }
+    
+    def __init__(self, db, cache: Optional[ContentCache] = None):
         self.db = db
+        self.cache = cache or ContentCache()
+    
+    @classmethod
+    def _check_locale(cls, locale: str):
+        if locale not in cls.SUPPORTED_LOCALES:
+            raise ValueError(f"Unsupported locale: {locale}")
+    
+    @staticmethod
+    def _projection(fields: Optional[List[str]]) -> Optional[Dict]:
+        """Build a MongoDB projection from field names (None = full documents)"""
+        if not fields:
+            return None
+        paths = []
+        # Shortest first: MongoDB rejects a path together with its parent ("a" and "a.b" collide)
+        for field in sorted(set(fields), key=lambda f: (f.count("."), f)):
+            if not field or field.startswith("$") or "" in field.split("."):
+                continue
+            if any(field.startswith(f"{path}.") for path in paths):
+                continue
+            paths.append(field)
+        return {path: 1 for path in paths} or None
+    
+    @staticmethod
+    def _visible_flag(data: Dict) -> Dict:
+        """Store visible as a boolean: public queries match visible: True exactly"""
+        if "visible" not in data:
+            return data
+        return {**data, "visible": data["visible"] is not False}
+    
+    async def _reorder(self, collection: str, ids: List[str], locale: Optional[str] = None) -> int:
+        """
+        Set order = position in ids with a single bulk write
+        Only documents whose order actually changes are written; locale scopes the update
+        """
+        scope = {"locale": locale} if locale else {}
+        cursor = self.db[f"cms_{collection}"].find({"_id": {"$in": ids}, **scope}, {"order": 1})
+        current = {doc["_id"]: doc.get("order") async for doc in cursor}
+        
+        operations = [
+            UpdateOne({"_id": item_id, **scope}, {"$set": {"order": index}})
+            for index, item_id in enumerate(ids)
+            if item_id in current and current[item_id] != index
+        ]
+        if not operations:
+            return 0
+        
+        try:
+            result = await self.db[f"cms_{collection}"].bulk_write(operations, ordered=True)
+        finally:
+            # Also after a partial failure - some documents may have moved
+            await self.cache.invalidate(collection, locale)
+        logger.info(f"Reordered {collection}: {result.modified_count} of {len(ids)} documents moved")
+        return result.modified_count
     
     # ============================================
     # SITE GLOBAL (language-independent)
     # ============================================
     
+    @staticmethod
+    def _default_site_global() -> Dict:
+        return {
+            "_id": "global",
+            "colors": {
+                "primary": "#D81C1C",
+                "secondary": "#707070"
+            },
+            "contact": {
+                "email": "academy@maklerzentrum.ch",
+                "phone": "+41799486986"
+            },
+            "external": {
+                "loginUrl": "https://reteach.ch/login"
+            },
+            "preview": {
+                "showCmsLink": True
+            },
+            "seo": {
+                "ogImage": ""
+            }
+        }
+    
     async def get_site_global(self) -> Dict:
-        """Get global site settings"""
+        """Get global site settings (the default is stored on first access)"""
         doc = await self.db.cms_site_global.find_one({"_id": "global"})
         if not doc:
-            # Create default
-            doc = {
-                "_id": "global",
-                "colors": {
-                    "primary": "#D81C1C",
-                    "secondary": "#707070"
-                },
-                "contact": {
-                    "email": "academy@maklerzentrum.ch",
-                    "phone": "+41799486986"
-                },
-                "external": {
-                    "loginUrl": "https://reteach.ch/login"
-                },
-                "preview": {
-                    "showCmsLink": True
-                },
-                "seo": {
-                    "ogImage": ""
-                }
-            }
-            await self.db.cms_site_global.insert_one(doc)
+            doc = self._default_site_global()
+            await self.db.cms_site_global.update_one(
+                {"_id": "global"},
+                # Upsert instead of insert: concurrent first requests must not collide on _id
+                {"$setOnInsert": {k: v for k, v in doc.items() if k != "_id"}},
+                upsert=True
+            )
         
         return doc
     
@@ -62,6 +145,7 @@ class CMSContent:
                 {"$set": {**data, "updatedAt": datetime.now(timezone.utc).isoformat()}},
                 upsert=True
             )
+            await self.cache.invalidate("site_global")
             return True
         except Exception as e:
             logger.error(f"Error updating site global: {e}")
@@ -71,30 +155,33 @@ class CMSContent:
     # SITE LOCALIZED (per language)
     # ============================================
     
+    @staticmethod
+    def _default_site_localized(locale: str) -> Dict:
+        return {
+            "_id": locale,
+            "locale": locale,
+            "brandName": "Maklerzentrum Schweiz AG",
+            "seo": {
+                "defaultTitle": "VBV Ausbildung Schweiz",
+                "defaultDescription": "Professionelle VBV-Ausbildung",
+                "ogLocale": locale
+            },
+            "legal": {
+                "imprintHtml": "<p>Impressum</p>",
+                "privacyHtml": "<p>Datenschutz</p>",
+                "termsHtml": "<p>AGB</p>",
+                "cookieConsentText": "Wir verwenden Cookies"
+            }
+        }
+    
     async def get_site_localized(self, locale: str) -> Dict:
-        """Get localized site settings"""
+        """
+        Get localized site settings (read-only: defaults are not stored)
+        Raises ValueError for unsupported locales
+        """
+        self._check_locale(locale)
         doc = await self.db.cms_site_localized.find_one({"_id": locale})
-        if not doc:
-            # Create default
-            doc = {
-                "_id": locale,
-                "locale": locale,
-                "brandName": "Maklerzentrum Schweiz AG",
-                "seo": {
-                    "defaultTitle": "VBV Ausbildung Schweiz",
-                    "defaultDescription": "Professionelle VBV-Ausbildung",
-                    "ogLocale": locale
-                },
-                "legal": {
-                    "imprintHtml": "<p>Impressum</p>",
-                    "privacyHtml": "<p>Datenschutz</p>",
-                    "termsHtml": "<p>AGB</p>",
-                    "cookieConsentText": "Wir verwenden Cookies"
-                }
-            }
-            await self.db.cms_site_localized.insert_one(doc)
-        
-        return doc
+        return doc or self._default_site_localized(locale)
     
     async def update_site_localized(self, locale: str, data: Dict) -> bool:
         """Update localized site settings"""
@@ -104,6 +191,7 @@ class CMSContent:
                 {"$set": {**data, "locale": locale, "updatedAt": datetime.now(timezone.utc).isoformat()}},
                 upsert=True
             )
+            await self.cache.invalidate("site_localized", locale)
             return True
         except Exception as e:
             logger.error(f"Error updating site localized: {e}")
@@ -142,9 +230,9 @@ class CMSContent:
     # MODULES
     # ============================================
     
-    async def list_modules(self, locale: str) -> List[Dict]:
-        """List all modules for locale"""
-        cursor = self.db.cms_modules.find({"locale": locale}).sort("order", 1)
+    async def list_modules(self, locale: str, fields: Optional[List[str]] = None) -> List[Dict]:
+        """List all modules for locale (optionally only the given fields)"""
+        cursor = self.db.cms_modules.find({"locale": locale}, self._projection(fields)).sort("order", 1)
         return await cursor.to_list(length=100)
     
     async def get_module(self, module_id: str) -> Optional[Dict]:
@@ -166,12 +254,13 @@ class CMSContent:
                 "durationDays": data.get("durationDays", 1),
                 "bullets": data.get("bullets", []),
                 "order": data.get("order", 999),
-                "visible": data.get("visible", True),
+                "visible": data.get("visible", True) is not False,
                 "createdAt": datetime.now(timezone.utc).isoformat(),
                 "createdBy": user_email
             }
             
             await self.db.cms_modules.insert_one(doc)
+            await self.cache.invalidate("modules", locale)
             return module_id
         except Exception as e:
             logger.error(f"Error creating module: {e}")
@@ -184,12 +273,13 @@ class CMSContent:
                 {"_id": module_id},
                 {
                     "$set": {
-                        **data,
+                        **self._visible_flag(data),
                         "updatedAt": datetime.now(timezone.utc).isoformat(),
                         "updatedBy": user_email
                     }
                 }
             )
+            await self.cache.invalidate("modules")
             return True
         except Exception as e:
             logger.error(f"Error updating module: {e}")
@@ -199,31 +289,27 @@ class CMSContent:
         """Delete module"""
         try:
             result = await self.db.cms_modules.delete_one({"_id": module_id})
+            await self.cache.invalidate("modules")
             return result.deleted_count > 0
         except Exception as e:
             logger.error(f"Error deleting module: {e}")
             return False
     
-    async def reorder_modules(self, module_ids: List[str]) -> bool:
-        """Reorder modules"""
+    async def reorder_modules(self, module_ids: List[str], locale: Optional[str] = None) -> Optional[int]:
+        """Reorder modules, returns number of modified documents (None on error)"""
         try:
-            for index, module_id in enumerate(module_ids):
-                await self.db.cms_modules.update_one(
-                    {"_id": module_id},
-                    {"$set": {"order": index}}
-                )
-            return True
+            return await self._reorder("modules", module_ids, locale)
         except Exception as e:
             logger.error(f"Error reordering modules: {e}")
-            return False
+            return None
     
     # ============================================
     # FAQ
     # ============================================
     
-    async def list_faq(self, locale: str) -> List[Dict]:
-        """List all FAQ for locale"""
-        cursor = self.db.cms_faq.find({"locale": locale}).sort("order", 1)
+    async def list_faq(self, locale: str, fields: Optional[List[str]] = None) -> List[Dict]:
+        """List all FAQ for locale (optionally only the given fields)"""
+        cursor = self.db.cms_faq.find({"locale": locale}, self._projection(fields)).sort("order", 1)
         return await cursor.to_list(length=200)
     
     async def create_faq(self, locale: str, data: Dict, user_email: str) -> Optional[str]:
@@ -240,12 +326,13 @@ class CMSContent:
                 "topic": data.get("topic", "allgemein"),
                 "featured": data.get("featured", False),
                 "order": data.get("order", 999),
-                "visible": data.get("visible", True),
+                "visible": data.get("visible", True) is not False,
                 "createdAt": datetime.now(timezone.utc).isoformat(),
                 "createdBy": user_email
             }
             
             await self.db.cms_faq.insert_one(doc)
+            await self.cache.invalidate("faq", locale)
             return faq_id
         except Exception as e:
             logger.error(f"Error creating FAQ: {e}")
@@ -258,12 +345,13 @@ class CMSContent:
                 {"_id": faq_id},
                 {
                     "$set": {
-                        **data,
+                        **self._visible_flag(data),
                         "updatedAt": datetime.now(timezone.utc).isoformat(),
                         "updatedBy": user_email
                     }
                 }
             )
+            await self.cache.invalidate("faq")
             return True
         except Exception as e:
             logger.error(f"Error updating FAQ: {e}")
@@ -273,31 +361,27 @@ class CMSContent:
         """Delete FAQ"""
         try:
             result = await self.db.cms_faq.delete_one({"_id": faq_id})
+            await self.cache.invalidate("faq")
             return result.deleted_count > 0
         except Exception as e:
             logger.error(f"Error deleting FAQ: {e}")
             return False
     
-    async def reorder_faq(self, faq_ids: List[str]) -> bool:
-        """Reorder FAQ"""
+    async def reorder_faq(self, faq_ids: List[str], locale: Optional[str] = None) -> Optional[int]:
+        """Reorder FAQ, returns number of modified documents (None on error)"""
         try:
-            for index, faq_id in enumerate(faq_ids):
-                await self.db.cms_faq.update_one(
-                    {"_id": faq_id},
-                    {"$set": {"order": index}}
-                )
-            return True
+            return await self._reorder("faq", faq_ids, locale)
         except Exception as e:
             logger.error(f"Error reordering FAQ: {e}")
-            return False
+            return None
     
     # ============================================
     # EVENTS (Kurstermine)
     # ============================================
     
-    async def list_events(self) -> List[Dict]:
-        """List all events (language-neutral)"""
-        cursor = self.db.cms_events.find({}).sort("order", 1)
+    async def list_events(self, fields: Optional[List[str]] = None) -> List[Dict]:
+        """List all events (language-neutral, optionally only the given fields)"""
+        cursor = self.db.cms_events.find({}, self._projection(fields)).sort("order", 1)
         return await cursor.to_list(length=100)
     
     async def create_event(self, data: Dict, user_email: str) -> Optional[str]:
@@ -309,12 +393,13 @@ class CMSContent:
                 "monthGroup": data.get("monthGroup", ""),
                 "items": data.get("items", []),
                 "order": data.get("order", 999),
-                "visible": data.get("visible", True),
+                "visible": data.get("visible", True) is not False,
                 "createdAt": datetime.now(timezone.utc).isoformat(),
                 "createdBy": user_email
             }
             
             await self.db.cms_events.insert_one(doc)
+            await self.cache.invalidate("events")
             return event_id
         except Exception as e:
             logger.error(f"Error creating event: {e}")
@@ -324,31 +409,27 @@ class CMSContent:
         """Delete event"""
         try:
             result = await self.db.cms_events.delete_one({"_id": event_id})
+            await self.cache.invalidate("events")
             return result.deleted_count > 0
         except Exception as e:
             logger.error(f"Error deleting event: {e}")
             return False
     
-    async def reorder_events(self, event_ids: List[str]) -> bool:
-        """Reorder events"""
+    async def reorder_events(self, event_ids: List[str]) -> Optional[int]:
+        """Reorder events, returns number of modified documents (None on error)"""
         try:
-            for index, event_id in enumerate(event_ids):
-                await self.db.cms_events.update_one(
-                    {"_id": event_id},
-                    {"$set": {"order": index}}
-                )
-            return True
+            return await self._reorder("events", event_ids)
         except Exception as e:
             logger.error(f"Error reordering events: {e}")
-            return False
+            return None
 
     # ============================================
     # TEAM
     # ============================================
     
-    async def list_team(self, locale: str) -> List[Dict]:
-        """List all team members for locale"""
-        cursor = self.db.cms_team.find({"locale": locale}).sort("order", 1)
+    async def list_team(self, locale: str, fields: Optional[List[str]] = None) -> List[Dict]:
+        """List all team members for locale (optionally only the given fields)"""
+        cursor = self.db.cms_team.find({"locale": locale}, self._projection(fields)).sort("order", 1)
         return await cursor.to_list(length=100)
     
     async def create_team(self, locale: str, data: Dict, user_email: str) -> Optional[str]:
@@ -366,12 +447,13 @@ class CMSContent:
                 "image": data.get("image", ""),
                 "buttons": data.get("buttons", []),
                 "order": data.get("order", 999),
-                "visible": data.get("visible", True),
+                "visible": data.get("visible", True) is not False,
                 "createdAt": datetime.now(timezone.utc).isoformat(),
                 "createdBy": user_email
             }
             
             await self.db.cms_team.insert_one(doc)
+            await self.cache.invalidate("team", locale)
             return team_id
         except Exception as e:
             logger.error(f"Error creating team: {e}")
@@ -384,12 +466,13 @@ class CMSContent:
                 {"_id": team_id},
                 {
                     "$set": {
-                        **data,
+                        **self._visible_flag(data),
                         "updatedAt": datetime.now(timezone.utc).isoformat(),
                         "updatedBy": user_email
                     }
                 }
             )
+            await self.cache.invalidate("team")
             return True
         except Exception as e:
             logger.error(f"Error updating team: {e}")
@@ -399,20 +482,100 @@ class CMSContent:
         """Delete team member"""
         try:
             result = await self.db.cms_team.delete_one({"_id": team_id})
+            await self.cache.invalidate("team")
             return result.deleted_count > 0
         except Exception as e:
             logger.error(f"Error deleting team: {e}")
             return False
     
-    async def reorder_team(self, team_ids: List[str]) -> bool:
-        """Reorder team members"""
+    async def reorder_team(self, team_ids: List[str], locale: Optional[str] = None) -> Optional[int]:
+        """Reorder team members, returns number of modified documents (None on error)"""
         try:
-            for index, team_id in enumerate(team_ids):
-                await self.db.cms_team.update_one(
-                    {"_id": team_id},
-                    {"$set": {"order": index}}
-                )
-            return True
+            return await self._reorder("team", team_ids, locale)
         except Exception as e:
             logger.error(f"Error reordering team: {e}")
-            return False
+            return None
+
+    # ============================================
+    # PUBLIC (visible only, cached)
+    # ============================================
+    
+    async def _find_visible(self, collection: str, query: Dict, length: int) -> List[Dict]:
+        """Query visible documents with public projection, sorted by order"""
+        # Equality on visible uses the (locale, visible, order) indexes; migration 7 backfilled missing flags
+        cursor = self.db[f"cms_{collection}"].find(
+            {**query, "visible": True},
+            self._projection(self.PUBLIC_FIELDS[collection])
+        ).sort("order", 1)
+        return await cursor.to_list(length=length)
+    
+    async def _find_site_global(self) -> Dict:
+        """Global settings for public pages (read-only: never stores the default)"""
+        doc = await self.db.cms_site_global.find_one({"_id": "global"})
+        return doc or self._default_site_global()
+    
+    async def get_public(self, collection: str, locale: Optional[str] = None) -> ContentEntry:
+        """
+        Get visible content of a collection as cache entry (data + ETag)
+        collection: modules, faq, team, events, site_global or site_localized
+        (events and site_global ignore locale)
+        """
+        list_loaders = {
+            "modules": lambda: self._find_visible("modules", {"locale": locale}, 100),
+            "faq": lambda: self._find_visible("faq", {"locale": locale}, 200),
+            "team": lambda: self._find_visible("team", {"locale": locale}, 100),
+            "events": lambda: self._find_visible("events", {}, 100),
+        }
+        doc_loaders = {
+            "site_global": self._find_site_global,
+            "site_localized": lambda: self.get_site_localized(locale),
+        }
+        if collection in ("events", "site_global"):
+            locale = None
+        else:
+            # Checked before the cache: arbitrary path values must not create entries
+            self._check_locale(locale)
+        
+        if collection in list_loaders:
+            load = list_loaders[collection]
+        elif collection in doc_loaders:
+            async def load():
+                doc = await doc_loaders[collection]()
+                return {k: v for k, v in doc.items() if k != "_id"}
+        else:
+            raise ValueError(f"Unknown collection: {collection}")
+        
+        return await self.cache.get_or_load(collection, locale, load)
+    
+    async def get_public_bundle(self, locale: str, sections: Optional[List[str]] = None) -> ContentEntry:
+        """
+        Get several public sections in one payload, loaded concurrently
+        sections: keys of BUNDLE_SECTIONS (default: all)
+        """
+        self._check_locale(locale)
+        sections = sections or list(self.BUNDLE_SECTIONS)
+        unknown = [name for name in sections if name not in self.BUNDLE_SECTIONS]
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(unknown)}")
+        
+        entries = await asyncio.gather(
+            *[self.get_public(self.BUNDLE_SECTIONS[name], locale) for name in sections]
+        )
+        data = {name: entry.data for name, entry in zip(sections, entries)}
+        return ContentEntry.combine("bundle", data, entries)
+    
+    async def list_public_modules(self, locale: str) -> List[Dict]:
+        """List visible modules for locale (served from cache)"""
+        return (await self.get_public("modules", locale)).data
+    
+    async def list_public_faq(self, locale: str) -> List[Dict]:
+        """List visible FAQ for locale (served from cache)"""
+        return (await self.get_public("faq", locale)).data
+    
+    async def list_public_team(self, locale: str) -> List[Dict]:
+        """List visible team members for locale (served from cache)"""
+        return (await self.get_public("team", locale)).data
+    
+    async def list_public_events(self) -> List[Dict]:
+        """List visible events (served from cache)"""
+        return (await self.get_public("events")).data
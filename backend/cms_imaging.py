@@ -0,0 +1,242 @@
+"""
+CMS Imaging Module
+CPU-bound image work (decode, resize, encode) executed in a process pool
+Worker functions live at module level so they can be pickled to worker processes
+"""
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple, Union
+import asyncio
+import multiprocessing
+import time
+import logging
+
+try:
+    # Registers the AVIF plugin on Pillow builds without native AVIF (also in worker processes)
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================
+# UPLOAD VALIDATION (header only, no decoding)
+# ============================================
+
+# Pillow format name per accepted MIME type
+IMAGE_FORMATS = {
+    'image/jpeg': 'JPEG',
+    'image/png': 'PNG',
+    'image/webp': 'WEBP',
+}
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Detect the MIME type from the first bytes of a file (None if not an accepted format)"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def read_dimensions(source, content_type: str) -> Tuple[int, int]:
+    """
+    Width and height from the image header; pixel data is not read
+    Only the plugin of the sniffed format is tried
+    """
+    with Image.open(source, formats=[IMAGE_FORMATS[content_type]]) as img:
+        return img.size
+
+
+# ============================================
+# WORKER FUNCTIONS (run in child processes)
+# ============================================
+
+def to_rgb(img: Image.Image) -> Image.Image:
+    """Flatten transparency onto white and convert to RGB"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+
+def plan_derivates(width: int, sizes: List[int]) -> Dict[int, int]:
+    """
+    Map each requested derivate size to the width actually produced
+    Images are never upscaled: sizes at or above the image width all map to the native width
+    """
+    return {size: min(size, width) for size in sizes}
+
+
+def _open(source: Union[bytes, str]) -> Image.Image:
+    return Image.open(BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _resize(img: Image.Image, width: int) -> Image.Image:
+    if width >= img.width:
+        return img
+    # reducing_gap: cheap integer reduce first, LANCZOS for the last factor of 3
+    return img.resize((width, max(1, round(img.height * width / img.width))), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+
+# Derivate output formats: Pillow save name, MIME type and encoder options
+OUTPUT_FORMATS = {
+    'avif': ('AVIF', 'image/avif', {'quality': 55, 'speed': 6}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def available_formats() -> List[str]:
+    """Output formats the local Pillow build can encode (AVIF needs libavif or pillow-avif-plugin)"""
+    Image.init()
+    return [fmt for fmt, (pil_format, _, _) in OUTPUT_FORMATS.items() if pil_format in Image.SAVE]
+
+
+def _encode(img: Image.Image, fmt: str) -> bytes:
+    pil_format, _, options = OUTPUT_FORMATS[fmt]
+    output = BytesIO()
+    img.save(output, format=pil_format, **options)
+    return output.getvalue()
+
+
+def _encode_all(img: Image.Image, formats: List[str], timings: Dict[str, float]) -> Dict[str, bytes]:
+    encoded = {}
+    for fmt in formats:
+        started = time.perf_counter()
+        encoded[fmt] = _encode(img, fmt)
+        timings[f"encode_{fmt}"] = round(time.perf_counter() - started, 4)
+    return encoded
+
+
+def derive_scaled(
+    source: Union[bytes, str],
+    width: int,
+    formats: List[str] = ('webp',)
+) -> Tuple[Dict[str, bytes], Dict[str, float]]:
+    """
+    One derivate from its own decode (one task per width, run in parallel)
+    For JPEG, draft() lets the decoder skip detail at 1/2, 1/4 or 1/8 scale
+    Returns ({format: bytes}, timings in seconds)
+    """
+    started = time.perf_counter()
+    img = _open(source)
+    if width < img.width:
+        img.draft('RGB', (width, round(img.height * width / img.width)))
+    img.load()
+    img = to_rgb(img)
+    decoded = time.perf_counter()
+    resized = _resize(img, width)
+    timings = {
+        "decode": round(decoded - started, 4),
+        "resize": round(time.perf_counter() - decoded, 4)
+    }
+    return _encode_all(resized, formats, timings), timings
+
+
+def derive_cascade(
+    source: Union[bytes, str],
+    widths: List[int],
+    formats: List[str] = ('webp',)
+) -> Dict[int, Tuple[Dict[str, bytes], Dict[str, float]]]:
+    """
+    All derivates from a single full decode, largest first,
+    each resized from the previous one instead of from the original
+    Used for formats without reduced-resolution decoding (PNG, WebP)
+    """
+    started = time.perf_counter()
+    img = _open(source)
+    img.load()
+    img = to_rgb(img)
+    decode_seconds = round(time.perf_counter() - started, 4)
+
+    results = {}
+    for width in sorted(widths, reverse=True):
+        step = time.perf_counter()
+        img = _resize(img, width)
+        timings = {
+            # The single decode is attributed to the largest derivate
+            "decode": decode_seconds if not results else 0.0,
+            "resize": round(time.perf_counter() - step, 4)
+        }
+        results[width] = (_encode_all(img, formats, timings), timings)
+    return results
+
+
+# ============================================
+# POOL (used from the event loop)
+# ============================================
+
+class ImagePool:
+    """
+    Process pool for derivate generation
+    The event loop only awaits results; sizes are encoded in parallel across cores
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or min(4, multiprocessing.cpu_count())
+        # spawn: children don't inherit the parent's threads (Motor, executors)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self._busy_seconds = 0.0
+
+    async def run(self, func, *args):
+        """Run a module-level function in a worker process"""
+        self.active += 1
+        started = time.monotonic()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._busy_seconds += time.monotonic() - started
+            self.completed += 1
+            self.active -= 1
+
+    async def create_derivates(
+        self,
+        source: Union[bytes, str],
+        widths: List[int],
+        image_format: Optional[str] = None,
+        formats: List[str] = ('webp',)
+    ) -> Dict[int, Tuple[Dict[str, bytes], Dict[str, float]]]:
+        """
+        Encode derivates of the given widths, returns {width: ({format: bytes}, timings)}
+        JPEG: one draft decode per width, in parallel across workers
+        Other formats: one worker decodes once and cascades from the largest width
+        Pass a file path for large images: bytes are pickled to every worker
+        """
+        formats = list(formats)
+        if image_format == "JPEG":
+            results = await asyncio.gather(*[self.run(derive_scaled, source, width, formats) for width in widths])
+            return dict(zip(widths, results))
+        return await self.run(derive_cascade, source, widths, formats)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        """Pool counters for monitoring"""
+        return {
+            "workers": self.max_workers,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avgSeconds": round(self._busy_seconds / self.completed, 4) if self.completed else 0.0
+        }
@@ -0,0 +1,563 @@
+"""
+CMS Media Backends Module
+Where media files live: MongoDB GridFS (default), a local directory or S3-compatible object storage
+Metadata (cms_media) always stays in MongoDB; backends only store and stream file bytes
+"""
+from abc import ABC, abstractmethod
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import json
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Keys are generated by CMSStorage ({uuid}_{size}...); anything else never reaches the filesystem
+KEY_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,199}$")
+# Derivate keys end with a hash of their content ({id}_{size}_{format}.{hash}), other keys are unversioned
+VERSIONED_KEY = re.compile(r"\.([0-9a-f]{16})$")
+
+
+def content_version(key: str) -> Optional[str]:
+    """Content hash carried by a versioned key (None for originals and older derivates)"""
+    match = VERSIONED_KEY.search(key)
+    return match.group(1) if match else None
+
+
+class StoredFile:
+    """
+    Handle to a stored file
+    Content is streamed chunk by chunk instead of being read into memory:
+    from a local path if set (servable with FileResponse), else via the backend's reader
+    release: called once the response is done with the file (removes a disk cache link)
+    """
+
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(
+        self,
+        key: str,
+        length: int,
+        content_type: str,
+        upload_date,
+        file_id,
+        reader: Optional[Callable[[int, int], AsyncIterator[bytes]]] = None,
+        path: Optional[str] = None,
+        release: Optional[Callable[[], None]] = None
+    ):
+        self.key = key
+        self.length = length
+        self.content_type = content_type
+        self.upload_date = upload_date
+        self.file_id = file_id
+        self.path = path
+        self.release = release
+        self._reader = reader
+
+    @property
+    def etag(self) -> str:
+        """
+        Strong validator: the content hash of a versioned key (known without any lookup),
+        else the file id (every upload gets a new one)
+        """
+        return f'"{content_version(self.key) or self.file_id}"'
+
+    @property
+    def last_modified(self) -> datetime:
+        upload_date = self.upload_date
+        if upload_date.tzinfo is None:
+            # MongoDB returns naive datetimes in UTC
+            upload_date = upload_date.replace(tzinfo=timezone.utc)
+        return upload_date
+
+    async def iter_range(self, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield the bytes start..end (inclusive) chunk by chunk"""
+        end = self.length - 1 if end is None else end
+        if end < start:
+            return
+        if self.path:
+            remaining = end - start + 1
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                while remaining > 0:
+                    chunk = await asyncio.to_thread(f.read, min(self.CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+            return
+
+        async for chunk in self._reader(start, end):
+            yield chunk
+
+
+def read_limited(source: BinaryIO, chunk_size: int, max_size: Optional[int]):
+    """Iterate over a file object in chunks, raising ValueError once max_size is exceeded"""
+    size = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise ValueError(f"File too large. Max {max_size / 1024 / 1024}MB")
+        yield chunk
+
+
+async def aread_limited(source: BinaryIO, chunk_size: int, max_size: Optional[int]) -> AsyncIterator[bytes]:
+    """read_limited for the event loop: each read runs in a thread (uploads are spooled to disk)"""
+    chunks = read_limited(source, chunk_size, max_size)
+    while True:
+        chunk = await asyncio.to_thread(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class MediaBackend(ABC):
+    """
+    Media file storage interface
+    put() streams from a file object; open() returns a StoredFile whose bytes are read lazily
+    """
+
+    name = "base"
+    chunk_size = 255 * 1024
+
+    @abstractmethod
+    async def put(
+        self,
+        key: str,
+        source: BinaryIO,
+        content_type: str,
+        metadata: Dict,
+        max_size: Optional[int] = None
+    ) -> int:
+        """Store a file under key, returns its size; ValueError (nothing stored) above max_size"""
+
+    @abstractmethod
+    async def open(self, key: str) -> Optional[StoredFile]:
+        """Open a file for streaming, None if it does not exist"""
+
+    async def head(self, key: str) -> Optional[StoredFile]:
+        """Size, type and validators without opening the content"""
+        return await self.open(key)
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """Delete a file, returns True if it existed"""
+
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        """Delete several files in as few requests as the storage allows, returns the number deleted"""
+        results = await asyncio.gather(*(self.delete(key) for key in keys))
+        return sum(results)
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str) -> List[str]:
+        """Delete all files whose key starts with prefix (one listing), returns the deleted keys"""
+
+    async def existing_keys(self, keys: Iterable[str]) -> Set[str]:
+        """Subset of keys that are stored"""
+        keys = list(keys)
+        found = await asyncio.gather(*(self.head(key) for key in keys))
+        return {key for key, stored in zip(keys, found) if stored is not None}
+
+    @abstractmethod
+    def iter_files(self) -> AsyncIterator[Tuple[str, int, datetime]]:
+        """All stored files as (key, length, upload_date), for garbage collection"""
+
+
+# ============================================
+# GRIDFS
+# ============================================
+
+class GridFSMediaBackend(MediaBackend):
+    """Files in the cms_images GridFS bucket of the CMS database"""
+
+    name = "gridfs"
+
+    def __init__(self, db, bucket_name: str = "cms_images"):
+        self.db = db
+        self.bucket_name = bucket_name
+        self.fs = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+
+    async def put(self, key, source, content_type, metadata, max_size=None) -> int:
+        grid_in = self.fs.open_upload_stream(
+            key,
+            chunk_size_bytes=self.chunk_size,
+            metadata={
+                "content_type": content_type,
+                **metadata
+            }
+        )
+        size = 0
+        try:
+            async for chunk in aread_limited(source, self.chunk_size, max_size):
+                await grid_in.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            # Removes the chunks written so far
+            await grid_in.abort()
+            raise
+        await grid_in.close()
+        return size
+
+    async def open(self, key: str) -> Optional[StoredFile]:
+        try:
+            grid_out = await self.fs.open_download_stream_by_name(key)
+        except NoFile:
+            return None
+
+        async def reader(start: int, end: int) -> AsyncIterator[bytes]:
+            remaining = end - start + 1
+            grid_out.seek(start)
+            while remaining > 0:
+                chunk = await grid_out.readchunk()
+                if not chunk:
+                    break
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+                yield chunk
+
+        return StoredFile(
+            key=key,
+            length=grid_out.length,
+            content_type=(grid_out.metadata or {}).get('content_type', 'application/octet-stream'),
+            upload_date=grid_out.upload_date,
+            file_id=grid_out._id,
+            reader=reader
+        )
+
+    @property
+    def files(self):
+        return self.db[f"{self.bucket_name}.files"]
+
+    @property
+    def chunks(self):
+        return self.db[f"{self.bucket_name}.chunks"]
+
+    async def delete(self, key: str) -> bool:
+        return await self.delete_many([key]) > 0
+
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        # All revisions of every key in one query
+        docs = await self.files.find({"filename": {"$in": list(keys)}}, {"_id": 1}).to_list(length=None)
+        await self.delete_ids([doc["_id"] for doc in docs])
+        return len(docs)
+
+    async def delete_prefix(self, prefix: str) -> List[str]:
+        if not prefix:
+            return []
+        # An anchored regex is answered from the GridFS filename index
+        docs = await self.files.find(
+            {"filename": {"$regex": f"^{re.escape(prefix)}"}},
+            {"filename": 1}
+        ).to_list(length=None)
+        await self.delete_ids([doc["_id"] for doc in docs])
+        return sorted({doc["filename"] for doc in docs})
+
+    async def delete_ids(self, file_ids: List):
+        """Delete GridFS files and their chunks by id, one query per collection"""
+        if not file_ids:
+            return
+        # File documents first: an interruption leaves unreferenced chunks (garbage collected), never a truncated file
+        await self.files.delete_many({"_id": {"$in": file_ids}})
+        await self.chunks.delete_many({"files_id": {"$in": file_ids}})
+
+    async def existing_keys(self, keys: Iterable[str]) -> Set[str]:
+        return set(await self.files.distinct("filename", {"filename": {"$in": list(keys)}}))
+
+    async def iter_files(self) -> AsyncIterator[Tuple[str, int, datetime]]:
+        async for doc in self.files.find({}, {"filename": 1, "length": 1, "uploadDate": 1}):
+            yield doc["filename"], doc["length"], doc["uploadDate"]
+
+
+# ============================================
+# LOCAL FILESYSTEM
+# ============================================
+
+class LocalMediaBackend(MediaBackend):
+    """
+    Files in a local directory (or a mounted volume shared by all app servers)
+    Layout: <root>/<first 2 chars of key>/<key> plus <key>.json with content type and metadata
+    Files are served with FileResponse (sendfile/pathsend), no disk cache needed in front
+    """
+
+    name = "local"
+
+    def __init__(self, directory):
+        self.root = Path(directory)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Optional[Path]:
+        if not KEY_PATTERN.fullmatch(key):
+            return None
+        return self.root / key[:2] / key
+
+    async def put(self, key, source, content_type, metadata, max_size=None) -> int:
+        path = self._path(key)
+        if path is None:
+            raise ValueError(f"Invalid media key: {key}")
+        path.parent.mkdir(exist_ok=True)
+        partial = path.with_name(path.name + ".tmp")
+        size = 0
+        try:
+            with open(partial, "wb") as f:
+                async for chunk in aread_limited(source, self.chunk_size, max_size):
+                    await asyncio.to_thread(f.write, chunk)
+                    size += len(chunk)
+            # Sidecar first: a data file is never visible without its metadata
+            path.with_name(path.name + ".json").write_text(json.dumps({
+                "content_type": content_type,
+                "metadata": metadata
+            }, default=str))
+            os.replace(partial, path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        return size
+
+    async def open(self, key: str) -> Optional[StoredFile]:
+        path = self._path(key)
+        if path is None:
+            return None
+        try:
+            stat = path.stat()
+            meta = json.loads(path.with_name(path.name + ".json").read_text())
+        except (OSError, ValueError):
+            return None
+        return StoredFile(
+            key=key,
+            length=stat.st_size,
+            content_type=meta.get("content_type", "application/octet-stream"),
+            upload_date=datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+            # Changes whenever the file is rewritten
+            file_id=f"{stat.st_mtime_ns:x}-{stat.st_size:x}",
+            path=str(path)
+        )
+
+    async def delete(self, key: str) -> bool:
+        path = self._path(key)
+        if path is None:
+            return False
+        existed = path.exists()
+        path.unlink(missing_ok=True)
+        path.with_name(path.name + ".json").unlink(missing_ok=True)
+        return existed
+
+    async def delete_prefix(self, prefix: str) -> List[str]:
+        # Keys sharing a prefix of 2+ characters share a directory
+        if len(prefix) < 2 or not KEY_PATTERN.fullmatch(prefix):
+            return []
+        return await asyncio.to_thread(self._delete_prefix, prefix)
+
+    def _delete_prefix(self, prefix: str) -> List[str]:
+        deleted = []
+        try:
+            entries = list(os.scandir(self.root / prefix[:2]))
+        except FileNotFoundError:
+            return deleted
+        for entry in entries:
+            if not entry.name.startswith(prefix):
+                continue
+            os.unlink(entry.path)
+            if not entry.name.endswith((".json", ".tmp")):
+                deleted.append(entry.name)
+        return sorted(deleted)
+
+    async def iter_files(self) -> AsyncIterator[Tuple[str, int, datetime]]:
+        for directory in sorted(p for p in self.root.iterdir() if p.is_dir()):
+            files = await asyncio.to_thread(self._list_directory, directory)
+            for key, length, mtime in files:
+                yield key, length, datetime.fromtimestamp(mtime, timezone.utc)
+
+    @staticmethod
+    def _list_directory(directory: Path) -> List[Tuple[str, int, float]]:
+        files = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.endswith((".json", ".tmp")):
+                stat = entry.stat()
+                files.append((entry.name, stat.st_size, stat.st_mtime))
+        return files
+
+
+# ============================================
+# S3-COMPATIBLE OBJECT STORAGE
+# ============================================
+
+class _LimitedReader:
+    """File object wrapper for boto3 that stops the upload once max_size is exceeded"""
+
+    def __init__(self, source: BinaryIO, max_size: Optional[int]):
+        self.source = source
+        self.max_size = max_size
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.source.read(size)
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            raise ValueError(f"File too large. Max {self.max_size / 1024 / 1024}MB")
+        return chunk
+
+
+class S3MediaBackend(MediaBackend):
+    """
+    Objects in an S3 bucket (AWS, MinIO, Ceph, ...) under an optional key prefix
+    boto3 is blocking, so every call runs in a thread; requires the optional boto3 package
+    Credentials come from the usual AWS environment variables or instance profile
+    """
+
+    name = "s3"
+    # Small, ASCII-safe metadata only (S3 user metadata is limited to 2KB of ASCII headers)
+    OBJECT_METADATA = ("type", "image_id", "size", "width", "format")
+    # Maximum keys per DeleteObjects request
+    DELETE_BATCH = 1000
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        client=None
+    ):
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError("S3MediaBackend requires the 'boto3' package")
+            client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _is_missing(self, error: Exception) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    async def put(self, key, source, content_type, metadata, max_size=None) -> int:
+        reader = _LimitedReader(source, max_size)
+        # Multipart uploads of a failed transfer are aborted by boto3
+        await asyncio.to_thread(
+            self.client.upload_fileobj,
+            reader,
+            self.bucket,
+            self._object_key(key),
+            ExtraArgs={
+                "ContentType": content_type,
+                "Metadata": {name: str(metadata[name]) for name in self.OBJECT_METADATA if name in metadata}
+            }
+        )
+        return reader.size
+
+    async def head(self, key: str) -> Optional[StoredFile]:
+        try:
+            response = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self._object_key(key))
+        except Exception as e:
+            if self._is_missing(e):
+                return None
+            raise
+
+        async def reader(start: int, end: int) -> AsyncIterator[bytes]:
+            result = await asyncio.to_thread(
+                self.client.get_object,
+                Bucket=self.bucket,
+                Key=self._object_key(key),
+                Range=f"bytes={start}-{end}",
+                # Never stream a different object than the one head() described
+                IfMatch=response["ETag"]
+            )
+            body = result["Body"]
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(body.read, StoredFile.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            finally:
+                body.close()
+
+        return StoredFile(
+            key=key,
+            length=response["ContentLength"],
+            content_type=response.get("ContentType", "application/octet-stream"),
+            upload_date=response["LastModified"],
+            file_id=response["ETag"].strip('"'),
+            reader=reader
+        )
+
+    async def open(self, key: str) -> Optional[StoredFile]:
+        # The object is only fetched when the content is iterated
+        return await self.head(key)
+
+    async def delete(self, key: str) -> bool:
+        existed = await self.head(key) is not None
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self._object_key(key))
+        return existed
+
+    async def delete_many(self, keys: Iterable[str]) -> int:
+        # DeleteObjects does not report missing keys, so this counts the keys requested
+        object_keys = [self._object_key(key) for key in keys]
+        for start in range(0, len(object_keys), self.DELETE_BATCH):
+            batch = object_keys[start:start + self.DELETE_BATCH]
+            response = await asyncio.to_thread(
+                self.client.delete_objects,
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+            )
+            for error in response.get("Errors", []):
+                logger.error(f"Error deleting S3 object {error.get('Key')}: {error.get('Message')}")
+        return len(object_keys)
+
+    async def delete_prefix(self, prefix: str) -> List[str]:
+        if not prefix:
+            return []
+        keys = [key async for key, _, _ in self._list(prefix)]
+        await self.delete_many(keys)
+        return keys
+
+    async def iter_files(self) -> AsyncIterator[Tuple[str, int, datetime]]:
+        async for item in self._list(""):
+            yield item
+
+    async def _list(self, prefix: str) -> AsyncIterator[Tuple[str, int, datetime]]:
+        """List objects page by page (1000 per request)"""
+        params = {"Bucket": self.bucket, "Prefix": self._object_key(prefix)}
+        while True:
+            response = await asyncio.to_thread(self.client.list_objects_v2, **params)
+            for obj in response.get("Contents", []):
+                yield obj["Key"][len(self.prefix):], obj["Size"], obj["LastModified"]
+            if not response.get("IsTruncated"):
+                return
+            params["ContinuationToken"] = response["NextContinuationToken"]
+
+
+def create_media_backend(
+    kind: str,
+    db=None,
+    local_dir: Optional[str] = None,
+    s3_bucket: Optional[str] = None,
+    s3_prefix: str = "",
+    s3_endpoint_url: Optional[str] = None,
+    s3_region: Optional[str] = None
+) -> MediaBackend:
+    """Build a media backend from config (gridfs, local or s3)"""
+    if kind == "gridfs":
+        return GridFSMediaBackend(db)
+    if kind == "local":
+        if not local_dir:
+            raise ValueError("Local media backend requires a directory")
+        return LocalMediaBackend(local_dir)
+    if kind == "s3":
+        if not s3_bucket:
+            raise ValueError("S3 media backend requires a bucket")
+        return S3MediaBackend(s3_bucket, prefix=s3_prefix, endpoint_url=s3_endpoint_url, region=s3_region)
+    raise ValueError(f"Unknown media backend: {kind}")
@@ -0,0 +1,315 @@
+"""
+CMS Media Cache Module
+Size-bounded LRU cache of media files on local disk in front of GridFS
+Hot images are served straight from disk instead of being reassembled from GridFS chunks
+"""
+from collections import Counter, OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from pymongo import UpdateOne
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CachedMedia:
+    """Index entry of a file on disk (metadata mirrors the GridFS file)"""
+
+    __slots__ = ("key", "path", "length", "content_type", "upload_date", "file_id")
+
+    def __init__(self, key: str, path: str, length: int, content_type: str, upload_date: datetime, file_id: str):
+        self.key = key
+        self.path = path
+        self.length = length
+        self.content_type = content_type
+        self.upload_date = upload_date
+        self.file_id = file_id
+
+    def to_json(self) -> Dict:
+        return {
+            "key": self.key,
+            "length": self.length,
+            "content_type": self.content_type,
+            "upload_date": self.upload_date.isoformat(),
+            "file_id": self.file_id
+        }
+
+
+class DiskMediaCache:
+    """
+    LRU cache of media files in a local directory
+    Each file is stored as <sha1(key)> with a <sha1(key)>.json sidecar holding its metadata
+    Media keys are immutable, so entries only leave the cache by eviction or invalidate()
+    Hits are served from a per-response hard link (<sha1(key)>.<token>.link), so an eviction while
+    a response is being sent - here or by another worker - never unlinks the file under it
+
+    The index lives in process memory. Several uvicorn workers may share the directory:
+    each keeps max_bytes for its own entries and tolerates files removed by the others.
+    Request counts are persisted in cms_media_stats to warm the hottest keys after a restart.
+    """
+
+    def __init__(
+        self,
+        directory,
+        db=None,
+        max_bytes: int = 512 * 1024 * 1024,
+        max_file_bytes: int = 16 * 1024 * 1024,
+        stats_flush_interval: float = 60.0
+    ):
+        self.directory = Path(directory)
+        self.db = db
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.stats_flush_interval = stats_flush_interval
+        self._entries: "OrderedDict[str, CachedMedia]" = OrderedDict()
+        self._filling: Dict[str, object] = {}
+        self._tasks = set()
+        self._requests: Counter = Counter()
+        self._last_flush = time.monotonic()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.evictions = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.load()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / hashlib.sha1(key.encode()).hexdigest()
+
+    def load(self) -> int:
+        """Rebuild the index from the directory (least recently written first)"""
+        found = []
+        for sidecar in self.directory.glob("*.json"):
+            data_path = sidecar.with_suffix("")
+            try:
+                meta = json.loads(sidecar.read_text())
+                stat = data_path.stat()
+                if stat.st_size != meta["length"]:
+                    raise ValueError("size mismatch")
+            except (OSError, ValueError, KeyError) as e:
+                logger.info(f"Discarding media cache entry {sidecar.name}: {e}")
+                self._remove_files(data_path)
+                continue
+            found.append((stat.st_mtime, CachedMedia(
+                key=meta["key"],
+                path=str(data_path),
+                length=meta["length"],
+                content_type=meta["content_type"],
+                upload_date=datetime.fromisoformat(meta["upload_date"]),
+                file_id=meta["file_id"]
+            )))
+
+        # Leftovers of fills and responses interrupted by a restart
+        for partial in [*self.directory.glob("*.tmp"), *self.directory.glob("*.link")]:
+            partial.unlink(missing_ok=True)
+
+        for _, entry in sorted(found, key=lambda item: item[0]):
+            self._add(entry)
+        self._evict()
+        if found:
+            logger.info(f"Media cache loaded {len(self._entries)} files ({self.size / 1024 / 1024:.1f}MB)")
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedMedia]:
+        """
+        Return the cached file or None
+        The returned path is a hard link private to the caller; pass it to release() once sent
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        link = f"{entry.path}.{secrets.token_hex(8)}.link"
+        try:
+            os.link(entry.path, link)
+        except FileNotFoundError:
+            # Removed by another worker sharing the directory
+            self._drop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return CachedMedia(
+            key=key,
+            path=link,
+            length=entry.length,
+            content_type=entry.content_type,
+            upload_date=entry.upload_date,
+            file_id=entry.file_id
+        )
+
+    @staticmethod
+    def release(path: str):
+        """Remove the link returned by get() (the data goes once the cache file is evicted too)"""
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def accepts(self, length: int) -> bool:
+        """Whether a file of this size is worth caching"""
+        return length <= min(self.max_file_bytes, self.max_bytes)
+
+    def schedule_fill(self, key: str, opener: Callable[[], Awaitable]):
+        """Copy a file to disk in the background (at most one fill per key at a time)"""
+        if key in self._filling or key in self._entries:
+            return
+        token = object()
+        self._filling[key] = token
+        # Keep a reference so the task is not garbage collected mid-copy
+        task = asyncio.create_task(self._fill_task(key, opener, token))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def fill(self, key: str, opener: Callable[[], Awaitable]) -> Optional[CachedMedia]:
+        """Copy a file to disk now, returns the new entry (None if not cacheable)"""
+        if key in self._entries:
+            return self._entries[key]
+        if key in self._filling:
+            return None
+        token = object()
+        self._filling[key] = token
+        return await self._fill_task(key, opener, token)
+
+    async def _fill_task(self, key: str, opener: Callable[[], Awaitable], token) -> Optional[CachedMedia]:
+        path = self._path(key)
+        partial = path.with_suffix(".tmp")
+        try:
+            stored = await opener()
+            if stored is None or not self.accepts(stored.length):
+                return None
+
+            with open(partial, "wb") as f:
+                async for chunk in stored.iter_range():
+                    await asyncio.to_thread(f.write, chunk)
+
+            entry = CachedMedia(
+                key=key,
+                path=str(path),
+                length=stored.length,
+                content_type=stored.content_type,
+                upload_date=stored.last_modified,
+                file_id=str(stored.file_id)
+            )
+            if self._filling.get(key) is not token:
+                # Invalidated while copying
+                partial.unlink(missing_ok=True)
+                return None
+
+            # Sidecar first: load() discards a sidecar without data, but never sees data without one
+            path.with_suffix(".json").write_text(json.dumps(entry.to_json()))
+            os.replace(partial, path)
+            self._add(entry)
+            self._evict()
+            self.fills += 1
+            return entry
+        except Exception as e:
+            logger.error(f"Error caching media {key}: {e}")
+            partial.unlink(missing_ok=True)
+            return None
+        finally:
+            if self._filling.get(key) is token:
+                del self._filling[key]
+
+    def _add(self, entry: CachedMedia):
+        previous = self._entries.pop(entry.key, None)
+        if previous:
+            self.size -= previous.length
+        self._entries[entry.key] = entry
+        self.size += entry.length
+
+    def _drop(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.size -= entry.length
+        return True
+
+    def _remove_files(self, path: Path):
+        path.unlink(missing_ok=True)
+        path.with_suffix(".json").unlink(missing_ok=True)
+
+    def _evict(self):
+        """Remove least recently used files until the cache fits max_bytes"""
+        while self.size > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self.size -= entry.length
+            self._remove_files(Path(entry.path))
+            self.evictions += 1
+
+    async def invalidate(self, keys: Iterable[str]) -> int:
+        """Remove files and request counts of deleted/replaced media"""
+        keys = list(keys)
+        removed = 0
+        for key in keys:
+            # A fill in progress for this key will discard its result
+            self._filling.pop(key, None)
+            self._requests.pop(key, None)
+            if self._drop(key):
+                removed += 1
+            self._remove_files(self._path(key))
+
+        if self.db is not None and keys:
+            try:
+                await self.db.cms_media_stats.delete_many({"_id": {"$in": keys}})
+            except Exception as e:
+                logger.error(f"Error deleting media stats: {e}")
+        return removed
+
+    # ============================================
+    # REQUEST STATS (for warm-up)
+    # ============================================
+
+    async def record(self, key: str):
+        """Count a request (flushed at most once per interval)"""
+        self._requests[key] += 1
+        if time.monotonic() - self._last_flush >= self.stats_flush_interval:
+            await self.flush_stats()
+
+    async def flush_stats(self) -> int:
+        """Write coalesced request counts in one batch"""
+        pending, self._requests = self._requests, Counter()
+        self._last_flush = time.monotonic()
+        if not pending or self.db is None:
+            return 0
+
+        try:
+            await self.db.cms_media_stats.bulk_write(
+                [UpdateOne({"_id": key}, {"$inc": {"hits": count}}, upsert=True) for key, count in pending.items()],
+                ordered=False
+            )
+        except Exception as e:
+            logger.error(f"Error flushing media stats: {e}")
+        return len(pending)
+
+    async def hot_keys(self, limit: int) -> List[str]:
+        """Most requested keys, most requested first"""
+        if self.db is None:
+            return []
+        cursor = self.db.cms_media_stats.find({}, {"_id": 1}).sort("hits", -1).limit(limit)
+        return [doc["_id"] async for doc in cursor]
+
+    def stats(self) -> Dict:
+        """Cache counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "files": len(self._entries),
+            "bytes": self.size,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "fills": self.fills,
+            "filling": len(self._filling),
+            "evictions": self.evictions
+        }
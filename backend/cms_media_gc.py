@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+CMS Media Garbage Collector
+Finds media files without an image in cms_media (and GridFS chunks without a file) and removes them in batches
+
+Usage (from backend/):
+    python cms_media_gc.py                  # remove orphans
+    python cms_media_gc.py --dry-run        # only report what would be removed
+    python cms_media_gc.py --batch-size 200 --min-age-hours 24
+"""
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Tuple
+import re
+import logging
+
+from cms_media_backends import GridFSMediaBackend, MediaBackend
+
+logger = logging.getLogger(__name__)
+
+# Keys written by CMSStorage: {uuid}_original, {uuid}_{size}[_{format}]
+IMAGE_KEY = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})_")
+
+
+class MediaGarbageCollector:
+    """
+    Streams through the media backend and cms_media in batches of batch_size
+    - files whose image id has no cms_media record are deleted
+    - GridFS chunks whose file document is gone are deleted
+    - cms_media records whose original file is missing are only reported
+    Anything younger than min_age is skipped: it may belong to an upload in progress
+    """
+
+    def __init__(self, db, backend: MediaBackend, batch_size: int = 500, min_age: timedelta = timedelta(hours=1)):
+        self.db = db
+        self.backend = backend
+        self.batch_size = batch_size
+        self.min_age = min_age
+
+    async def run(self, dry_run: bool = False) -> Dict:
+        """Collect all orphans, returns a report with counts and reclaimed bytes"""
+        cutoff = datetime.now(timezone.utc) - self.min_age
+        report = {"dryRun": dry_run, "files": await self.collect_files(cutoff, dry_run)}
+        if isinstance(self.backend, GridFSMediaBackend):
+            report["chunks"] = await self.collect_chunks(cutoff, dry_run)
+        report["brokenRecords"] = await self.find_broken_records()
+        return report
+
+    # ============================================
+    # FILES WITHOUT IMAGE
+    # ============================================
+
+    async def collect_files(self, cutoff: datetime, dry_run: bool) -> Dict:
+        result = {"scanned": 0, "skipped": 0, "orphans": 0, "bytes": 0}
+        batch: List[Tuple[str, str, int]] = []
+        async for key, length, upload_date in self.backend.iter_files():
+            result["scanned"] += 1
+            match = IMAGE_KEY.match(key)
+            if not match or _as_utc(upload_date) > cutoff:
+                # Unknown naming or too recent: never touched
+                result["skipped"] += 1
+                continue
+            batch.append((key, match.group(1), length))
+            if len(batch) >= self.batch_size:
+                await self._collect_file_batch(batch, result, dry_run)
+                batch = []
+        if batch:
+            await self._collect_file_batch(batch, result, dry_run)
+        return result
+
+    async def _collect_file_batch(self, batch: List[Tuple[str, str, int]], result: Dict, dry_run: bool):
+        image_ids = list({image_id for _, image_id, _ in batch})
+        live = {doc["_id"] async for doc in self.db.cms_media.find({"_id": {"$in": image_ids}}, {"_id": 1})}
+        orphans = [(key, length) for key, image_id, length in batch if image_id not in live]
+        if not orphans:
+            return
+
+        if not dry_run:
+            await self.backend.delete_many([key for key, _ in orphans])
+        result["orphans"] += len(orphans)
+        result["bytes"] += sum(length for _, length in orphans)
+        prefix = "[dry-run] " if dry_run else ""
+        logger.info(f"{prefix}{len(orphans)} orphaned files ({sum(length for _, length in orphans) / 1024 / 1024:.1f}MB)")
+
+    # ============================================
+    # GRIDFS CHUNKS WITHOUT FILE
+    # ============================================
+
+    async def collect_chunks(self, cutoff: datetime, dry_run: bool) -> Dict:
+        """Chunks of files whose file document was deleted (or never written by an aborted upload)"""
+        result = {"files": 0, "chunks": 0, "bytes": 0}
+        # $sort before $group lets MongoDB walk the files_id index instead of reading chunk data
+        cursor = self.backend.chunks.aggregate(
+            [{"$sort": {"files_id": 1}}, {"$group": {"_id": "$files_id"}}],
+            allowDiskUse=True
+        )
+        batch = []
+        async for row in cursor:
+            # GridFS file ids are ObjectIds created when the upload starts
+            created = getattr(row["_id"], "generation_time", None)
+            if created is None or created > cutoff:
+                continue
+            batch.append(row["_id"])
+            if len(batch) >= self.batch_size:
+                await self._collect_chunk_batch(batch, result, dry_run)
+                batch = []
+        if batch:
+            await self._collect_chunk_batch(batch, result, dry_run)
+        return result
+
+    async def _collect_chunk_batch(self, file_ids: List, result: Dict, dry_run: bool):
+        existing = {doc["_id"] async for doc in self.backend.files.find({"_id": {"$in": file_ids}}, {"_id": 1})}
+        orphans = [file_id for file_id in file_ids if file_id not in existing]
+        if not orphans:
+            return
+
+        # Orphaned chunks are few (aborted uploads, interrupted deletes): measured client-side,
+        # which also works on servers without $binarySize (MongoDB < 4.4)
+        async for chunk in self.backend.chunks.find({"files_id": {"$in": orphans}}, {"data": 1}):
+            result["chunks"] += 1
+            result["bytes"] += len(chunk["data"])
+        result["files"] += len(orphans)
+
+        if not dry_run:
+            await self.backend.chunks.delete_many({"files_id": {"$in": orphans}})
+        prefix = "[dry-run] " if dry_run else ""
+        logger.info(f"{prefix}Chunks of {len(orphans)} missing GridFS files")
+
+    # ============================================
+    # RECORDS WITHOUT ORIGINAL
+    # ============================================
+
+    async def find_broken_records(self, report_limit: int = 50) -> Dict:
+        """Images whose original file is missing (reported only: deleting metadata is left to an editor)"""
+        result = {"scanned": 0, "count": 0, "ids": []}
+        batch = []
+        async for meta in self.db.cms_media.find({}, {"original.key": 1}):
+            batch.append(meta)
+            if len(batch) >= self.batch_size:
+                await self._check_record_batch(batch, result, report_limit)
+                batch = []
+        if batch:
+            await self._check_record_batch(batch, result, report_limit)
+        return result
+
+    async def _check_record_batch(self, batch: List[Dict], result: Dict, report_limit: int):
+        keys = {meta["_id"]: (meta.get("original") or {}).get("key") for meta in batch}
+        existing = await self.backend.existing_keys([key for key in keys.values() if key])
+        result["scanned"] += len(batch)
+        for image_id, key in keys.items():
+            if key not in existing:
+                result["count"] += 1
+                if len(result["ids"]) < report_limit:
+                    result["ids"].append(image_id)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # MongoDB returns naive datetimes in UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def main():
+    import argparse
+    import asyncio
+    import json
+    import os
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from cms_media_backends import create_media_backend
+
+    parser = argparse.ArgumentParser(description="Remove orphaned CMS media files")
+    parser.add_argument("--dry-run", action="store_true", help="report orphans without removing them")
+    parser.add_argument("--batch-size", type=int, default=500, help="files checked and deleted per batch")
+    parser.add_argument("--min-age-hours", type=float, default=1.0, help="skip files younger than this")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    root_dir = Path(__file__).parent
+    load_dotenv(root_dir / '.env')
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            db = client[os.environ['DB_NAME']]
+            # Same configuration as server.py
+            backend = create_media_backend(
+                os.environ.get('MEDIA_STORAGE_BACKEND', 'gridfs'),
+                db,
+                local_dir=os.environ.get('MEDIA_LOCAL_DIR', str(root_dir / 'media')),
+                s3_bucket=os.environ.get('S3_BUCKET'),
+                s3_prefix=os.environ.get('S3_PREFIX', ''),
+                s3_endpoint_url=os.environ.get('S3_ENDPOINT_URL'),
+                s3_region=os.environ.get('S3_REGION')
+            )
+            collector = MediaGarbageCollector(
+                db,
+                backend,
+                batch_size=args.batch_size,
+                min_age=timedelta(hours=args.min_age_hours)
+            )
+            return await collector.run(dry_run=args.dry_run)
+        finally:
+            client.close()
+
+    report = asyncio.run(run())
+    reclaimed = report["files"]["bytes"] + report.get("chunks", {}).get("bytes", 0)
+    verb = "Would reclaim" if args.dry_run else "Reclaimed"
+    print(json.dumps(report, indent=2))
+    print(f"{verb} {reclaimed / 1024 / 1024:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+CMS Media Jobs Module
+Background derivate generation with jobs persisted in MongoDB (cms_media_jobs)
+Jobs survive restarts: running jobs whose lease expired are picked up again
+"""
+from pymongo import ReturnDocument
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MediaJobQueue:
+    """
+    Derivate job queue processed by asyncio workers
+    Job document: { _id: image_id, status: queued|running|failed, attempts, leaseUntil, notBefore, error }
+    Successful jobs are removed; the image status lives in cms_media
+    The lease is renewed while a job runs; it only expires if the worker process died
+    Failed attempts are retried after an exponential backoff (notBefore), so a short outage
+    of the storage backend does not use up all attempts at once
+    """
+
+    def __init__(
+        self,
+        db,
+        storage,
+        workers: int = 2,
+        lease_seconds: int = 300,
+        max_attempts: int = 3,
+        retry_delay: float = 30.0,
+        poll_interval: float = 5.0
+    ):
+        self.db = db
+        self.storage = storage
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay  # seconds before the 2nd attempt, doubled for each further one
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.processed = 0
+        self.failed = 0
+
+    async def enqueue(self, image_id: str):
+        """Queue derivate generation for an uploaded image"""
+        now = datetime.now(timezone.utc)
+        await self.db.cms_media_jobs.update_one(
+            {"_id": image_id},
+            {
+                "$set": {"status": "queued", "notBefore": now, "updatedAt": now},
+                "$setOnInsert": {"attempts": 0, "createdAt": now}
+            },
+            upsert=True
+        )
+        self._wakeup.set()
+
+    async def recover(self) -> int:
+        """Queue images left in processing state without a job (e.g. crash right after upload)"""
+        recovered = 0
+        async for meta in self.db.cms_media.find({"status": "processing"}, {"_id": 1}):
+            if not await self.db.cms_media_jobs.find_one({"_id": meta["_id"]}, {"_id": 1}):
+                await self.enqueue(meta["_id"])
+                recovered += 1
+        if recovered:
+            logger.info(f"Recovered {recovered} media jobs")
+        return recovered
+
+    async def _claim(self) -> Optional[Dict]:
+        """Atomically take the oldest due queued job (or a running job whose lease expired)"""
+        now = datetime.now(timezone.utc)
+        return await self.db.cms_media_jobs.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "notBefore": {"$not": {"$gt": now}}},
+                {"status": "running", "leaseUntil": {"$lt": now}}
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "leaseUntil": now + timedelta(seconds=self.lease_seconds),
+                    "updatedAt": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("createdAt", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _process(self, job: Dict):
+        image_id = job["_id"]
+        try:
+            await self.storage.process_derivates(image_id)
+            await self.db.cms_media_jobs.delete_one({"_id": image_id})
+            self.processed += 1
+        except Exception as e:
+            logger.error(f"Media job {image_id} failed (attempt {job['attempts']}): {e}")
+            if job["attempts"] >= self.max_attempts:
+                self.failed += 1
+                await self.db.cms_media_jobs.update_one(
+                    {"_id": image_id},
+                    {"$set": {"status": "failed", "error": str(e), "updatedAt": datetime.now(timezone.utc)}}
+                )
+                await self.storage.mark_failed(image_id, str(e))
+            else:
+                now = datetime.now(timezone.utc)
+                delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+                await self.db.cms_media_jobs.update_one(
+                    {"_id": image_id},
+                    {"$set": {
+                        "status": "queued",
+                        "notBefore": now + timedelta(seconds=delay),
+                        "error": str(e),
+                        "updatedAt": now
+                    }}
+                )
+
+    async def _renew_lease(self, image_id: str):
+        """Extend the lease while a job is processed, so slow jobs are not claimed a second time"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self.db.cms_media_jobs.update_one(
+                    {"_id": image_id, "status": "running"},
+                    {"$set": {"leaseUntil": datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)}}
+                )
+            except Exception as e:
+                logger.error(f"Could not renew lease of media job {image_id}: {e}")
+    
+    async def _worker(self, number: int):
+        while True:
+            # Cleared before claiming so an enqueue() during the claim is not missed
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Media worker {number} could not claim job: {e}")
+                job = None
+
+            if job:
+                heartbeat = asyncio.create_task(self._renew_lease(job["_id"]))
+                try:
+                    await self._process(job)
+                except Exception:
+                    # E.g. MongoDB unavailable while recording a failure: keep the worker alive,
+                    # the job is claimed again once its lease expires
+                    logger.exception(f"Media worker {number} could not finish job {job['_id']}")
+                finally:
+                    heartbeat.cancel()
+                continue
+
+            # Idle: wait for enqueue() or poll for expired leases and due retries
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self):
+        """Recover orphaned images and start the workers"""
+        try:
+            await self.recover()
+        except Exception as e:
+            logger.error(f"Media job recovery failed: {e}")
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        logger.info(f"Started {self.workers} media workers")
+
+    async def stop(self):
+        """Cancel workers; running jobs are retried after their lease expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def stats(self) -> Dict:
+        """Queue counters for monitoring"""
+        counts = {"queued": 0, "running": 0, "failed": 0}
+        async for row in self.db.cms_media_jobs.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return {"workers": self.workers, "processed": self.processed, "failedTotal": self.failed, **counts}
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+CMS Migrations Module
+Versioned index and data migrations, applied once on startup
+
+Usage (from backend/):
+    python cms_migrations.py             # apply pending migrations
+    python cms_migrations.py --dry-run   # only show what would be done
+"""
+from pymongo import IndexModel, UpdateOne, ASCENDING, DESCENDING
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Migration:
+    """
+    A single versioned migration
+    indexes: {collection: [IndexModel, ...]} created with create_indexes (idempotent)
+    apply: optional async callable(db, dry_run) for data changes, returns a summary string
+    """
+
+    def __init__(
+        self,
+        version: int,
+        description: str,
+        indexes: Optional[Dict[str, List[IndexModel]]] = None,
+        apply: Optional[Callable[..., Awaitable[str]]] = None
+    ):
+        self.version = version
+        self.description = description
+        self.indexes = indexes or {}
+        self.apply = apply
+
+
+# ============================================
+# DATA MIGRATIONS
+# ============================================
+
+async def convert_session_expiry(db, dry_run: bool) -> str:
+    """Convert ISO string expiresAt values to BSON dates (required by the TTL index)"""
+    query = {"expiresAt": {"$type": "string"}}
+    if dry_run:
+        count = await db.cms_sessions.count_documents(query)
+        return f"would convert expiresAt of {count} sessions"
+
+    converted = 0
+    batch = []
+    async for doc in db.cms_sessions.find(query, {"expiresAt": 1}):
+        expires_at = datetime.fromisoformat(doc["expiresAt"])
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"expiresAt": expires_at}}))
+        if len(batch) >= 500:
+            converted += (await db.cms_sessions.bulk_write(batch, ordered=False)).modified_count
+            batch = []
+    if batch:
+        converted += (await db.cms_sessions.bulk_write(batch, ordered=False)).modified_count
+    return f"converted expiresAt of {converted} sessions"
+
+
+async def backfill_visible(db, dry_run: bool) -> str:
+    """Set visible: true where the flag is missing or not a boolean (public queries match visible: true)"""
+    # Until now everything except visible: false counted as visible
+    query = {"visible": {"$nin": [True, False]}}
+    collections = ["cms_modules", "cms_faq", "cms_team", "cms_events"]
+    if dry_run:
+        counts = [await db[name].count_documents(query) for name in collections]
+        return f"would set visible on {sum(counts)} content documents"
+
+    updated = 0
+    for name in collections:
+        updated += (await db[name].update_many(query, {"$set": {"visible": True}})).modified_count
+    return f"set visible on {updated} content documents"
+
+
+# ============================================
+# REGISTRY (append only - never renumber)
+# ============================================
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "Initial indexes for content, users, sessions, media and form submissions",
+        indexes={
+            "cms_modules": [
+                IndexModel([("locale", ASCENDING), ("visible", ASCENDING), ("order", ASCENDING)], name="locale_visible_order"),
+                IndexModel([("locale", ASCENDING), ("order", ASCENDING)], name="locale_order"),
+            ],
+            "cms_faq": [
+                IndexModel([("locale", ASCENDING), ("visible", ASCENDING), ("order", ASCENDING)], name="locale_visible_order"),
+                IndexModel([("locale", ASCENDING), ("order", ASCENDING)], name="locale_order"),
+            ],
+            "cms_team": [
+                IndexModel([("locale", ASCENDING), ("visible", ASCENDING), ("order", ASCENDING)], name="locale_visible_order"),
+                IndexModel([("locale", ASCENDING), ("order", ASCENDING)], name="locale_order"),
+            ],
+            "cms_events": [
+                IndexModel([("visible", ASCENDING), ("order", ASCENDING)], name="visible_order"),
+                IndexModel([("order", ASCENDING)], name="order"),
+            ],
+            "cms_pages": [
+                IndexModel([("locale", ASCENDING), ("pageId", ASCENDING)], name="locale_pageId"),
+            ],
+            "cms_users": [
+                IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+            ],
+            "cms_sessions": [
+                IndexModel([("userId", ASCENDING)], name="userId"),
+            ],
+            "cms_media": [
+                IndexModel([("uploaded_at", DESCENDING)], name="uploaded_at_desc"),
+            ],
+            "bookings": [
+                IndexModel([("timestamp", DESCENDING)], name="timestamp_desc"),
+                IndexModel([("email", ASCENDING)], name="email"),
+            ],
+            "course_bookings": [
+                IndexModel([("timestamp", DESCENDING)], name="timestamp_desc"),
+                IndexModel([("email", ASCENDING)], name="email"),
+            ],
+            "contacts": [
+                IndexModel([("timestamp", DESCENDING)], name="timestamp_desc"),
+                IndexModel([("email", ASCENDING)], name="email"),
+            ],
+        }
+    ),
+    Migration(
+        2,
+        "Session expiry as BSON date with TTL index",
+        indexes={
+            "cms_sessions": [
+                IndexModel([("expiresAt", ASCENDING)], name="expiresAt_ttl", expireAfterSeconds=0),
+            ],
+        },
+        apply=convert_session_expiry
+    ),
+    Migration(
+        3,
+        "Media job queue and image processing status",
+        indexes={
+            "cms_media_jobs": [
+                IndexModel([("status", ASCENDING), ("createdAt", ASCENDING)], name="status_createdAt"),
+            ],
+            "cms_media": [
+                IndexModel([("status", ASCENDING)], name="status"),
+            ],
+        }
+    ),
+    Migration(
+        4,
+        "Media request counts for disk cache warm-up",
+        indexes={
+            "cms_media_stats": [
+                IndexModel([("hits", DESCENDING)], name="hits_desc"),
+            ],
+        }
+    ),
+    Migration(
+        5,
+        "Content hash of uploaded media for deduplication",
+        indexes={
+            "cms_media": [
+                IndexModel([("sha256", ASCENDING)], name="sha256", sparse=True),
+            ],
+        }
+    ),
+    Migration(
+        6,
+        "Keyset pagination and filters of the admin media library",
+        indexes={
+            "cms_media": [
+                IndexModel([("uploaded_at", DESCENDING), ("_id", DESCENDING)], name="uploaded_at_id_desc"),
+                IndexModel(
+                    [("content_type", ASCENDING), ("uploaded_at", DESCENDING), ("_id", DESCENDING)],
+                    name="content_type_uploaded_at_id_desc"
+                ),
+            ],
+        }
+    ),
+    Migration(
+        7,
+        "Explicit visible flag on public content (index-friendly visible: true queries)",
+        apply=backfill_visible
+    ),
+]
+
+
+class CMSMigrations:
+    """
+    Applies pending migrations in version order
+    Applied versions are recorded in the cms_migrations collection
+    """
+
+    def __init__(self, db, migrations: Optional[List[Migration]] = None):
+        self.db = db
+        self.migrations = sorted(migrations or MIGRATIONS, key=lambda m: m.version)
+
+    async def applied_versions(self) -> set:
+        """Versions already recorded as applied"""
+        cursor = self.db.cms_migrations.find({}, {"_id": 1})
+        return {doc["_id"] async for doc in cursor}
+
+    async def pending(self) -> List[Migration]:
+        """Migrations not yet applied"""
+        applied = await self.applied_versions()
+        return [m for m in self.migrations if m.version not in applied]
+
+    async def run(self, dry_run: bool = False) -> List[Dict]:
+        """
+        Apply pending migrations, stopping at the first failure
+        Returns one result dict per migration attempted
+        """
+        results = []
+        pending = await self.pending()
+        if not pending:
+            logger.info("Migrations up to date")
+            return results
+
+        for migration in pending:
+            prefix = "[dry-run] " if dry_run else ""
+            logger.info(f"{prefix}Migration {migration.version}: {migration.description}")
+            try:
+                steps = []
+                for collection, models in migration.indexes.items():
+                    names = [model.document["name"] for model in models]
+                    if not dry_run:
+                        await self.db[collection].create_indexes(models)
+                    steps.append(f"{collection}: {', '.join(names)}")
+                    logger.info(f"{prefix}  index {collection}: {', '.join(names)}")
+
+                if migration.apply:
+                    summary = await migration.apply(self.db, dry_run)
+                    steps.append(summary)
+                    logger.info(f"{prefix}  {summary}")
+
+                if not dry_run:
+                    await self.db.cms_migrations.insert_one({
+                        "_id": migration.version,
+                        "description": migration.description,
+                        "appliedAt": datetime.now(timezone.utc).isoformat()
+                    })
+
+                results.append({"version": migration.version, "success": True, "steps": steps})
+            except Exception as e:
+                logger.error(f"Migration {migration.version} failed: {e}")
+                results.append({"version": migration.version, "success": False, "error": str(e)})
+                break
+
+        return results
+
+
+def main():
+    import argparse
+    import asyncio
+    import os
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Apply CMS database migrations")
+    parser.add_argument("--dry-run", action="store_true", help="show pending migrations without applying them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    load_dotenv(Path(__file__).parent / '.env')
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            results = await CMSMigrations(client[os.environ['DB_NAME']]).run(dry_run=args.dry_run)
+        finally:
+            client.close()
+        return all(result["success"] for result in results)
+
+    raise SystemExit(0 if asyncio.run(run()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+CMS Session Store Module
+Pluggable storage for admin sessions: MongoDB, in-process memory or Redis
+"""
+from abc import ABC, abstractmethod
+from pymongo import UpdateOne
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def as_utc(value) -> datetime:
+    """Normalize a stored timestamp (ISO string or naive/aware datetime) to aware UTC"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        # MongoDB returns naive datetimes in UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class SessionStore(ABC):
+    """
+    Session storage interface
+    Sessions are dicts with _id, userId, email, expiresAt (datetime) and lastActivity
+    """
+
+    @abstractmethod
+    async def create(self, session: Dict):
+        """Store a new session"""
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[Dict]:
+        """Return the session if it exists and has not expired"""
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> bool:
+        """Delete a session, returns True if it existed"""
+
+    @abstractmethod
+    async def touch_many(self, activity: Dict[str, str]):
+        """Set lastActivity for several sessions ({session_id: iso timestamp})"""
+
+    async def cleanup_expired(self) -> int:
+        """Remove expired sessions, returns number removed (stores with native expiry keep this default)"""
+        return 0
+
+
+class MongoSessionStore(SessionStore):
+    """Sessions in the cms_sessions collection, expired by a TTL index on expiresAt"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def create(self, session: Dict):
+        await self.db.cms_sessions.insert_one(session)
+
+    async def get(self, session_id: str) -> Optional[Dict]:
+        # Expired documents are removed by the TTL index; until then the filter skips them
+        return await self.db.cms_sessions.find_one({
+            "_id": session_id,
+            "expiresAt": {"$gt": datetime.now(timezone.utc)}
+        })
+
+    async def delete(self, session_id: str) -> bool:
+        result = await self.db.cms_sessions.delete_one({"_id": session_id})
+        return result.deleted_count > 0
+
+    async def touch_many(self, activity: Dict[str, str]):
+        await self.db.cms_sessions.bulk_write(
+            [UpdateOne({"_id": sid}, {"$set": {"lastActivity": ts}}) for sid, ts in activity.items()],
+            ordered=False
+        )
+
+    async def cleanup_expired(self) -> int:
+        result = await self.db.cms_sessions.delete_many({"expiresAt": {"$lt": datetime.now(timezone.utc)}})
+        return result.deleted_count
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions in process memory - for single-worker deployments and tests
+    Sessions are lost on restart and not shared between uvicorn workers
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, Dict] = {}
+
+    async def create(self, session: Dict):
+        self._sessions[session["_id"]] = dict(session)
+
+    async def get(self, session_id: str) -> Optional[Dict]:
+        session = self._sessions.get(session_id)
+        if not session:
+            return None
+        if as_utc(session["expiresAt"]) <= datetime.now(timezone.utc):
+            del self._sessions[session_id]
+            return None
+        return dict(session)
+
+    async def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    async def touch_many(self, activity: Dict[str, str]):
+        for sid, ts in activity.items():
+            if sid in self._sessions:
+                self._sessions[sid]["lastActivity"] = ts
+
+    async def cleanup_expired(self) -> int:
+        now = datetime.now(timezone.utc)
+        expired = [sid for sid, s in self._sessions.items() if as_utc(s["expiresAt"]) <= now]
+        for sid in expired:
+            del self._sessions[sid]
+        return len(expired)
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions as JSON strings in Redis (or any Redis-protocol server)
+    Keys expire natively at expiresAt; requires the optional redis package
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", client=None, prefix: str = "cms:session:"):
+        if client is None:
+            try:
+                import redis.asyncio as redis_asyncio
+            except ImportError:
+                raise RuntimeError("RedisSessionStore requires the 'redis' package")
+            client = redis_asyncio.from_url(url, decode_responses=True)
+        self.redis = client
+        self.prefix = prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    @staticmethod
+    def _encode(session: Dict) -> str:
+        return json.dumps(session, default=lambda v: v.isoformat() if isinstance(v, datetime) else str(v))
+
+    @staticmethod
+    def _decode(raw) -> Dict:
+        session = json.loads(raw)
+        session["expiresAt"] = as_utc(session["expiresAt"])
+        return session
+
+    async def create(self, session: Dict):
+        await self.redis.set(self._key(session["_id"]), self._encode(session), exat=as_utc(session["expiresAt"]))
+
+    async def get(self, session_id: str) -> Optional[Dict]:
+        raw = await self.redis.get(self._key(session_id))
+        return self._decode(raw) if raw else None
+
+    async def delete(self, session_id: str) -> bool:
+        return await self.redis.delete(self._key(session_id)) > 0
+
+    async def touch_many(self, activity: Dict[str, str]):
+        session_ids = list(activity)
+        values = await self.redis.mget([self._key(sid) for sid in session_ids])
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for sid, raw in zip(session_ids, values):
+                if not raw:
+                    continue
+                session = self._decode(raw)
+                session["lastActivity"] = activity[sid]
+                # xx: never resurrect a session that expired meanwhile; keepttl: keep its expiry
+                pipe.set(self._key(sid), self._encode(session), xx=True, keepttl=True)
+            await pipe.execute()
+
+
+def create_session_store(kind: str, db=None, redis_url: Optional[str] = None) -> SessionStore:
+    """Build a session store from config (mongo, memory or redis)"""
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "redis":
+        return RedisSessionStore(url=redis_url or "redis://localhost:6379/0")
+    if kind == "mongo":
+        return MongoSessionStore(db)
+    raise ValueError(f"Unknown session store: {kind}")
@@ -1,198 +1,684 @@
 """
-CMS Storage Module - MongoDB GridFS Image Handling
-Handles image uploads, derivates, and serving
+CMS Storage Module - Image Handling
+Handles image uploads, derivates, and serving; files live in a pluggable media backend
 """
-from motor.motor_asyncio import AsyncIOMotorGridFSBucket
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 from io import BytesIO
 import uuid
-from datetime import datetime, timezone
-from typing import Optional, Dict
+import anyio
+import asyncio
+import base64
+import hashlib
+import json
+import re
+from datetime import datetime, timezone, timedelta
+from typing import Awaitable, BinaryIO, Callable, Optional, Dict
+import os
+import tempfile
+import time
 import logging
 
+from cms_imaging import ImagePool, OUTPUT_FORMATS, available_formats, plan_derivates, read_dimensions, sniff_image_type
+from cms_media_cache import DiskMediaCache
+from cms_media_backends import GridFSMediaBackend, MediaBackend, StoredFile, read_limited
+from cms_cache import SingleFlight
+
 logger = logging.getLogger(__name__)
 
 
 class CMSStorage:
     """
-    Image storage using MongoDB GridFS
+    Image storage with metadata in MongoDB (cms_media) and files in a media backend
+    (GridFS by default, local directory or S3 - see cms_media_backends)
     Supports auto-generation of derivates (320, 960, 1920px)
-    Later switchable to S3 without API changes
     """
     
-    def __init__(self, db):
+    def __init__(
+        self,
+        db,
+        image_pool: Optional[ImagePool] = None,
+        cache: Optional[DiskMediaCache] = None,
+        backend: Optional[MediaBackend] = None
+    ):
         self.db = db
-        self.fs = AsyncIOMotorGridFSBucket(db, bucket_name="cms_images")
+        self.backend = backend or GridFSMediaBackend(db)
+        self.image_pool = image_pool or ImagePool()
+        self.cache = cache
         self.derivate_sizes = [320, 960, 1920]
+        # Widths available on demand via /api/media/{id}?w= (requests are snapped to these)
+        self.allowed_widths = [160, 320, 480, 640, 800, 960, 1280, 1600, 1920, 2560]
+        self._variant_flight = SingleFlight()
+        # Every derivate is encoded in each format; AVIF only if this Pillow build supports it
+        self.derivate_formats = available_formats()
         self.max_file_size = 10 * 1024 * 1024  # 10MB
         self.allowed_types = ['image/jpeg', 'image/png', 'image/webp']
+        self.max_pixels = 40_000_000  # 40 megapixels, decoded RGB ~120MB
     
     async def upload_image(
         self, 
-        file_data: bytes, 
+        source: BinaryIO, 
         filename: str, 
         content_type: str,
-        alt_text: str = ""
+        alt_text: str = "",
+        sha256: Optional[str] = None,
+        on_stored: Optional[Callable[[str], Awaitable]] = None
     ) -> Dict:
         """
-        Upload image and create derivates
-        Returns: { original, derivates, metadata }
+        Upload original image; derivates are created later by the media job queue
+        source: seekable binary file (e.g. the spooled UploadFile), streamed to the backend in chunks
+        sha256: digest from hash_upload() if the caller already computed it
+        on_stored: called with the new image id (e.g. to queue its job), not for duplicates
+        Returns: { id, original, derivates (empty until ready), status: processing, duplicate }
+        Re-uploads of identical bytes return the existing image (duplicate: True) without storing anything
         """
-        # Validate
-        if len(file_data) > self.max_file_size:
-            raise ValueError(f"File too large. Max {self.max_file_size / 1024 / 1024}MB")
+        # Validate the real type (magic bytes) and dimensions before anything is decoded or stored
+        width, height, detected_type = self._inspect(source)
+        if detected_type != content_type:
+            logger.info(f"Upload {filename}: declared {content_type}, detected {detected_type}")
+        content_type = detected_type
         
-        if content_type not in self.allowed_types:
-            raise ValueError(f"Invalid file type. Allowed: {self.allowed_types}")
+        sha256 = sha256 or await self.hash_upload(source)
+        existing = await self._find_duplicate(sha256, alt_text)
+        if existing:
+            logger.info(f"Upload {filename} is a duplicate of image {existing['id']}")
+            return existing
         
         # Generate unique ID
         image_id = str(uuid.uuid4())
         
         try:
-            # Open image with Pillow
-            img = Image.open(BytesIO(file_data))
-            
-            # Convert RGBA to RGB if needed
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # Store original
+            # Store original (aborted once max_file_size is exceeded)
             original_key = f"{image_id}_original"
-            await self._store_to_gridfs(original_key, file_data, content_type, {
+            size = await self.backend.put(original_key, source, content_type, {
                 "type": "original",
                 "image_id": image_id,
                 "filename": filename,
                 "alt_text": alt_text,
-                "width": img.width,
-                "height": img.height,
+                "width": width,
+                "height": height,
                 "uploaded_at": datetime.now(timezone.utc).isoformat()
-            })
+            }, max_size=self.max_file_size)
             
-            # Create derivates
-            derivates = {}
-            for size in self.derivate_sizes:
-                derivate_data = await self._create_derivate(img, size)
-                derivate_key = f"{image_id}_{size}"
-                
-                await self._store_to_gridfs(derivate_key, derivate_data, "image/webp", {
-                    "type": "derivate",
-                    "image_id": image_id,
-                    "size": size,
-                    "format": "webp"
+            # Metadata and on_stored run to completion even if the request is cancelled meanwhile:
+            # an image inserted without its job would stay in "processing" until the next restart
+            with anyio.CancelScope(shield=True):
+                await self.db.cms_media.insert_one({
+                    "_id": image_id,
+                    "filename": filename,
+                    "content_type": content_type,
+                    "alt_text": alt_text,
+                    "original": {
+                        "key": original_key,
+                        "url": f"/api/media/serve/{original_key}",
+                        "width": width,
+                        "height": height,
+                        "size": size
+                    },
+                    "derivates": {},
+                    "sha256": sha256,
+                    "status": "processing",
+                    "uploaded_at": datetime.now(timezone.utc).isoformat()
                 })
-                
-                derivates[str(size)] = f"/api/media/serve/{derivate_key}"
-            
-            # Store metadata in collection
-            await self.db.cms_media.insert_one({
-                "_id": image_id,
-                "filename": filename,
-                "content_type": content_type,
-                "alt_text": alt_text,
-                "original": {
-                    "key": original_key,
-                    "url": f"/api/media/serve/{original_key}",
-                    "width": img.width,
-                    "height": img.height,
-                    "size": len(file_data)
-                },
-                "derivates": derivates,
-                "uploaded_at": datetime.now(timezone.utc).isoformat()
-            })
+                if on_stored:
+                    await on_stored(image_id)
             
             logger.info(f"Image uploaded successfully: {image_id}")
             
             return {
                 "id": image_id,
                 "original": f"/api/media/serve/{original_key}",
-                "derivates": derivates,
-                "alt_text": alt_text
+                "derivates": {},
+                "alt_text": alt_text,
+                "status": "processing",
+                "duplicate": False
             }
             
         except Exception as e:
             logger.error(f"Error uploading image: {e}")
             raise
     
-    async def _create_derivate(self, img: Image.Image, max_width: int) -> bytes:
-        """Create resized derivate as WebP"""
-        # Calculate new size maintaining aspect ratio
-        ratio = max_width / img.width
-        new_height = int(img.height * ratio)
-        
-        # Resize
-        resized = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Convert to WebP
-        output = BytesIO()
-        resized.save(output, format='WEBP', quality=80, method=6)
-        output.seek(0)
-        
-        return output.read()
-    
-    async def _store_to_gridfs(self, key: str, data: bytes, content_type: str, metadata: dict):
-        """Store file in GridFS"""
-        await self.fs.upload_from_stream(
-            key,
-            BytesIO(data),
-            metadata={
-                "content_type": content_type,
-                **metadata
+    async def hash_upload(self, source: BinaryIO) -> str:
+        """SHA-256 of an upload (the duplicate key), ValueError if it exceeds max_file_size"""
+        return await asyncio.to_thread(self._hash_source, source)
+    
+    def _hash_source(self, source: BinaryIO) -> str:
+        """SHA-256 of the upload (read in chunks, runs in a thread); rejects oversized files before storing"""
+        digest = hashlib.sha256()
+        try:
+            for chunk in read_limited(source, 1024 * 1024, self.max_file_size):
+                digest.update(chunk)
+        finally:
+            source.seek(0)
+        return digest.hexdigest()
+    
+    async def _find_duplicate(self, sha256: str, alt_text: str) -> Optional[Dict]:
+        """
+        Existing image with the same content, as an upload result (None if there is none)
+        A new alt text fills an empty one, a different one is kept as an alternative in alt_texts
+        """
+        # Failed images are not reused: their upload is stored again and processed from scratch
+        meta = await self.db.cms_media.find_one(
+            {"sha256": sha256, "status": {"$ne": "failed"}},
+            {"original": 1, "derivates": 1, "alt_text": 1, "status": 1}
+        )
+        if not meta:
+            return None
+        
+        if alt_text and alt_text != meta.get("alt_text"):
+            if meta.get("alt_text"):
+                update = {"$addToSet": {"alt_texts": alt_text}}
+            else:
+                update = {"$set": {"alt_text": alt_text}}
+            await self.db.cms_media.update_one({"_id": meta["_id"]}, update)
+        
+        return {
+            "id": meta["_id"],
+            "original": meta["original"]["url"],
+            "derivates": meta.get("derivates", {}),
+            "alt_text": alt_text or meta.get("alt_text", ""),
+            "status": meta.get("status", "ready"),
+            "duplicate": True
+        }
+    
+    def _inspect(self, source: BinaryIO):
+        """
+        Sniff format and read dimensions from the header only
+        Returns (width, height, content_type), raises ValueError for rejected files
+        """
+        content_type = sniff_image_type(source.read(16))
+        source.seek(0)
+        if content_type not in self.allowed_types:
+            raise ValueError(f"Invalid file type. Allowed: {self.allowed_types}")
+        
+        try:
+            width, height = read_dimensions(source, content_type)
+        except Image.DecompressionBombError:
+            # Raised by Pillow itself for extreme sizes
+            raise ValueError(self._too_many_pixels)
+        except (OSError, SyntaxError):
+            raise ValueError("Invalid image file")
+        finally:
+            source.seek(0)
+        
+        self._check_pixels(width, height)
+        return width, height, content_type
+    
+    @property
+    def _too_many_pixels(self) -> str:
+        return f"Image too large. Max {self.max_pixels // 1_000_000} megapixels"
+    
+    def _check_pixels(self, width: int, height: int):
+        # Decompression bomb guard: a few KB of PNG can declare billions of pixels
+        if width * height > self.max_pixels:
+            raise ValueError(self._too_many_pixels)
+    
+    async def process_derivates(self, image_id: str) -> Optional[Dict]:
+        """
+        Create derivates for an uploaded image (called by the media job queue)
+        Idempotent: derivates of a previous attempt are replaced by files under new keys
+        Returns None if the image was deleted in the meantime
+        """
+        meta = await self.db.cms_media.find_one({"_id": image_id})
+        if not meta:
+            logger.info(f"Skipping derivates, image deleted: {image_id}")
+            return None
+        
+        path = await self._spool_original(meta)
+        try:
+            # Plan from the header: never upscale, sizes above the image width share one file
+            with Image.open(path) as img:
+                image_format = img.format
+                # Also covers images uploaded before the upload check existed
+                self._check_pixels(img.width, img.height)
+                plan = plan_derivates(img.width, self.derivate_sizes)
+            widths = sorted(set(plan.values()))
+            
+            # Decode/resize/encode in the process pool
+            started = time.monotonic()
+            encoded = await self.image_pool.create_derivates(path, widths, image_format, self.derivate_formats)
+            total_seconds = time.monotonic() - started
+        finally:
+            os.unlink(path)
+        
+        derivates = {}
+        updates = {}
+        timings = {}
+        stored = {}
+        for size in self.derivate_sizes:
+            width = plan[size]
+            if width not in stored:
+                # Stored under the smallest size that maps to this width
+                files, timings[str(width)] = encoded[width]
+                stored[width] = await self._store_variant(image_id, size, width, files)
+            derivates[str(size)] = self._variant_url(stored[width])
+            updates[f"variants.{size}"] = stored[width]
+            updates[f"derivates.{size}"] = derivates[str(size)]
+            updates[f"derivate_widths.{size}"] = width
+        
+        await self.db.cms_media.update_one(
+            {"_id": image_id},
+            {"$set": {
+                **updates,
+                "processing": {
+                    "decode_path": "draft" if image_format == "JPEG" else "cascade",
+                    "seconds": round(total_seconds, 4),
+                    "steps": timings
+                },
+                "status": "ready",
+                "processed_at": datetime.now(timezone.utc).isoformat()
+            }, "$unset": {"error": ""}}
+        )
+        
+        # Files of a previous attempt are removed only now that nothing points to them any more
+        # (on-demand sizes may share files with a derivate size: those are kept)
+        current = await self.db.cms_media.find_one({"_id": image_id}, {"variants": 1}) or {}
+        old_keys = self._variant_keys(meta.get("variants") or {}, self.derivate_sizes) | self._legacy_derivate_keys(image_id, self.derivate_sizes)
+        stale_keys = sorted(old_keys - self._variant_keys(current.get("variants") or {}))
+        if stale_keys:
+            await self._delete_files(stale_keys)
+            if self.cache:
+                await self.cache.invalidate(stale_keys)
+        
+        logger.info(f"Derivates created: {image_id} ({image_format}, widths {widths}, {total_seconds:.2f}s)")
+        return derivates
+    
+    def snap_width(self, width: int) -> int:
+        """Smallest allowed width >= the requested one (the largest allowed width above that)"""
+        for allowed in self.allowed_widths:
+            if allowed >= width:
+                return allowed
+        return self.allowed_widths[-1]
+    
+    async def get_or_create_variant(self, image_id: str, size: int) -> Optional[Dict]:
+        """
+        Formats of one derivate size ({format: {key, url, width, bytes}}), generated on first request
+        Concurrent requests for the same size share one generation
+        Returns None if the image does not exist, or for a derivate_sizes entry not yet created by the job queue
+        Raises ValueError if the original cannot be processed
+        """
+        return await self._variant_flight.do((image_id, size), lambda: self._create_variant(image_id, size))
+    
+    async def _create_variant(self, image_id: str, size: int) -> Optional[Dict]:
+        meta = await self.db.cms_media.find_one({"_id": image_id}, {"original": 1, "variants": 1})
+        if not meta:
+            return None
+        variants = meta.get("variants") or {}
+        if str(size) in variants:
+            # Created meanwhile (e.g. by another worker)
+            return variants[str(size)]
+        if size in self.derivate_sizes:
+            # Owned by process_derivates: each size has a single writer (missing = still processing or failed)
+            return None
+        
+        # Never upscale: sizes above the image width reuse the native-width variant if there is one
+        width = min(size, meta["original"]["width"])
+        formats = next((f for f in variants.values() if all(v.get("width") == width for v in f.values())), None)
+        
+        if formats is None:
+            path = await self._spool_original(meta)
+            try:
+                try:
+                    with Image.open(path) as img:
+                        image_format = img.format
+                        self._check_pixels(img.width, img.height)
+                except Image.DecompressionBombError:
+                    raise ValueError(self._too_many_pixels)
+                except UnidentifiedImageError:
+                    raise ValueError("Invalid image file")
+                started = time.monotonic()
+                encoded = await self.image_pool.create_derivates(path, [width], image_format, self.derivate_formats)
+            finally:
+                os.unlink(path)
+            formats = await self._store_variant(image_id, size, width, encoded[width][0])
+            logger.info(f"On-demand derivate created: {image_id} {size} ({width}px, {time.monotonic() - started:.2f}s)")
+        
+        result = await self.db.cms_media.update_one(
+            {"_id": image_id},
+            {"$set": {
+                f"variants.{size}": formats,
+                f"derivates.{size}": self._variant_url(formats),
+                f"derivate_widths.{size}": width
+            }}
+        )
+        if result.matched_count == 0:
+            # Image deleted while encoding
+            await self._delete_files([entry["key"] for entry in formats.values()])
+            return None
+        return formats
+    
+    async def _spool_original(self, meta: Dict) -> str:
+        """
+        Copy the original to a temp file, returns its path (caller removes it)
+        Workers open it by path instead of receiving a pickled copy of the bytes per task
+        """
+        spool = tempfile.NamedTemporaryFile(prefix="cms_original_", delete=False)
+        try:
+            with spool:
+                stored = await self._open_file(meta["original"]["key"])
+                if not stored:
+                    raise ValueError(f"Original missing for image {meta['_id']}")
+                async for chunk in stored.iter_range():
+                    await asyncio.to_thread(spool.write, chunk)
+        except BaseException:
+            os.unlink(spool.name)
+            raise
+        return spool.name
+    
+    async def _store_variant(self, image_id: str, size: int, width: int, files: Dict[str, bytes]) -> Dict:
+        """
+        Store encoded files of one size, returns {format: {key, url, width, bytes}}
+        Keys already stored hold the same bytes (content-hashed) and are not written again:
+        on GridFS a second put would add another revision instead of replacing the file
+        """
+        keys = {fmt: self._derivate_key(image_id, size, fmt, data) for fmt, data in files.items()}
+        existing = await self.backend.existing_keys(keys.values())
+        formats = {}
+        for fmt, data in files.items():
+            derivate_key = keys[fmt]
+            if derivate_key not in existing:
+                await self._store_file(derivate_key, data, OUTPUT_FORMATS[fmt][1], {
+                    "type": "derivate",
+                    "image_id": image_id,
+                    "size": size,
+                    "width": width,
+                    "format": fmt
+                })
+            formats[fmt] = {
+                "key": derivate_key,
+                "url": f"/api/media/serve/{derivate_key}",
+                "width": width,
+                "bytes": len(data)
             }
+        return formats
+    
+    @staticmethod
+    def _variant_url(formats: Dict) -> str:
+        # cms_media.derivates keeps WebP URLs as before for existing clients
+        return (formats.get("webp") or next(iter(formats.values())))["url"]
+    
+    @staticmethod
+    def _derivate_key(image_id: str, size: int, fmt: str, data: bytes) -> str:
+        """
+        {id}_{size}_{format}.{content hash}: a re-encoded derivate gets a new key,
+        so files served with immutable caching never change under their URL
+        """
+        return f"{image_id}_{size}_{fmt}.{hashlib.sha256(data).hexdigest()[:16]}"
+    
+    @staticmethod
+    def _legacy_derivate_keys(image_id: str, sizes) -> set:
+        """Unversioned keys of derivates created before content-hashed keys"""
+        keys = set()
+        for size in sizes:
+            keys.add(f"{image_id}_{size}")
+            keys.update(f"{image_id}_{size}_{fmt}" for fmt in OUTPUT_FORMATS)
+        return keys
+    
+    @staticmethod
+    def _variant_keys(variants: Dict, sizes=None) -> set:
+        """Keys referenced by cms_media.variants (only the given sizes if set)"""
+        return {
+            entry["key"]
+            for size, formats in variants.items()
+            if sizes is None or int(size) in sizes
+            for entry in formats.values()
+        }
+    
+    async def get_variants(self, image_id: str) -> Optional[Dict]:
+        """
+        Derivate variants per size: {size: {format: {key, url, width, bytes}}}
+        Images processed before multi-format derivates only have WebP (without sizes)
+        """
+        meta = await self.db.cms_media.find_one({"_id": image_id}, {"variants": 1, "derivates": 1})
+        if not meta:
+            return None
+        if meta.get("variants"):
+            return meta["variants"]
+        return {
+            size: {"webp": {"key": url.rsplit("/", 1)[-1], "url": url}}
+            for size, url in meta.get("derivates", {}).items()
+        }
+    
+    async def mark_failed(self, image_id: str, error: str):
+        """Mark image as failed after derivate generation gave up"""
+        await self.db.cms_media.update_one(
+            {"_id": image_id},
+            {"$set": {"status": "failed", "error": error}}
         )
     
-    async def get_file(self, key: str) -> Optional[tuple]:
+    async def get_status(self, image_id: str) -> Optional[Dict]:
+        """Processing status of an image: processing, ready or failed"""
+        meta = await self.db.cms_media.find_one({"_id": image_id}, {"derivates": 1, "status": 1, "error": 1, "processing": 1})
+        if not meta:
+            return None
+        return {
+            "id": image_id,
+            # Images uploaded before the job queue have no status field
+            "status": meta.get("status", "ready"),
+            "derivates": meta.get("derivates", {}),
+            "processing": meta.get("processing"),
+            "error": meta.get("error")
+        }
+    
+    async def _store_file(self, key: str, data: bytes, content_type: str, metadata: dict):
+        """Store encoded bytes in the media backend"""
+        await self.backend.put(key, BytesIO(data), content_type, metadata)
+    
+    async def get_file(self, key: str) -> Optional[StoredFile]:
         """
-        Get file from GridFS
-        Returns: (data, content_type) or None
+        Open file for streaming, from the disk cache if present, else from the media backend
+        Backend hits are copied to the disk cache in the background
+        Disk cache hits must be released once sent (StoredFile.release, done by media_file_response)
+        Returns: StoredFile or None if not found
         """
+        if not self.cache:
+            return await self._open_file(key)
+        
+        cached = self.cache.get(key)
+        if cached:
+            await self.cache.record(key)
+            return StoredFile(
+                key=key,
+                length=cached.length,
+                content_type=cached.content_type,
+                upload_date=cached.upload_date,
+                file_id=cached.file_id,
+                path=cached.path,
+                release=lambda: self.cache.release(cached.path)
+            )
+        
+        stored = await self._open_file(key)
+        if stored:
+            await self.cache.record(key)
+            if self.cache.accepts(stored.length):
+                # Separate stream: the one returned is consumed by the response
+                self.cache.schedule_fill(key, lambda: self._open_file(key))
+        return stored
+    
+    async def _open_file(self, key: str) -> Optional[StoredFile]:
+        """Open file from the media backend"""
         try:
-            grid_out = await self.fs.open_download_stream_by_name(key)
-            data = await grid_out.read()
-            content_type = grid_out.metadata.get('content_type', 'application/octet-stream')
-            return (data, content_type)
+            return await self.backend.open(key)
         except Exception as e:
             logger.error(f"Error retrieving file {key}: {e}")
             return None
     
     async def delete_image(self, image_id: str) -> bool:
-        """Delete image and all derivates"""
+        """
+        Delete image metadata, then all of its files with one listing/query per backend
+        Files left behind by a failure are reclaimed by the media garbage collector (cms_media_gc.py)
+        """
         try:
-            # Get metadata
-            meta = await self.db.cms_media.find_one({"_id": image_id})
+            meta = await self.db.cms_media.find_one_and_delete({"_id": image_id}, {"original.key": 1, "variants": 1})
             if not meta:
                 return False
-            
-            # Delete original
-            await self._delete_from_gridfs(meta['original']['key'])
-            
-            # Delete derivates
-            for size in self.derivate_sizes:
-                await self._delete_from_gridfs(f"{image_id}_{size}")
-            
-            # Delete metadata
-            await self.db.cms_media.delete_one({"_id": image_id})
-            
-            logger.info(f"Image deleted: {image_id}")
-            return True
-            
+            # A queued derivate job would only recreate files of a deleted image
+            await self.db.cms_media_jobs.delete_one({"_id": image_id})
         except Exception as e:
             logger.error(f"Error deleting image {image_id}: {e}")
             return False
+        
+        # Every key of an image starts with its id: {id}_original, {id}_{size}[_{format}[.{hash}]]
+        sizes = set(self.derivate_sizes + self.allowed_widths)
+        keys = {
+            meta['original']['key'],
+            *self._variant_keys(meta.get("variants") or {}),
+            *self._legacy_derivate_keys(image_id, sizes)
+        }
+        try:
+            keys.update(await self.backend.delete_prefix(f"{image_id}_"))
+        except Exception as e:
+            logger.error(f"Error deleting files of image {image_id} (left for garbage collection): {e}")
+        
+        if self.cache:
+            await self.cache.invalidate(keys)
+        
+        logger.info(f"Image deleted: {image_id}")
+        return True
     
-    async def _delete_from_gridfs(self, key: str):
-        """Delete file from GridFS by name"""
+    async def _delete_files(self, keys: list):
+        """Delete files from the media backend in one batch"""
         try:
-            cursor = self.fs.find({"filename": key})
-            async for grid_file in cursor:
-                await self.fs.delete(grid_file._id)
+            await self.backend.delete_many(keys)
         except Exception as e:
-            logger.error(f"Error deleting from GridFS: {e}")
+            logger.error(f"Error deleting files {', '.join(keys)}: {e}")
+    
+    async def warm_cache(self, limit: int = 100) -> int:
+        """Copy the most requested files to the disk cache (called on startup)"""
+        if not self.cache:
+            return 0
+        
+        warmed = 0
+        try:
+            for key in await self.cache.hot_keys(limit):
+                if await self.cache.fill(key, lambda key=key: self._open_file(key)):
+                    warmed += 1
+        except Exception as e:
+            logger.error(f"Error warming media cache: {e}")
+        logger.info(f"Media cache warmed with {warmed} files")
+        return warmed
+    
+    # Fields shown in the admin media grid (variants and processing details are fetched per image)
+    LIST_PROJECTION = {
+        "filename": 1,
+        "alt_text": 1,
+        "content_type": 1,
+        "original.url": 1,
+        "original.width": 1,
+        "original.height": 1,
+        "original.size": 1,
+        "derivates": 1,
+        "status": 1,
+        "uploaded_at": 1
+    }
+    
+    async def list_media(
+        self,
+        limit: int = 50,
+        after: Optional[str] = None,
+        q: Optional[str] = None,
+        content_type: Optional[str] = None,
+        uploaded_from: Optional[str] = None,
+        uploaded_to: Optional[str] = None,
+        skip: int = 0
+    ) -> Dict:
+        """
+        List media newest first with keyset pagination
+        after: opaque token from the previous page's "next" (None for the first page)
+        q: case-insensitive substring of filename or alt text; uploaded_from/to: ISO date or datetime
+        skip: deprecated offset paging for old clients, ignored when after is given
+        Returns: { media, next (None on the last page), total (first page only, else None) }
+        Raises ValueError for an invalid token or date
+        """
+        limit = max(1, min(limit, 200))
+        query = self._list_filter(q, content_type, uploaded_from, uploaded_to)
+        
+        page_query = query
+        if after:
+            uploaded_at, last_id = self._decode_list_token(after)
+            # Same sort key as the index (uploaded_at desc, _id desc): continue strictly below the last item
+            page_query = {"$and": [query, {"$or": [
+                {"uploaded_at": {"$lt": uploaded_at}},
+                {"uploaded_at": uploaded_at, "_id": {"$lt": last_id}}
+            ]}]}
+        
+        cursor = self.db.cms_media.find(page_query, self.LIST_PROJECTION) \
+            .sort([("uploaded_at", -1), ("_id", -1)])
+        if skip > 0 and not after:
+            cursor = cursor.skip(skip)
+        cursor = cursor.limit(limit + 1)
+        media = await cursor.to_list(length=limit + 1)
+        
+        next_token = None
+        if len(media) > limit:
+            media = media[:limit]
+            next_token = self._encode_list_token(media[-1])
+        
+        # Only the first page is counted; the unfiltered count comes from collection metadata
+        total = None
+        if not after and skip <= 0:
+            if query:
+                total = await self.db.cms_media.count_documents(query)
+            else:
+                total = await self.db.cms_media.estimated_document_count()
+        
+        return {"media": media, "next": next_token, "total": total}
     
-    async def list_media(self, skip: int = 0, limit: int = 50) -> list:
-        """List all media with pagination"""
-        cursor = self.db.cms_media.find().sort("uploaded_at", -1).skip(skip).limit(limit)
-        return await cursor.to_list(length=limit)
+    @staticmethod
+    def _list_filter(
+        q: Optional[str],
+        content_type: Optional[str],
+        uploaded_from: Optional[str],
+        uploaded_to: Optional[str]
+    ) -> Dict:
+        query = {}
+        if content_type:
+            query["content_type"] = content_type
+        if q:
+            pattern = {"$regex": re.escape(q), "$options": "i"}
+            query["$or"] = [{"filename": pattern}, {"alt_text": pattern}]
+        
+        # uploaded_at is an ISO string in UTC, which sorts and compares chronologically
+        uploaded = {}
+        if uploaded_from:
+            uploaded["$gte"] = CMSStorage._parse_list_date(uploaded_from).isoformat()
+        if uploaded_to:
+            end = CMSStorage._parse_list_date(uploaded_to)
+            if len(uploaded_to) == 10:
+                # A plain date includes the whole day
+                end += timedelta(days=1)
+                uploaded["$lt"] = end.isoformat()
+            else:
+                uploaded["$lte"] = end.isoformat()
+        if uploaded:
+            query["uploaded_at"] = uploaded
+        return query
+    
+    @staticmethod
+    def _parse_list_date(value: str) -> datetime:
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Invalid date: {value}")
+        if parsed.tzinfo is None:
+            return parsed.replace(tzinfo=timezone.utc)
+        return parsed.astimezone(timezone.utc)
+    
+    @staticmethod
+    def _encode_list_token(meta: Dict) -> str:
+        raw = json.dumps([meta.get("uploaded_at"), meta["_id"]], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def _decode_list_token(token: str):
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            value = json.loads(raw)
+            # Unpacking alone would also accept any two-key object or two-character string
+            if not isinstance(value, list) or len(value) != 2:
+                raise ValueError
+            uploaded_at, last_id = value
+            if not isinstance(uploaded_at, str) or not isinstance(last_id, str):
+                raise ValueError
+        except (ValueError, TypeError):
+            raise ValueError("Invalid page token")
+        return uploaded_at, last_id
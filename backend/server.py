@@ -1,15 +1,21 @@
-from fastapi import FastAPI, APIRouter, Request, UploadFile, File, Form, Cookie, Response, Depends, HTTPException, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, APIRouter, Request, UploadFile, File, Form, Cookie, Header, Query, Response, Depends, HTTPException, HTTPException
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import anyio
+import asyncio
+import json
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -17,12 +23,18 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
-from io import BytesIO
 
 # CMS Modules
 from cms_storage import CMSStorage
-from cms_auth import CMSAuth
+from cms_imaging import ImagePool, OUTPUT_FORMATS
+from cms_media_cache import DiskMediaCache
+from cms_media_backends import content_version, create_media_backend
+from cms_media_jobs import MediaJobQueue
+from cms_auth import CMSAuth, PasswordHashPool, PasswordPoolBusy
+from cms_sessions import create_session_store
 from cms_content import CMSContent
+from cms_cache import ContentCache
+from cms_migrations import CMSMigrations
 
 
 ROOT_DIR = Path(__file__).parent
@@ -34,9 +46,53 @@ client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
 # CMS Services
-cms_storage = CMSStorage(db)
-cms_auth = CMSAuth(db)
-cms_content = CMSContent(db)
+# Media files: gridfs (default), local or s3
+media_backend = create_media_backend(
+    os.environ.get('MEDIA_STORAGE_BACKEND', 'gridfs'),
+    db=db,
+    local_dir=os.environ.get('MEDIA_LOCAL_DIR', str(ROOT_DIR / 'media')),
+    s3_bucket=os.environ.get('S3_BUCKET'),
+    s3_prefix=os.environ.get('S3_PREFIX', ''),
+    s3_endpoint_url=os.environ.get('S3_ENDPOINT_URL'),
+    s3_region=os.environ.get('S3_REGION')
+)
+# Local disk cache for hot media files (MEDIA_CACHE_MAX_MB=0 disables it; not needed for local files)
+media_cache_max_mb = int(os.environ.get('MEDIA_CACHE_MAX_MB', '512'))
+media_cache = DiskMediaCache(
+    os.environ.get('MEDIA_CACHE_DIR', str(ROOT_DIR / 'media_cache')),
+    db=db,
+    max_bytes=media_cache_max_mb * 1024 * 1024
+) if media_cache_max_mb > 0 and media_backend.name != 'local' else None
+cms_storage = CMSStorage(db, image_pool=ImagePool(
+    max_workers=int(os.environ['IMAGE_WORKERS']) if os.environ.get('IMAGE_WORKERS') else None
+), cache=media_cache, backend=media_backend)
+media_jobs = MediaJobQueue(db, cms_storage, workers=int(os.environ.get('MEDIA_JOB_WORKERS', '2')))
+# Bulk upload: files per request, total body size and files stored concurrently
+MEDIA_BULK_UPLOAD_MAX_FILES = int(os.environ.get('MEDIA_BULK_UPLOAD_MAX_FILES', '50'))
+MEDIA_BULK_UPLOAD_MAX_MB = int(os.environ.get('MEDIA_BULK_UPLOAD_MAX_MB', '200'))
+MEDIA_BULK_UPLOAD_CONCURRENCY = int(os.environ.get('MEDIA_BULK_UPLOAD_CONCURRENCY', '4'))
+cms_auth = CMSAuth(
+    db,
+    hash_pool=PasswordHashPool(
+        max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', '2')),
+        max_queue_wait=float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', '5'))
+    ),
+    # mongo (default), memory (single worker only) or redis
+    session_store=create_session_store(
+        os.environ.get('SESSION_STORE', 'mongo'),
+        db=db,
+        redis_url=os.environ.get('REDIS_URL')
+    )
+)
+# Invalidations are shared between workers through cms_cache_generations
+content_cache = ContentCache(
+    max_entries=int(os.environ.get('CONTENT_CACHE_MAX_ENTRIES', '256')),
+    ttl=float(os.environ.get('CONTENT_CACHE_TTL', '300')),
+    db=db,
+    sync_interval=float(os.environ.get('CONTENT_CACHE_SYNC_INTERVAL', '1'))
+)
+cms_content = CMSContent(db, cache=content_cache)
+cms_migrations = CMSMigrations(db)
 
 # Custom key function for rate limiting behind proxy/ingress
 def get_remote_address_from_headers(request: Request) -> str:
@@ -172,6 +228,14 @@ async def send_email(to_email: str, subject: str, body: str, form_type: str = "b
         logger.error(f"Failed to send email: {e}")
         return False
 
+# Query parameter helper
+def parse_csv(value: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated query parameter (e.g. fields=title,order)"""
+    if not value:
+        return None
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    return items or None
+
 # Honeypot validation
 def check_honeypot(form_data):
     """Check if honeypot field is filled (indicates bot)"""
@@ -458,6 +522,9 @@ async def admin_login(request: Request, response: Response, login: LoginRequest)
             }
         }
         
+    except PasswordPoolBusy:
+        logger.warning(f"Login rejected, password pool saturated: {login.email}")
+        return {"success": False, "error": "Server ausgelastet, bitte später erneut versuchen"}
     except Exception as e:
         logger.error(f"Login error: {e}")
         return {"success": False, "error": "Serverfehler"}
@@ -509,11 +576,14 @@ async def admin_reset_password(
     if not session:
         return {"success": False, "error": "Session abgelaufen"}
     
-    success = await cms_auth.reset_password(
-        session["userId"],
-        reset.old_password,
-        reset.new_password
-    )
+    try:
+        success = await cms_auth.reset_password(
+            session["userId"],
+            reset.old_password,
+            reset.new_password
+        )
+    except PasswordPoolBusy:
+        return {"success": False, "error": "Server ausgelastet, bitte später erneut versuchen"}
     
     if success:
         return {"success": True, "message": "Passwort erfolgreich geändert"}
@@ -539,15 +609,14 @@ async def admin_media_upload(
         return {"success": False, "error": "Session abgelaufen"}
     
     try:
-        # Read file
-        file_data = await file.read()
-        
-        # Upload
+        # Stream the spooled upload (body size already capped by UploadSizeLimitMiddleware)
+        # Derivates are generated in the background (duplicates reuse the existing image)
         result = await cms_storage.upload_image(
-            file_data,
+            file.file,
             file.filename,
             file.content_type,
-            alt_text
+            alt_text,
+            on_stored=media_jobs.enqueue
         )
         
         return {"success": True, "image": result}
@@ -558,23 +627,345 @@ async def admin_media_upload(
         logger.error(f"Upload error: {e}")
         return {"success": False, "error": "Upload fehlgeschlagen"}
 
+@api_router.post("/admin/media/upload/bulk")
+@limiter.limit("5/minute")
+async def admin_media_upload_bulk(
+    request: Request,
+    cms_session: Optional[str] = Cookie(None)
+):
+    """
+    Upload many images in one multipart request (fields "files", optional "alt_text" for all)
+    Streams one NDJSON line per file as soon as it is stored, then a summary line;
+    failed files do not stop the others
+    """
+    # Check auth
+    if not cms_session:
+        return {"success": False, "error": "Nicht angemeldet"}
+    
+    session = await cms_auth.get_session(cms_session)
+    if not session:
+        return {"success": False, "error": "Session abgelaufen"}
+    
+    # Parsed here instead of File() parameters: FastAPI closes those before a streamed response is sent
+    try:
+        form = await request.form(max_files=MEDIA_BULK_UPLOAD_MAX_FILES)
+    except StarletteHTTPException:
+        # Raised by Starlette when max_files is exceeded
+        return {"success": False, "error": f"Zu viele Dateien (max. {MEDIA_BULK_UPLOAD_MAX_FILES})"}
+    
+    files = [item for item in form.getlist("files") if not isinstance(item, str)]
+    alt_text = form.get("alt_text") or ""
+    if not files:
+        await form.close()
+        return {"success": False, "error": "Keine Dateien übermittelt"}
+    
+    semaphore = asyncio.Semaphore(MEDIA_BULK_UPLOAD_CONCURRENCY)
+    
+    async def digest(file) -> Optional[str]:
+        async with semaphore:
+            try:
+                return await cms_storage.hash_upload(file.file)
+            except ValueError:
+                # Too large: reported by upload_image
+                return None
+    
+    async def upload_one(index: int, file, sha256: Optional[str], first, scope) -> Optional[dict]:
+        with scope:
+            if first is not None:
+                # Same content as an earlier file of this batch: stored once, this one becomes its duplicate
+                await asyncio.wait([first])
+            async with semaphore:
+                result = {"index": index, "filename": file.filename}
+                try:
+                    image = await cms_storage.upload_image(
+                        file.file,
+                        file.filename,
+                        file.content_type,
+                        alt_text,
+                        sha256=sha256,
+                        on_stored=media_jobs.enqueue
+                    )
+                    result.update(success=True, image=image)
+                except ValueError as e:
+                    result.update(success=False, error=str(e))
+                except Exception as e:
+                    logger.error(f"Bulk upload error ({file.filename}): {e}")
+                    result.update(success=False, error="Upload fehlgeschlagen")
+                return result
+        # Cancelled (client disconnected)
+        return None
+    
+    async def results():
+        # Cancelled through anyio scopes rather than Task.cancel(), so the shielded insert+enqueue holds
+        scopes = [anyio.CancelScope() for _ in files]
+        tasks = []
+        counts = {"uploaded": 0, "duplicates": 0, "failed": 0}
+        try:
+            # Hash the whole batch first: identical files would otherwise all miss the duplicate check
+            digests = await asyncio.gather(*(digest(file) for file in files))
+            first_by_digest = {}
+            for index, (file, sha256) in enumerate(zip(files, digests)):
+                first = first_by_digest.get(sha256) if sha256 else None
+                task = asyncio.create_task(upload_one(index, file, sha256, first, scopes[index]))
+                if sha256 and first is None:
+                    first_by_digest[sha256] = task
+                tasks.append(task)
+            
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                if not result["success"]:
+                    counts["failed"] += 1
+                elif result["image"]["duplicate"]:
+                    counts["duplicates"] += 1
+                else:
+                    counts["uploaded"] += 1
+                yield json.dumps(jsonable_encoder(result)) + "\n"
+            yield json.dumps({"done": True, "total": len(files), **counts}) + "\n"
+        finally:
+            # Client disconnected: files not yet stored are skipped. The request's cancel scope
+            # would cancel every await here too, so the cleanup is shielded to let the form close
+            with anyio.CancelScope(shield=True):
+                for scope in scopes:
+                    scope.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await form.close()
+    
+    return StreamingResponse(
+        results(),
+        media_type="application/x-ndjson",
+        # Deliver each line immediately through buffering reverse proxies
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"}
+    )
+
+def parse_range(range_header: Optional[str], length: int):
+    """
+    Parse a single-range Range header (bytes=start-end, bytes=start-, bytes=-suffix)
+    Returns (start, end) inclusive, None to serve the full file, or False if unsatisfiable
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        # Multiple ranges are not supported; a full response is valid per RFC 9110
+        return None
+    
+    start_text, _, end_text = range_header[6:].strip().partition("-")
+    try:
+        if start_text == "":
+            suffix = int(end_text)
+            if suffix <= 0 or length == 0:
+                return False
+            return (max(0, length - suffix), length - 1)
+        start = int(start_text)
+        end = int(end_text) if end_text else length - 1
+    except ValueError:
+        return None
+    
+    if start >= length or end < start:
+        return False
+    return (start, min(end, length - 1))
+
+# Media keys are never reused for different content (derivates carry a content hash), so responses can be cached forever
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# /api/media/{id}?w= keeps its URL when derivates are re-encoded: cached briefly, then revalidated by ETag
+MEDIA_VARIANT_CACHE_CONTROL = "public, max-age=3600"
+
+def not_modified_since(if_modified_since: Optional[str], last_modified: datetime) -> bool:
+    """Check an If-Modified-Since header (second precision)"""
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+class ReleasingResponse(Response):
+    """Sends the wrapped response, then calls release - also if the client disconnected or sending failed"""
+    
+    def __init__(self, response: Response, release):
+        self.response = response
+        self.release = release
+        self.status_code = response.status_code
+        self.raw_headers = response.raw_headers
+        self.background = None
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            self.release()
+
+def media_file_response(
+    request: Request,
+    stored,
+    range_header: Optional[str],
+    vary_accept: bool = False,
+    cache_control: str = MEDIA_CACHE_CONTROL
+):
+    """Response for a stored media file: conditional requests, single byte ranges, streaming"""
+    response = _media_file_response(request, stored, range_header, vary_accept, cache_control)
+    if stored.release:
+        # Disk cache hit: the per-response link goes once the file has been sent
+        return ReleasingResponse(response, stored.release)
+    return response
+
+def _media_file_response(request: Request, stored, range_header: Optional[str], vary_accept: bool, cache_control: str):
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Cache-Control": cache_control,
+        "ETag": stored.etag,
+        "Last-Modified": format_datetime(stored.last_modified, usegmt=True)
+    }
+    if vary_accept:
+        headers["Vary"] = "Accept"
+    
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, stored.etag) or (
+        not if_none_match and not_modified_since(request.headers.get("if-modified-since"), stored.last_modified)
+    ):
+        return Response(status_code=304, headers=headers)
+    
+    # A Range with a stale If-Range validator gets the full file
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != stored.etag:
+        range_header = None
+    
+    byte_range = parse_range(range_header, stored.length)
+    if byte_range is False:
+        # Not cached: the error depends on the request, not on the file
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{stored.length}"})
+    
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{stored.length}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(stored.iter_range(start, end), status_code=206, media_type=stored.content_type, headers=headers)
+    
+    if stored.path:
+        # Served by the ASGI server from disk (sendfile/pathsend where supported)
+        return FileResponse(stored.path, media_type=stored.content_type, headers=headers)
+    
+    headers["Content-Length"] = str(stored.length)
+    return StreamingResponse(stored.iter_range(), media_type=stored.content_type, headers=headers)
+
+def accepted_types(accept: Optional[str]) -> set:
+    """Media types listed in an Accept header with q > 0"""
+    types = set()
+    for part in (accept or "").split(","):
+        media_type, _, params = part.partition(";")
+        media_type = media_type.strip()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type and q > 0:
+            types.add(media_type.lower())
+    return types
+
+def negotiate_format(formats: dict, accept: Optional[str]) -> str:
+    """
+    Smallest variant the client accepts
+    AVIF/WebP only when listed explicitly (image/* is also sent by browsers without support),
+    JPEG is the universal fallback
+    """
+    accepted = accepted_types(accept)
+    candidates = [fmt for fmt in formats if fmt == "jpeg" or OUTPUT_FORMATS[fmt][1] in accepted]
+    if not candidates:
+        # Images processed before multi-format derivates only have WebP
+        candidates = list(formats)
+    return min(candidates, key=lambda fmt: formats[fmt].get("bytes", 0))
+
 @api_router.get("/media/serve/{key}")
-async def serve_media(key: str):
-    """Serve image from GridFS"""
-    result = await cms_storage.get_file(key)
-    if not result:
-        return {"error": "File not found"}
+async def serve_media(request: Request, key: str, range: Optional[str] = Header(None)):
+    """Stream image from storage (supports single byte ranges and conditional requests)"""
+    version = content_version(key)
+    if version and etag_matches(request.headers.get("if-none-match"), f'"{version}"'):
+        # Versioned keys never change content: revalidation needs no storage lookup
+        return Response(status_code=304, headers={"Cache-Control": MEDIA_CACHE_CONTROL, "ETag": f'"{version}"'})
+    stored = await cms_storage.get_file(key)
+    if not stored:
+        return JSONResponse({"error": "File not found"}, status_code=404)
+    return media_file_response(request, stored, range)
+
+@api_router.get("/media/{image_id}")
+async def serve_media_variant(
+    request: Request,
+    image_id: str,
+    w: Optional[int] = Query(None, ge=1),
+    fmt: Optional[str] = None,
+    range: Optional[str] = Header(None)
+):
+    """
+    Derivate of an image, w snapped to the allowed widths (default: largest existing derivate)
+    Missing widths are generated on first request and kept for later ones
+    Format from fmt (avif, webp, jpeg) or negotiated from the Accept header
+    """
+    variants = await cms_storage.get_variants(image_id)
+    if variants is None:
+        return JSONResponse({"error": "Image not found"}, status_code=404)
+    
+    if w is not None:
+        size = cms_storage.snap_width(w)
+        try:
+            formats = variants.get(str(size)) or await cms_storage.get_or_create_variant(image_id, size)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=422)
+        except Exception as e:
+            logger.error(f"Error creating derivate {image_id} {size}: {e}")
+            return JSONResponse({"error": "Derivate could not be created"}, status_code=503)
+        if not formats and size in cms_storage.derivate_sizes:
+            status = await cms_storage.get_status(image_id)
+            if status and status["status"] == "processing":
+                # Created by the media job queue shortly
+                return JSONResponse({"error": "Image is being processed"}, status_code=503, headers={"Retry-After": "5"})
+    else:
+        formats = variants[max(variants, key=int)] if variants else None
+    if not formats:
+        return JSONResponse({"error": "Image not found"}, status_code=404)
+    
+    if fmt:
+        if fmt not in formats:
+            return JSONResponse({"error": f"Format not available. Allowed: {list(formats)}"}, status_code=404)
+        chosen = fmt
+    else:
+        chosen = negotiate_format(formats, request.headers.get("accept"))
+    
+    stored = await cms_storage.get_file(formats[chosen]["key"])
+    if not stored:
+        return JSONResponse({"error": "File not found"}, status_code=404)
+    return media_file_response(request, stored, range, vary_accept=not fmt, cache_control=MEDIA_VARIANT_CACHE_CONTROL)
+
+@api_router.get("/admin/media/{image_id}/status")
+async def admin_media_status(
+    image_id: str,
+    cms_session: Optional[str] = Cookie(None)
+):
+    """Derivate processing status of an image"""
+    if not cms_session or not await cms_auth.get_session(cms_session):
+        return {"success": False, "error": "Nicht angemeldet"}
     
-    data, content_type = result
-    return StreamingResponse(BytesIO(data), media_type=content_type)
+    status = await cms_storage.get_status(image_id)
+    if not status:
+        return {"success": False, "error": "Bild nicht gefunden"}
+    return {"success": True, **status}
 
 @api_router.get("/admin/media")
 async def admin_media_list(
-    skip: int = 0,
     limit: int = 50,
+    after: Optional[str] = None,
+    q: Optional[str] = None,
+    content_type: Optional[str] = None,
+    uploaded_from: Optional[str] = None,
+    uploaded_to: Optional[str] = None,
+    skip: int = Query(0, deprecated=True),
     cms_session: Optional[str] = Cookie(None)
 ):
-    """List all media"""
+    """List media newest first; pass the returned "next" token as after= for the following page"""
     # Check auth
     if not cms_session:
         return {"success": False, "error": "Nicht angemeldet"}
@@ -583,8 +974,19 @@ async def admin_media_list(
     if not session:
         return {"success": False, "error": "Session abgelaufen"}
     
-    media = await cms_storage.list_media(skip, limit)
-    return {"success": True, "media": media}
+    try:
+        page = await cms_storage.list_media(
+            limit,
+            after=after,
+            q=q,
+            content_type=content_type,
+            uploaded_from=uploaded_from,
+            uploaded_to=uploaded_to,
+            skip=skip
+        )
+    except ValueError:
+        return {"success": False, "error": "Ungültiger Filter oder Seitenverweis"}
+    return {"success": True, **page}
 
 @api_router.delete("/admin/media/{image_id}")
 async def admin_media_delete(
@@ -606,6 +1008,23 @@ async def admin_media_delete(
     else:
         return {"success": False, "error": "Löschen fehlgeschlagen"}
 
+@api_router.get("/admin/stats")
+async def admin_stats(cms_session: Optional[str] = Cookie(None)):
+    """Runtime statistics (caches, pools)"""
+    if not cms_session or not await cms_auth.get_session(cms_session):
+        return {"success": False, "error": "Nicht angemeldet"}
+    
+    return {
+        "success": True,
+        "stats": {
+            "contentCache": content_cache.stats(),
+            "auth": cms_auth.stats(),
+            "imagePool": cms_storage.image_pool.stats(),
+            "mediaCache": media_cache.stats() if media_cache else None,
+            "mediaJobs": await media_jobs.stats()
+        }
+    }
+
 # Content Management Endpoints
 @api_router.get("/admin/content/site-global")
 async def get_site_global(cms_session: Optional[str] = Cookie(None)):
@@ -627,9 +1046,9 @@ async def update_site_global(data: dict, cms_session: Optional[str] = Cookie(Non
     return {"success": success}
 
 @api_router.get("/admin/content/{locale}/modules")
-async def get_modules(locale: str):
+async def get_modules(locale: str, fields: Optional[str] = None):
     """Get all modules for locale (no auth required)"""
-    modules = await cms_content.list_modules(locale)
+    modules = await cms_content.list_modules(locale, parse_csv(fields))
     return {"success": True, "modules": modules}
 
 @api_router.post("/admin/content/{locale}/modules")
@@ -657,14 +1076,14 @@ async def delete_module(locale: str, module_id: str):
 @api_router.put("/admin/content/{locale}/modules/reorder")
 async def reorder_modules(locale: str, ids: dict):
     """Reorder modules (no auth required)"""
-    success = await cms_content.reorder_modules(ids.get("module_ids", []))
-    return {"success": success}
+    modified = await cms_content.reorder_modules(ids.get("module_ids", []), locale)
+    return {"success": modified is not None, "modified": modified}
 
 # FAQ Endpoints
 @api_router.get("/admin/content/{locale}/faq")
-async def list_faq(locale: str):
+async def list_faq(locale: str, fields: Optional[str] = None):
     """List FAQ for locale (no auth required)"""
-    faq = await cms_content.list_faq(locale)
+    faq = await cms_content.list_faq(locale, parse_csv(fields))
     return {"success": True, "faq": faq}
 
 @api_router.post("/admin/content/{locale}/faq")
@@ -688,8 +1107,8 @@ async def delete_faq(faq_id: str):
 @api_router.put("/admin/content/{locale}/faq/reorder")
 async def reorder_faq(locale: str, ids: dict):
     """Reorder FAQ (no auth required)"""
-    success = await cms_content.reorder_faq(ids.get("faq_ids", []))
-    return {"success": success}
+    modified = await cms_content.reorder_faq(ids.get("faq_ids", []), locale)
+    return {"success": modified is not None, "modified": modified}
 
 # ============================================
 # ADMIN AUTHENTICATION
@@ -711,9 +1130,9 @@ async def verify_admin_session(cms_session: Optional[str] = Cookie(None)) -> dic
 # ============================================
 
 @api_router.get("/admin/content/{locale}/team")
-async def get_team(locale: str):
+async def get_team(locale: str, fields: Optional[str] = None):
     """Get all team members for locale (no auth required)"""
-    team = await cms_content.list_team(locale)
+    team = await cms_content.list_team(locale, parse_csv(fields))
     return {"success": True, "team": team}
 
 @api_router.post("/admin/content/{locale}/team")
@@ -731,17 +1150,17 @@ async def delete_team(locale: str, team_id: str):
 @api_router.put("/admin/content/{locale}/team/reorder")
 async def reorder_team(locale: str, ids: dict):
     """Reorder team members (no auth required)"""
-    success = await cms_content.reorder_team(ids.get("team_ids", []))
-    return {"success": success}
+    modified = await cms_content.reorder_team(ids.get("team_ids", []), locale)
+    return {"success": modified is not None, "modified": modified}
 
 # ============================================
 # EVENTS MANAGEMENT (Language-neutral)
 # ============================================
 
 @api_router.get("/admin/events")
-async def get_events():
+async def get_events(fields: Optional[str] = None):
     """Get all events (no auth required)"""
-    events = await cms_content.list_events()
+    events = await cms_content.list_events(parse_csv(fields))
     return {"success": True, "events": events}
 
 @api_router.post("/admin/events")
@@ -759,57 +1178,86 @@ async def delete_event(event_id: str):
 @api_router.put("/admin/events/reorder")
 async def reorder_events(ids: dict):
     """Reorder events (no auth required)"""
-    success = await cms_content.reorder_events(ids.get("event_ids", []))
-    return {"success": success}
+    modified = await cms_content.reorder_events(ids.get("event_ids", []))
+    return {"success": modified is not None, "modified": modified}
 
 # ============================================
 # PUBLIC API ENDPOINTS (No Auth Required)
 # ============================================
 
+# Browsers revalidate after a minute; unchanged content is answered with 304
+PUBLIC_CONTENT_CACHE_CONTROL = "public, max-age=60, must-revalidate"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates:
+        return True
+    return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def conditional_response(request: Request, etag: str, payload: dict) -> Response:
+    """Return 304 if the client already has this version, else JSON with validators"""
+    headers = {"ETag": etag, "Cache-Control": PUBLIC_CONTENT_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder(payload), headers=headers)
+
 @api_router.get("/content/{locale}/faq")
-async def public_get_faq(locale: str):
+async def public_get_faq(request: Request, locale: str):
     """Public endpoint to get FAQs (no auth required)"""
     try:
-        faq = await cms_content.list_faq(locale)
-        # Filter only visible FAQs
-        visible_faq = [f for f in faq if f.get('visible', True)]
-        return {"success": True, "faq": visible_faq}
+        entry = await cms_content.get_public("faq", locale)
+        return conditional_response(request, entry.etag, {"success": True, "faq": entry.data})
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
     except Exception as e:
         logger.error(f"Error getting public FAQ: {e}")
         return {"success": False, "error": str(e)}
 
 @api_router.get("/content/{locale}/modules")
-async def public_get_modules(locale: str):
+async def public_get_modules(request: Request, locale: str):
     """Public endpoint to get modules (no auth required)"""
     try:
-        modules = await cms_content.list_modules(locale)
-        # Filter only visible modules
-        visible_modules = [m for m in modules if m.get('visible', True)]
-        return {"success": True, "modules": visible_modules}
+        entry = await cms_content.get_public("modules", locale)
+        return conditional_response(request, entry.etag, {"success": True, "modules": entry.data})
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
     except Exception as e:
         logger.error(f"Error getting public modules: {e}")
         return {"success": False, "error": str(e)}
 
 @api_router.get("/content/{locale}/team")
-async def public_get_team(locale: str):
+async def public_get_team(request: Request, locale: str):
     """Public endpoint to get team members (no auth required)"""
     try:
-        team = await cms_content.list_team(locale)
-        # Filter only visible team members
-        visible_team = [t for t in team if t.get('visible', True)]
-        return {"success": True, "team": visible_team}
+        entry = await cms_content.get_public("team", locale)
+        return conditional_response(request, entry.etag, {"success": True, "team": entry.data})
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
     except Exception as e:
         logger.error(f"Error getting public team: {e}")
         return {"success": False, "error": str(e)}
 
+@api_router.get("/content/{locale}/bundle")
+async def public_get_bundle(request: Request, locale: str, sections: Optional[str] = None):
+    """Public endpoint to get all page content in one request (no auth required)"""
+    try:
+        entry = await cms_content.get_public_bundle(locale, parse_csv(sections))
+        return conditional_response(request, entry.etag, {"success": True, "locale": locale, **entry.data})
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    except Exception as e:
+        logger.error(f"Error getting public bundle: {e}")
+        return {"success": False, "error": str(e)}
+
 @api_router.get("/events")
-async def public_get_events():
+async def public_get_events(request: Request):
     """Public endpoint to get events (no auth required)"""
     try:
-        events = await cms_content.list_events()
-        # Filter only visible events
-        visible_events = [e for e in events if e.get('visible', True)]
-        return {"success": True, "events": visible_events}
+        entry = await cms_content.get_public("events")
+        return conditional_response(request, entry.etag, {"success": True, "events": entry.data})
     except Exception as e:
         logger.error(f"Error getting public events: {e}")
         return {"success": False, "error": str(e)}
@@ -817,13 +1265,76 @@ async def public_get_events():
 # Include the router in the main app
 app.include_router(api_router)
 
+class UploadSizeLimitMiddleware:
+    """
+    Reject request bodies above a limit while they are received
+    Starlette spools the whole multipart body before the endpoint runs,
+    so the limit has to be enforced before parsing
+    """
+    
+    def __init__(self, app, limits: dict):
+        self.app = app
+        self.limits = limits  # {path: max body bytes}
+    
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+        
+        too_large = JSONResponse({"detail": f"Upload too large. Max {limit / 1024 / 1024:.1f}MB"}, status_code=413)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            return await too_large(scope, receive, send)
+        
+        received = 0
+        rejected = False
+        responded = False
+        
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Ends body parsing in the app; the rest of the body is never read
+                    rejected = True
+                    return {"type": "http.disconnect"}
+            return message
+        
+        async def limited_send(message):
+            nonlocal responded
+            if not rejected:
+                return await send(message)
+            # Replace whatever the app answers to the aborted body with a 413
+            if not responded:
+                responded = True
+                await too_large(scope, receive, send)
+        
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except Exception:
+            if not rejected:
+                raise
+        if rejected and not responded:
+            await too_large(scope, receive, send)
+
+# Multipart framing and form fields on top of the file itself
+UPLOAD_BODY_OVERHEAD = 64 * 1024
+
+app.add_middleware(UploadSizeLimitMiddleware, limits={
+    "/api/admin/media/upload": cms_storage.max_file_size + UPLOAD_BODY_OVERHEAD,
+    "/api/admin/media/upload/bulk": MEDIA_BULK_UPLOAD_MAX_MB * 1024 * 1024 + UPLOAD_BODY_OVERHEAD
+})
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["http://localhost:3000", "http://localhost:8001", "https://maklerzentrum-cms.preview.emergentagent.com"],
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization"],
-    expose_headers=["X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset"],
+    allow_headers=["Content-Type", "Authorization", "Range"],
+    expose_headers=["X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset", "ETag", "Last-Modified", "Content-Range"],
 )
 
 # Configure logging
@@ -838,11 +1349,27 @@ async def startup_event():
     """Initialize CMS on startup"""
     logger.info("🚀 Starting CMS initialization...")
     
+    # Indexes and data migrations
+    await cms_migrations.run()
+    
     # Seed admin users
     await cms_auth.seed_admin_users()
     
+    # Background derivate generation
+    await media_jobs.start()
+    
+    # Fill the disk cache with the most requested media without delaying startup
+    if media_cache:
+        asyncio.create_task(cms_storage.warm_cache(int(os.environ.get('MEDIA_CACHE_WARM_KEYS', '100'))))
+    
     logger.info("✅ CMS initialized successfully")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await media_jobs.stop()
+    await cms_auth.flush_session_activity()
+    if media_cache:
+        await media_cache.flush_stats()
+    cms_auth.hash_pool.shutdown()
+    cms_storage.image_pool.shutdown()
     client.close()
\ No newline at end of file
@@ -47,6 +47,27 @@ export async function loadModules(locale = 'de-CH') {
     }
 }
 
+/**
+ * Load several content sections in a single request
+ */
+export async function loadBundle(locale = 'de-CH', sections = []) {
+    try {
+        const query = sections.length ? `?sections=${sections.join(',')}` : '';
+        const response = await fetch(`${API_BASE}/api/content/${locale}/bundle${query}`);
+        
+        if (!response.ok) {
+            throw new Error(`Failed to load content bundle: ${response.status} ${response.statusText}`);
+        }
+        
+        const data = await response.json();
+        console.log('✅ Loaded content bundle:', sections.join(', ') || 'all sections');
+        return data.success ? data : {};
+    } catch (error) {
+        console.error('Error loading content bundle:', error);
+        return {};
+    }
+}
+
 /**
  * Render FAQ Accordion
  */
@@ -211,14 +232,20 @@ export async function initCMSContent(options = {}) {
     console.log('🔄 Loading CMS content...');
     
     try {
+        const sections = [];
+        if (loadFAQ) sections.push('faq');
+        if (shouldLoadModules) sections.push('modules');
+        if (sections.length === 0) return;
+        
+        // One round trip for all requested sections
+        const bundle = await loadBundle(locale, sections);
+        
         if (loadFAQ) {
-            const faqs = await loadFAQs(locale);
-            renderFAQs(faqs, faqContainerId);
+            renderFAQs(bundle.faq || [], faqContainerId);
         }
         
         if (shouldLoadModules) {
-            const modules = await loadModules(locale);
-            renderModules(modules, modulesContainerId);
+            renderModules(bundle.modules || [], modulesContainerId);
         }
         
         console.log('✅ CMS content loaded successfully');
@@ -239,6 +266,7 @@ function escapeHtml(text) {
 // Make functions globally available
 window.loadFAQs = loadFAQs;
 window.loadModules = loadModules;
+window.loadBundle = loadBundle;
 window.renderFAQs = renderFAQs;
 window.renderModules = renderModules;
 window.initCMSContent = initCMSContent;
@@ -0,0 +1,36 @@
+"""
+Shared pytest setup for the backend unit tests
+Backend modules are imported flat (as uvicorn does from backend/)
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from starlette.requests import Request
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# server.py reads its configuration at import; the Motor client connects lazily, so no MongoDB is needed
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "cms_test")
+os.environ.setdefault("MEDIA_CACHE_MAX_MB", "0")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def make_request():
+    """Build a GET request with the given headers (for response helpers that only read headers)"""
+    def make(headers=None) -> Request:
+        return Request({
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "query_string": b"",
+            "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        })
+    return make
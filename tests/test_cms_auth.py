@@ -0,0 +1,73 @@
+import asyncio
+import threading
+
+import pytest
+
+from cms_auth import PasswordHashPool, PasswordPoolBusy
+
+pytestmark = pytest.mark.anyio
+
+
+async def wait_until(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.005)
+
+
+async def test_hash_pool_runs_and_counts():
+    pool = PasswordHashPool(max_workers=2)
+    try:
+        assert await pool.run(pow, 2, 10) == 1024
+        stats = pool.stats()
+        assert stats["active"] == 0
+        assert stats["completed"] == 1
+    finally:
+        pool.shutdown()
+
+
+async def test_hash_pool_rejects_when_saturated():
+    pool = PasswordHashPool(max_workers=1, max_queue_wait=0.05)
+    release = threading.Event()
+    try:
+        busy = asyncio.create_task(pool.run(release.wait))
+        await wait_until(lambda: pool.active == 1)
+
+        with pytest.raises(PasswordPoolBusy):
+            await pool.run(pow, 2, 2)
+        assert pool.stats()["rejected"] == 1
+    finally:
+        release.set()
+        await busy
+        pool.shutdown()
+
+
+async def test_hash_pool_keeps_slot_until_cancelled_work_finishes():
+    pool = PasswordHashPool(max_workers=1, max_queue_wait=0.05)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_hash():
+        started.set()
+        release.wait()
+        return "hash"
+
+    try:
+        request = asyncio.create_task(pool.run(slow_hash))
+        await wait_until(started.is_set)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+
+        # The thread is still hashing: its slot stays taken
+        assert pool.active == 1
+        with pytest.raises(PasswordPoolBusy):
+            await pool.run(pow, 2, 2)
+
+        release.set()
+        await wait_until(lambda: pool.active == 0)
+        assert pool.completed == 1
+        assert await pool.run(pow, 2, 2) == 4
+    finally:
+        release.set()
+        pool.shutdown()
@@ -0,0 +1,274 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import cms_cache
+from cms_cache import ContentCache, SingleFlight, TTLCache
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cms_cache.time, "monotonic", clock)
+    return clock
+
+
+# ============================================
+# TTLCache
+# ============================================
+
+async def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a is now more recent than b
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+async def test_ttl_cache_expires_entries(clock):
+    cache = TTLCache(max_entries=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=120)
+
+    clock.now += 61
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert [key for key, _ in cache.values()] == ["b"]
+
+    clock.now += 60
+    assert cache.get("b") is None
+
+
+async def test_ttl_cache_stats_and_invalidate():
+    cache = TTLCache(max_entries=10, ttl=60)
+    cache.set(("faq", "de-CH"), 1)
+    cache.set(("faq", "fr-CH"), 2)
+    cache.set(("team", "de-CH"), 3)
+
+    assert cache.invalidate(lambda key: key[0] == "faq") == 2
+    assert cache.get(("team", "de-CH")) == 3
+    assert cache.get(("faq", "de-CH")) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hitRatio"] == 0.5
+
+
+# ============================================
+# SingleFlight
+# ============================================
+
+async def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"value": 42}
+
+    tasks = [asyncio.create_task(flight.do("key", loader)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+    assert flight.coalesced == 4
+
+
+async def test_single_flight_propagates_errors_to_all_waiters():
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        raise RuntimeError("database down")
+
+    tasks = [asyncio.create_task(flight.do("key", failing)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    # Nothing is remembered: the next call loads again
+    async def working():
+        return "ok"
+
+    assert await flight.do("key", working) == "ok"
+
+
+async def test_single_flight_waiters_retry_when_leader_is_cancelled():
+    flight = SingleFlight()
+    calls = 0
+    started = asyncio.Event()
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await asyncio.sleep(0.01)
+        return calls
+
+    leader = asyncio.create_task(flight.do("key", loader))
+    await started.wait()
+    waiters = [asyncio.create_task(flight.do("key", loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    results = await asyncio.gather(*waiters)
+    assert leader.cancelled()
+    # One waiter took over as leader, the others coalesced onto it
+    assert calls == 2
+    assert results == [2, 2, 2]
+
+
+async def test_single_flight_cancelled_waiter_does_not_affect_others():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def loader():
+        await release.wait()
+        return "value"
+
+    leader = asyncio.create_task(flight.do("key", loader))
+    waiter = asyncio.create_task(flight.do("key", loader))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await leader == "value"
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+
+# ============================================
+# ContentCache
+# ============================================
+
+async def test_content_cache_does_not_store_loads_started_before_invalidation():
+    cache = ContentCache()
+    release = asyncio.Event()
+
+    async def stale_loader():
+        await release.wait()
+        return ["old"]
+
+    task = asyncio.create_task(cache.get_or_load("faq", "de-CH", stale_loader))
+    await asyncio.sleep(0)
+    await cache.invalidate("faq", "de-CH")
+    release.set()
+    assert (await task).data == ["old"]
+
+    async def fresh_loader():
+        return ["new"]
+
+    entry = await cache.get_or_load("faq", "de-CH", fresh_loader)
+    assert entry.data == ["new"]
+    assert entry.etag.startswith('"faq-')
+
+
+class Loader:
+    """Returns the current value of a fake collection and counts database reads"""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+@pytest.fixture
+async def db():
+    return AsyncMongoMockClient()["cms_test"]
+
+
+async def test_content_cache_invalidation_reaches_other_workers(db, clock):
+    writer = ContentCache(db=db, sync_interval=1.0)
+    reader = ContentCache(db=db, sync_interval=1.0)
+    faq = Loader(["old"])
+    await writer.get_or_load("faq", "de-CH", faq)
+    assert (await reader.get_or_load("faq", "de-CH", faq)).data == ["old"]
+
+    faq.value = ["new"]
+    await writer.invalidate("faq", "de-CH")
+
+    # Served from the cache until the next sync
+    assert (await reader.get_or_load("faq", "de-CH", faq)).data == ["old"]
+    clock.now += 1.0
+    assert (await reader.get_or_load("faq", "de-CH", faq)).data == ["new"]
+    assert reader.remote_invalidations == 1
+    assert (await writer.get_or_load("faq", "de-CH", faq)).data == ["new"]
+
+
+async def test_content_cache_remote_invalidation_drops_all_locales_of_the_collection(db, clock):
+    writer = ContentCache(db=db, sync_interval=0)
+    reader = ContentCache(db=db, sync_interval=0)
+    faq = Loader(["faq"])
+    team = Loader(["team"])
+    for locale in ("de-CH", "en"):
+        await reader.get_or_load("faq", locale, faq)
+    await reader.get_or_load("team", "en", team)
+
+    await writer.invalidate("faq", "en")
+    for locale in ("de-CH", "en"):
+        await reader.get_or_load("faq", locale, faq)
+    await reader.get_or_load("team", "en", team)
+
+    assert faq.calls == 4
+    assert team.calls == 1
+
+
+async def test_content_cache_own_invalidation_is_not_applied_twice(db, clock):
+    cache = ContentCache(db=db, sync_interval=0)
+    faq = Loader(["faq"])
+    await cache.get_or_load("faq", "de-CH", faq)
+
+    await cache.invalidate("faq", "de-CH")
+    await cache.get_or_load("faq", "de-CH", faq)
+    await cache.get_or_load("faq", "de-CH", faq)
+
+    assert faq.calls == 2
+    assert cache.remote_invalidations == 0
+
+
+class UnavailableDatabase:
+    def __getattr__(self, name):
+        raise ConnectionError("MongoDB unavailable")
+
+
+async def test_content_cache_works_locally_while_sync_fails(clock):
+    cache = ContentCache(db=UnavailableDatabase(), sync_interval=0)
+    faq = Loader(["faq"])
+    await cache.get_or_load("faq", "de-CH", faq)
+    await cache.get_or_load("faq", "de-CH", faq)
+
+    await cache.invalidate("faq", "de-CH")
+    await cache.get_or_load("faq", "de-CH", faq)
+
+    assert faq.calls == 2
@@ -0,0 +1,95 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from cms_content import CMSContent
+from cms_migrations import backfill_visible
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def db():
+    return AsyncMongoMockClient()["cms_test"]
+
+
+@pytest.mark.parametrize("fields, expected", [
+    (None, None),
+    ([], None),
+    (["", "$where"], None),
+    (["title", "order"], {"order": 1, "title": 1}),
+    (["title", "title"], {"title": 1}),
+    # A parent path includes its children; both together fail with a path collision
+    (["bullets", "bullets.text"], {"bullets": 1}),
+    (["items.date", "items", "items.date.start"], {"items": 1}),
+    (["items.date", "items.place"], {"items.date": 1, "items.place": 1}),
+    (["itemsX", "items"], {"items": 1, "itemsX": 1}),
+    (["a..b", "a.", ".a"], None),
+])
+def test_projection(fields, expected):
+    assert CMSContent._projection(fields) == expected
+
+
+async def test_projection_is_accepted_by_the_query(db):
+    await db.cms_modules.insert_one({"_id": "m1", "locale": "de-CH", "bullets": [{"text": "x"}], "order": 1})
+
+    modules = await CMSContent(db).list_modules("de-CH", fields=["bullets", "bullets.text"])
+
+    assert modules == [{"_id": "m1", "bullets": [{"text": "x"}]}]
+
+
+async def test_visible_is_stored_as_boolean(db):
+    content = CMSContent(db)
+    hidden = await content.create_faq("de-CH", {"question": "Q1", "visible": False}, "admin@example.ch")
+    shown = await content.create_faq("de-CH", {"question": "Q2", "visible": None}, "admin@example.ch")
+    await content.update_faq(hidden, {"visible": "yes"}, "admin@example.ch")
+
+    assert (await db.cms_faq.find_one({"_id": hidden}))["visible"] is True
+    assert (await db.cms_faq.find_one({"_id": shown}))["visible"] is True
+
+
+async def test_backfill_visible_keeps_public_content_unchanged(db):
+    await db.cms_faq.insert_many([
+        {"_id": "missing", "locale": "de-CH", "order": 1},
+        {"_id": "null", "locale": "de-CH", "order": 2, "visible": None},
+        {"_id": "hidden", "locale": "de-CH", "order": 3, "visible": False},
+        {"_id": "shown", "locale": "de-CH", "order": 4, "visible": True},
+    ])
+    await db.cms_events.insert_one({"_id": "event", "order": 1})
+
+    assert await backfill_visible(db, dry_run=True) == "would set visible on 3 content documents"
+    assert await db.cms_faq.count_documents({"visible": True}) == 1
+
+    assert await backfill_visible(db, dry_run=False) == "set visible on 3 content documents"
+    faq = await CMSContent(db).list_public_faq("de-CH")
+    assert [item["_id"] for item in faq] == ["missing", "null", "shown"]
+    assert [item["_id"] for item in await CMSContent(db).list_public_events()] == ["event"]
+
+
+async def test_reorder_only_touches_the_given_locale(db):
+    await db.cms_faq.insert_many([
+        {"_id": "a", "locale": "de-CH", "order": 0, "visible": True},
+        {"_id": "b", "locale": "de-CH", "order": 1, "visible": True},
+        {"_id": "c", "locale": "de-CH", "order": 2, "visible": True},
+        {"_id": "x", "locale": "fr-CH", "order": 0, "visible": True},
+        {"_id": "y", "locale": "fr-CH", "order": 1, "visible": True},
+    ])
+    content = CMSContent(db)
+    french = await content.list_public_faq("fr-CH")
+
+    # "a" keeps its position; "y" belongs to another locale
+    modified = await content.reorder_faq(["a", "c", "b", "y"], "de-CH")
+
+    assert modified == 2
+    assert [item["_id"] for item in await content.list_public_faq("de-CH")] == ["a", "c", "b"]
+    assert {doc["_id"]: doc["order"] async for doc in db.cms_faq.find({"locale": "fr-CH"})} == {"x": 0, "y": 1}
+    # The other locale is still served from the cache
+    assert await content.list_public_faq("fr-CH") is french
+
+
+async def test_reorder_without_changes_writes_nothing(db):
+    await db.cms_faq.insert_many([
+        {"_id": "a", "locale": "de-CH", "order": 0},
+        {"_id": "b", "locale": "de-CH", "order": 1},
+    ])
+
+    assert await CMSContent(db).reorder_faq(["a", "b", "missing"], "de-CH") == 0
@@ -0,0 +1,104 @@
+import io
+from datetime import datetime
+
+import boto3
+import pytest
+from mongomock_motor import AsyncMongoMockClient, enabled_gridfs_integration
+from moto import mock_aws
+
+from cms_media_backends import GridFSMediaBackend, LocalMediaBackend, MediaBackend, S3MediaBackend
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = bytes(range(256)) * 2048  # 512KB: spans several GridFS chunks
+
+
+@pytest.fixture(params=["gridfs", "local", "s3"])
+async def backend(request, tmp_path):
+    if request.param == "gridfs":
+        with enabled_gridfs_integration():
+            yield GridFSMediaBackend(AsyncMongoMockClient()["cms_test"])
+    elif request.param == "local":
+        yield LocalMediaBackend(tmp_path / "media")
+    else:
+        with mock_aws():
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="cms-media")
+            yield S3MediaBackend("cms-media", prefix="media/", client=client)
+
+
+async def put(backend, key, data=CONTENT, **kwargs):
+    return await backend.put(key, io.BytesIO(data), "image/webp", {"type": "derivate", "image_id": "img"}, **kwargs)
+
+
+async def read(stored, start=0, end=None) -> bytes:
+    return b"".join([chunk async for chunk in stored.iter_range(start, end)])
+
+
+async def test_media_backend_is_abstract():
+    with pytest.raises(TypeError):
+        MediaBackend()
+
+
+async def test_put_and_open(backend):
+    assert await put(backend, "img_320_webp") == len(CONTENT)
+
+    stored = await backend.open("img_320_webp")
+    assert stored.length == len(CONTENT)
+    assert stored.content_type == "image/webp"
+    assert isinstance(stored.last_modified, datetime)
+    assert await read(stored) == CONTENT
+    assert await backend.open("missing") is None
+
+
+async def test_put_rejects_files_above_max_size(backend):
+    with pytest.raises(ValueError):
+        await put(backend, "img_big", max_size=len(CONTENT) - 1)
+
+    # Nothing is left behind
+    assert await backend.open("img_big") is None
+    assert [key async for key, _, _ in backend.iter_files()] == []
+
+    assert await put(backend, "img_exact", max_size=len(CONTENT)) == len(CONTENT)
+
+
+@pytest.mark.parametrize("start, end", [
+    (0, 0),
+    (0, 99),
+    (1000, 300_000),
+    (len(CONTENT) - 10, len(CONTENT) - 1),
+])
+async def test_open_reads_ranges(backend, start, end):
+    await put(backend, "img_320_webp")
+
+    stored = await backend.open("img_320_webp")
+    assert await read(stored, start, end) == CONTENT[start:end + 1]
+
+
+async def test_delete(backend):
+    await put(backend, "img_320_webp")
+
+    assert await backend.delete("img_320_webp") is True
+    assert await backend.open("img_320_webp") is None
+    assert await backend.delete("img_320_webp") is False
+
+
+async def test_delete_prefix_removes_only_matching_keys(backend):
+    for key in ["abc_320_webp", "abc_960_webp", "abcd_320_webp", "xyz_320_webp"]:
+        await put(backend, key, b"data")
+
+    assert sorted(await backend.delete_prefix("abc_")) == ["abc_320_webp", "abc_960_webp"]
+    assert await backend.existing_keys(["abc_320_webp", "abcd_320_webp", "xyz_320_webp"]) == {
+        "abcd_320_webp", "xyz_320_webp"
+    }
+    # An empty prefix never deletes everything
+    assert await backend.delete_prefix("") == []
+
+
+async def test_iter_files_lists_every_file(backend):
+    await put(backend, "abc_320_webp", b"12345")
+    await put(backend, "xyz_original", b"123")
+
+    files = {key: (length, uploaded) async for key, length, uploaded in backend.iter_files()}
+    assert {key: length for key, (length, _) in files.items()} == {"abc_320_webp": 5, "xyz_original": 3}
+    assert all(isinstance(uploaded, datetime) for _, uploaded in files.values())
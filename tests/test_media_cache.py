@@ -0,0 +1,120 @@
+import io
+import os
+
+import anyio
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from starlette.responses import FileResponse
+
+import server
+from cms_media_backends import LocalMediaBackend
+from cms_media_cache import DiskMediaCache
+from cms_storage import CMSStorage
+
+pytestmark = pytest.mark.anyio
+
+KEY = "img_320_webp"
+CONTENT = os.urandom(300 * 1024)  # several FileResponse chunks
+
+
+@pytest.fixture
+async def storage(tmp_path):
+    storage = CMSStorage(
+        AsyncMongoMockClient()["cms_test"],
+        cache=DiskMediaCache(tmp_path / "cache"),
+        backend=LocalMediaBackend(tmp_path / "media")
+    )
+    await storage.backend.put(KEY, io.BytesIO(CONTENT), "image/webp", {})
+    assert await storage.cache.fill(KEY, lambda: storage._open_file(KEY))
+    return storage
+
+
+def links(storage) -> list:
+    return list(storage.cache.directory.glob("*.link"))
+
+
+async def send_response(response, on_body=None) -> bytes:
+    """Run the response as the ASGI server would, returns the body"""
+    chunks = []
+
+    async def receive():
+        # The client stays connected
+        await anyio.sleep_forever()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if on_body and len(chunks) == 1:
+                on_body()
+
+    await response({"type": "http", "method": "GET", "headers": []}, receive, send)
+    return b"".join(chunks)
+
+
+async def test_cache_hit_is_served_by_file_response(storage, make_request):
+    stored = await storage.get_file(KEY)
+    response = server.media_file_response(make_request(), stored, None)
+
+    assert isinstance(response.response, FileResponse)
+    assert await send_response(response) == CONTENT
+    assert storage.cache.stats()["hits"] == 1
+    assert links(storage) == []
+
+
+async def test_eviction_during_response_does_not_break_it(storage, make_request):
+    stored = await storage.get_file(KEY)
+    response = server.media_file_response(make_request(), stored, None)
+
+    def evict():
+        # Another request's fill pushes this file out of the cache
+        storage.cache.max_bytes = 0
+        storage.cache._evict()
+
+    assert await send_response(response, on_body=evict) == CONTENT
+    assert storage.cache.evictions == 1
+    assert list(storage.cache.directory.iterdir()) == []
+
+
+@pytest.mark.parametrize("range_header, expected", [
+    (None, CONTENT),
+    ("bytes=1000-299999", CONTENT[1000:300000]),
+], ids=["full", "range"])
+async def test_eviction_between_lookup_and_response(storage, make_request, range_header, expected):
+    stored = await storage.get_file(KEY)
+    await storage.cache.invalidate([KEY])
+
+    response = server.media_file_response(make_request(), stored, range_header)
+
+    assert await send_response(response) == expected
+    assert links(storage) == []
+
+
+async def test_not_modified_releases_link(storage, make_request):
+    stored = await storage.get_file(KEY)
+    request = make_request({"If-None-Match": stored.etag})
+    response = server.media_file_response(request, stored, None)
+
+    assert response.status_code == 304
+    await send_response(response)
+    assert links(storage) == []
+
+
+async def test_file_removed_by_other_worker_is_a_miss(storage):
+    # Workers sharing the directory may evict each other's files
+    os.unlink(storage.cache._path(KEY))
+
+    stored = await storage.get_file(KEY)
+
+    assert stored.release is None
+    assert await stored.iter_range().__anext__() == CONTENT[:stored.CHUNK_SIZE]
+    assert storage.cache.stats()["misses"] == 1
+
+
+async def test_leftover_links_are_removed_on_load(storage):
+    await storage.get_file(KEY)
+    assert len(links(storage)) == 1
+
+    reloaded = DiskMediaCache(storage.cache.directory)
+
+    assert links(storage) == []
+    assert reloaded.stats()["files"] == 1
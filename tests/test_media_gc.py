@@ -0,0 +1,148 @@
+import io
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import pytest
+from bson import Binary, ObjectId
+from mongomock_motor import AsyncMongoMockClient, enabled_gridfs_integration
+from moto import mock_aws
+
+from cms_media_backends import GridFSMediaBackend, LocalMediaBackend, S3MediaBackend
+from cms_media_gc import MediaGarbageCollector
+
+pytestmark = pytest.mark.anyio
+
+LIVE = str(uuid.uuid4())
+DELETED = str(uuid.uuid4())
+BROKEN = str(uuid.uuid4())
+
+
+@pytest.fixture
+async def db():
+    return AsyncMongoMockClient()["cms_test"]
+
+
+@pytest.fixture(params=["gridfs", "local", "s3"])
+async def backend(request, db, tmp_path):
+    if request.param == "gridfs":
+        with enabled_gridfs_integration():
+            yield GridFSMediaBackend(db)
+    elif request.param == "local":
+        yield LocalMediaBackend(tmp_path / "media")
+    else:
+        with mock_aws():
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="cms-media")
+            yield S3MediaBackend("cms-media", client=client)
+
+
+async def put(backend, key, data=b"data"):
+    await backend.put(key, io.BytesIO(data), "image/webp", {})
+
+
+async def keys(backend) -> set:
+    return {key async for key, _, _ in backend.iter_files()}
+
+
+@pytest.fixture
+async def media(db, backend):
+    """One live image, files of a deleted image, a foreign file and a record without original"""
+    await db.cms_media.insert_many([
+        {"_id": LIVE, "original": {"key": f"{LIVE}_original"}},
+        {"_id": BROKEN, "original": {"key": f"{BROKEN}_original"}},
+    ])
+    for key in [f"{LIVE}_original", f"{LIVE}_320_webp.0123456789abcdef"]:
+        await put(backend, key)
+    for key in [f"{DELETED}_original", f"{DELETED}_320_webp"]:
+        await put(backend, key, b"orphan")
+    await put(backend, "robots.txt")
+
+
+async def test_gc_removes_files_of_deleted_images_only(db, backend, media):
+    collector = MediaGarbageCollector(db, backend, batch_size=2, min_age=timedelta(0))
+
+    report = await collector.run()
+
+    assert report["files"] == {"scanned": 5, "skipped": 1, "orphans": 2, "bytes": 12}
+    assert await keys(backend) == {f"{LIVE}_original", f"{LIVE}_320_webp.0123456789abcdef", "robots.txt"}
+    assert report["brokenRecords"] == {"scanned": 2, "count": 1, "ids": [BROKEN]}
+
+
+async def test_gc_dry_run_deletes_nothing(db, backend, media):
+    before = await keys(backend)
+
+    report = await MediaGarbageCollector(db, backend, min_age=timedelta(0)).run(dry_run=True)
+
+    assert report["dryRun"] is True
+    assert report["files"]["orphans"] == 2
+    assert await keys(backend) == before
+
+
+async def test_gc_skips_files_younger_than_min_age(db, backend, media):
+    report = await MediaGarbageCollector(db, backend, min_age=timedelta(hours=1)).run()
+
+    assert report["files"]["orphans"] == 0
+    assert report["files"]["skipped"] == 5
+    assert f"{DELETED}_original" in await keys(backend)
+
+
+async def test_gc_min_age_applies_per_file(db, tmp_path):
+    backend = LocalMediaBackend(tmp_path)
+    old, recent = str(uuid.uuid4()), str(uuid.uuid4())
+    await put(backend, f"{old}_original")
+    await put(backend, f"{recent}_original")
+    two_hours_ago = (datetime.now(timezone.utc) - timedelta(hours=2)).timestamp()
+    os.utime(tmp_path / old[:2] / f"{old}_original", (two_hours_ago, two_hours_ago))
+
+    report = await MediaGarbageCollector(db, backend, min_age=timedelta(hours=1)).run()
+
+    assert report["files"]["orphans"] == 1
+    assert await keys(backend) == {f"{recent}_original"}
+
+
+# ============================================
+# GridFS chunks
+# ============================================
+
+@pytest.fixture
+async def gridfs(db):
+    with enabled_gridfs_integration():
+        yield GridFSMediaBackend(db)
+
+
+async def insert_chunks(backend, files_id, count=2, size=10):
+    await backend.chunks.insert_many([
+        {"files_id": files_id, "n": n, "data": Binary(b"x" * size)} for n in range(count)
+    ])
+
+
+async def test_gc_removes_orphaned_chunks(db, gridfs):
+    await put(gridfs, f"{LIVE}_original", b"x" * 300 * 1024)  # two chunks
+    await db.cms_media.insert_one({"_id": LIVE, "original": {"key": f"{LIVE}_original"}})
+    hours_ago = datetime.now(timezone.utc) - timedelta(hours=3)
+    orphan = ObjectId.from_datetime(hours_ago)
+    recent = ObjectId()  # an upload still writing its chunks
+    await insert_chunks(gridfs, orphan, count=3)
+    await insert_chunks(gridfs, recent)
+    await gridfs.files.update_many({}, {"$set": {"uploadDate": hours_ago}})
+
+    report = await MediaGarbageCollector(db, gridfs).run()
+
+    assert report["chunks"] == {"files": 1, "chunks": 3, "bytes": 30}
+    assert await gridfs.chunks.count_documents({"files_id": orphan}) == 0
+    assert await gridfs.chunks.count_documents({"files_id": recent}) == 2
+    stored = await gridfs.open(f"{LIVE}_original")
+    assert stored.length == 300 * 1024
+    assert report["files"]["orphans"] == 0
+
+
+async def test_gc_chunks_dry_run_deletes_nothing(db, gridfs):
+    orphan = ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(hours=3))
+    await insert_chunks(gridfs, orphan)
+
+    report = await MediaGarbageCollector(db, gridfs).run(dry_run=True)
+
+    assert report["chunks"]["chunks"] == 2
+    assert await gridfs.chunks.count_documents({"files_id": orphan}) == 2
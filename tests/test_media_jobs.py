@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta, timezone
+
+import anyio
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from cms_media_jobs import MediaJobQueue
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeStorage:
+    """process_derivates fails the given number of times per image, then succeeds"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = []
+        self.failed = {}
+
+    async def process_derivates(self, image_id: str):
+        self.calls.append(image_id)
+        if self.calls.count(image_id) <= self.failures:
+            raise RuntimeError("backend unavailable")
+
+    async def mark_failed(self, image_id: str, error: str):
+        self.failed[image_id] = error
+
+
+@pytest.fixture
+async def db():
+    return AsyncMongoMockClient()["cms_test"]
+
+
+def make_queue(db, storage=None, **options) -> MediaJobQueue:
+    return MediaJobQueue(db, storage or FakeStorage(), **{"workers": 1, "poll_interval": 0.01, **options})
+
+
+def now_ms() -> datetime:
+    # MongoDB stores datetimes with millisecond precision
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def utc(value: datetime) -> datetime:
+    # mongomock returns naive UTC datetimes
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+async def job(db, image_id: str) -> dict:
+    return await db.cms_media_jobs.find_one({"_id": image_id})
+
+
+# ============================================
+# CLAIMING
+# ============================================
+
+async def test_claim_leases_the_oldest_queued_job(db):
+    queue = make_queue(db, FakeStorage(), lease_seconds=60)
+    await queue.enqueue("first")
+    await queue.enqueue("second")
+
+    before = now_ms()
+    claimed = await queue._claim()
+
+    assert claimed["_id"] == "first"
+    assert claimed["status"] == "running"
+    assert claimed["attempts"] == 1
+    assert utc(claimed["leaseUntil"]) >= before + timedelta(seconds=60)
+    assert (await queue._claim())["_id"] == "second"
+    # Both leased: nothing left to claim
+    assert await queue._claim() is None
+
+
+async def test_claim_takes_over_expired_leases(db):
+    queue = make_queue(db)
+    now = datetime.now(timezone.utc)
+    await db.cms_media_jobs.insert_many([
+        {"_id": "crashed", "status": "running", "attempts": 1, "leaseUntil": now - timedelta(seconds=1), "createdAt": now},
+        {"_id": "busy", "status": "running", "attempts": 1, "leaseUntil": now + timedelta(minutes=5), "createdAt": now},
+    ])
+
+    claimed = await queue._claim()
+
+    assert claimed["_id"] == "crashed"
+    assert claimed["attempts"] == 2
+    assert await queue._claim() is None
+
+
+async def test_claim_accepts_jobs_queued_without_not_before(db):
+    # Jobs queued before retries had a backoff
+    await db.cms_media_jobs.insert_one({"_id": "old", "status": "queued", "attempts": 0, "createdAt": datetime.now(timezone.utc)})
+
+    assert (await make_queue(db)._claim())["_id"] == "old"
+
+
+async def test_start_recovers_expired_leases_and_orphaned_images(db):
+    storage = FakeStorage()
+    queue = make_queue(db, storage)
+    now = datetime.now(timezone.utc)
+    await db.cms_media_jobs.insert_one(
+        {"_id": "crashed", "status": "running", "attempts": 1, "leaseUntil": now - timedelta(seconds=1), "createdAt": now}
+    )
+    # Uploaded, but the process died before its job was queued
+    await db.cms_media.insert_one({"_id": "orphan", "status": "processing"})
+
+    await queue.start()
+    try:
+        with anyio.fail_after(5):
+            while await db.cms_media_jobs.count_documents({}):
+                await anyio.sleep(0.01)
+    finally:
+        await queue.stop()
+
+    assert sorted(storage.calls) == ["crashed", "orphan"]
+    assert queue.processed == 2
+
+
+# ============================================
+# RETRIES
+# ============================================
+
+async def test_failed_attempt_is_retried_after_a_backoff(db):
+    queue = make_queue(db, FakeStorage(failures=2), retry_delay=30, max_attempts=3)
+    await queue.enqueue("img")
+
+    before = now_ms()
+    await queue._process(await queue._claim())
+
+    retry = await job(db, "img")
+    assert retry["status"] == "queued"
+    assert retry["attempts"] == 1
+    assert retry["error"] == "backend unavailable"
+    assert utc(retry["notBefore"]) >= before + timedelta(seconds=30)
+    # Not due yet
+    assert await queue._claim() is None
+
+    # Due: the second attempt fails too, and waits twice as long
+    await db.cms_media_jobs.update_one({"_id": "img"}, {"$set": {"notBefore": before}})
+    before = now_ms()
+    await queue._process(await queue._claim())
+
+    retry = await job(db, "img")
+    assert retry["attempts"] == 2
+    assert utc(retry["notBefore"]) >= before + timedelta(seconds=60)
+    assert utc(retry["notBefore"]) < before + timedelta(seconds=90)
+
+
+async def test_enqueue_makes_a_waiting_retry_due(db):
+    queue = make_queue(db, FakeStorage(failures=1), retry_delay=30)
+    await queue.enqueue("img")
+    await queue._process(await queue._claim())
+
+    await queue.enqueue("img")
+
+    claimed = await queue._claim()
+    assert claimed["_id"] == "img"
+    assert claimed["attempts"] == 2
+
+
+async def test_job_fails_for_good_after_max_attempts(db):
+    storage = FakeStorage(failures=5)
+    queue = make_queue(db, storage, retry_delay=0, max_attempts=3)
+    await queue.enqueue("img")
+
+    for _ in range(3):
+        await queue._process(await queue._claim())
+
+    failed = await job(db, "img")
+    assert failed["status"] == "failed"
+    assert failed["attempts"] == 3
+    assert failed["error"] == "backend unavailable"
+    assert storage.failed == {"img": "backend unavailable"}
+    assert storage.calls == ["img"] * 3
+    assert queue.failed == 1
+    # Never claimed again
+    assert await queue._claim() is None
+    assert (await queue.stats())["failed"] == 1
+
+
+async def test_successful_job_is_removed(db):
+    queue = make_queue(db, FakeStorage(failures=1), retry_delay=0)
+    await queue.enqueue("img")
+
+    await queue._process(await queue._claim())
+    await queue._process(await queue._claim())
+
+    assert await job(db, "img") is None
+    assert queue.processed == 1
+    assert queue.failed == 0
@@ -0,0 +1,142 @@
+import base64
+import json
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from cms_media_backends import LocalMediaBackend
+from cms_storage import CMSStorage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def storage(tmp_path):
+    # Listing only reads metadata; files are never touched
+    return CMSStorage(AsyncMongoMockClient()["cms_test"], backend=LocalMediaBackend(tmp_path))
+
+
+async def insert(storage, image_id, uploaded_at, **fields):
+    await storage.db.cms_media.insert_one({
+        "_id": image_id,
+        "filename": f"{image_id}.jpg",
+        "alt_text": "",
+        "content_type": "image/jpeg",
+        "status": "ready",
+        "uploaded_at": uploaded_at,
+        **fields
+    })
+
+
+async def all_pages(storage, limit, **filters):
+    ids, after = [], None
+    while True:
+        page = await storage.list_media(limit, after=after, **filters)
+        ids += [item["_id"] for item in page["media"]]
+        after = page["next"]
+        if after is None:
+            return ids
+
+
+# ============================================
+# Page token
+# ============================================
+
+async def test_list_token_round_trip():
+    token = CMSStorage._encode_list_token({"_id": "img-1", "uploaded_at": "2026-03-01T10:00:00+00:00"})
+
+    assert "=" not in token
+    assert CMSStorage._decode_list_token(token) == ("2026-03-01T10:00:00+00:00", "img-1")
+
+
+def encode(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+@pytest.mark.parametrize("token", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    encode({"uploaded_at": "2026-03-01", "_id": "a"}),
+    encode(["2026-03-01"]),
+    encode(["2026-03-01", 1]),
+    encode([None, "a"]),
+])
+async def test_list_rejects_malformed_token(storage, token):
+    with pytest.raises(ValueError):
+        await storage.list_media(10, after=token)
+
+
+# ============================================
+# Keyset pages
+# ============================================
+
+async def test_list_pages_newest_first_with_total_on_first_page(storage):
+    for day in range(1, 6):
+        await insert(storage, f"img-{day}", f"2026-03-0{day}T10:00:00+00:00")
+
+    first = await storage.list_media(2)
+    assert [item["_id"] for item in first["media"]] == ["img-5", "img-4"]
+    assert first["total"] == 5
+
+    second = await storage.list_media(2, after=first["next"])
+    assert [item["_id"] for item in second["media"]] == ["img-3", "img-2"]
+    assert second["total"] is None
+
+    last = await storage.list_media(2, after=second["next"])
+    assert [item["_id"] for item in last["media"]] == ["img-1"]
+    assert last["next"] is None
+
+
+async def test_list_breaks_uploaded_at_ties_by_id(storage):
+    # A bulk upload can store several images within the same timestamp
+    for image_id in ["a", "b", "c", "d", "e"]:
+        await insert(storage, image_id, "2026-03-01T10:00:00+00:00")
+    await insert(storage, "older", "2026-02-01T10:00:00+00:00")
+
+    for limit in (1, 2, 3):
+        assert await all_pages(storage, limit) == ["e", "d", "c", "b", "a", "older"]
+
+
+async def test_list_skip_is_kept_for_old_clients(storage):
+    for day in range(1, 6):
+        await insert(storage, f"img-{day}", f"2026-03-0{day}T10:00:00+00:00")
+
+    page = await storage.list_media(2, skip=2)
+    assert [item["_id"] for item in page["media"]] == ["img-3", "img-2"]
+    assert page["total"] is None
+
+    # The token continues from the skipped page
+    page = await storage.list_media(2, after=page["next"], skip=2)
+    assert [item["_id"] for item in page["media"]] == ["img-1"]
+
+
+# ============================================
+# Filters
+# ============================================
+
+async def test_list_filters_by_iso_date_range(storage):
+    await insert(storage, "before", "2026-02-28T23:59:59.999999+00:00")
+    await insert(storage, "first", "2026-03-01T00:00:00+00:00")
+    await insert(storage, "late", "2026-03-31T23:30:00+00:00")
+    await insert(storage, "after", "2026-04-01T00:00:00+00:00")
+
+    # A plain uploaded_to date includes that whole day
+    assert await all_pages(storage, 10, uploaded_from="2026-03-01", uploaded_to="2026-03-31") == ["late", "first"]
+    # Datetimes with an offset are compared in UTC
+    assert await all_pages(storage, 10, uploaded_from="2026-04-01T01:00:00+01:00") == ["after"]
+    assert await all_pages(storage, 10, uploaded_to="2026-03-31T23:30:00") == ["late", "first", "before"]
+
+
+async def test_list_filter_query_and_content_type(storage):
+    await insert(storage, "logo", "2026-03-01T10:00:00+00:00", filename="Logo (big).png", content_type="image/png")
+    await insert(storage, "team", "2026-03-02T10:00:00+00:00", alt_text="Unser Logo")
+    await insert(storage, "other", "2026-03-03T10:00:00+00:00")
+
+    assert await all_pages(storage, 10, q="logo") == ["team", "logo"]
+    assert await all_pages(storage, 10, q="(big)") == ["logo"]
+    assert await all_pages(storage, 10, q="logo", content_type="image/png") == ["logo"]
+
+
+async def test_list_rejects_invalid_date(storage):
+    with pytest.raises(ValueError):
+        await storage.list_media(10, uploaded_from="yesterday")
@@ -0,0 +1,148 @@
+from io import BytesIO
+
+import anyio
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from starlette.testclient import TestClient
+
+import server
+from cms_media_backends import LocalMediaBackend
+from cms_storage import CMSStorage
+
+
+CHROME = "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8"
+CHROME_WITHOUT_AVIF = "image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8"
+FIREFOX_OLD = "image/webp,*/*"
+SAFARI_OLD = "image/png,image/svg+xml,image/*;q=0.8,video/*;q=0.8,*/*;q=0.5"
+
+
+def formats(**sizes) -> dict:
+    return {fmt: {"key": f"img_640_{fmt}", "bytes": size} for fmt, size in sizes.items()}
+
+
+# ============================================
+# accepted_types
+# ============================================
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, set()),
+    ("", set()),
+    ("image/webp", {"image/webp"}),
+    ("Image/WebP ; q=0.5, image/*", {"image/webp", "image/*"}),
+    ("image/avif;q=0, image/webp;q=0.1", {"image/webp"}),
+    ("image/avif;q=0.0,image/webp", {"image/webp"}),
+    ("image/avif;q=abc,image/jpeg", {"image/jpeg"}),
+    (CHROME_WITHOUT_AVIF, {"image/webp", "image/apng", "image/svg+xml", "image/*", "*/*"}),
+])
+def test_accepted_types(accept, expected):
+    assert server.accepted_types(accept) == expected
+
+
+# ============================================
+# negotiate_format
+# ============================================
+
+ALL = formats(avif=700, webp=800, jpeg=1200)
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (CHROME, "avif"),
+    (CHROME_WITHOUT_AVIF, "webp"),
+    (FIREFOX_OLD, "webp"),
+    # image/* and */* are sent by browsers without AVIF/WebP support too
+    ("image/*", "jpeg"),
+    ("*/*", "jpeg"),
+    (SAFARI_OLD, "jpeg"),
+    (None, "jpeg"),
+    # Explicit exclusions
+    ("image/avif;q=0,image/webp", "webp"),
+    ("image/avif;q=0,image/webp;q=0,image/*", "jpeg"),
+])
+def test_negotiate_format_from_accept(accept, expected):
+    assert server.negotiate_format(ALL, accept) == expected
+
+
+def test_negotiate_format_prefers_the_smallest_accepted_variant():
+    # A photo where WebP came out smaller than AVIF
+    assert server.negotiate_format(formats(avif=900, webp=800, jpeg=1200), CHROME) == "webp"
+    # A flat graphic where JPEG is the smallest
+    assert server.negotiate_format(formats(avif=900, webp=800, jpeg=600), CHROME) == "jpeg"
+
+
+def test_negotiate_format_skips_formats_missing_for_the_image():
+    # No AVIF encoder when the image was processed
+    assert server.negotiate_format(formats(webp=800, jpeg=1200), CHROME) == "webp"
+    assert server.negotiate_format(formats(jpeg=1200), CHROME) == "jpeg"
+
+
+def test_negotiate_format_falls_back_to_webp_only_images():
+    # Images processed before multi-format derivates have no JPEG fallback
+    assert server.negotiate_format({"webp": {"key": "img_640_webp"}}, "image/*") == "webp"
+
+
+# ============================================
+# serve_media_variant
+# ============================================
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    storage = CMSStorage(AsyncMongoMockClient()["cms_test"], backend=LocalMediaBackend(tmp_path))
+    monkeypatch.setattr(server, "cms_storage", storage)
+    client = TestClient(server.app)
+
+    async def setup():
+        variant = {}
+        for fmt, size in (("avif", 700), ("webp", 800), ("jpeg", 1200)):
+            key = f"img{fmt}640"
+            await storage.backend.put(key, BytesIO(fmt.encode() * size), f"image/{fmt}", {})
+            variant[fmt] = {"key": key, "url": f"/api/media/serve/{key}", "width": 640, "bytes": size * len(fmt)}
+        await storage.db.cms_media.insert_one({"_id": "img", "variants": {"640": variant}, "status": "ready"})
+
+    anyio.run(setup)
+    return client
+
+
+def test_variant_is_negotiated_and_varies_on_accept(client):
+    response = client.get("/api/media/img", headers={"Accept": CHROME_WITHOUT_AVIF})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/webp"
+    assert response.headers["vary"] == "Accept"
+    assert response.content == b"webp" * 800
+
+
+def test_variant_falls_back_to_jpeg_for_generic_accept(client):
+    response = client.get("/api/media/img", headers={"Accept": "image/*"})
+
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["vary"] == "Accept"
+
+
+def test_explicit_format_does_not_vary_on_accept(client):
+    response = client.get("/api/media/img?fmt=avif", headers={"Accept": "image/*"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/avif"
+    assert "vary" not in response.headers
+
+
+def test_unavailable_explicit_format_is_not_found(client):
+    response = client.get("/api/media/img?fmt=png")
+
+    assert response.status_code == 404
+    assert response.json() == {"error": "Format not available. Allowed: ['avif', 'webp', 'jpeg']"}
+
+
+def test_requested_width_picks_the_variant(client):
+    response = client.get("/api/media/img?w=600", headers={"Accept": "image/*"})
+
+    assert response.status_code == 200
+    assert response.content == b"jpeg" * 1200
+
+
+@pytest.mark.parametrize("w", ["0", "-320", "abc", "1.5"])
+def test_invalid_width_is_rejected(client, w):
+    response = client.get(f"/api/media/img?w={w}")
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["query", "w"]
@@ -0,0 +1,108 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+from cms_media_backends import StoredFile
+
+
+# ============================================
+# parse_range
+# ============================================
+
+@pytest.mark.parametrize("header, length, expected", [
+    # No or unsupported ranges: full response
+    (None, 100, None),
+    ("", 100, None),
+    ("items=0-10", 100, None),
+    ("bytes=0-10,20-30", 100, None),
+    ("bytes=abc-10", 100, None),
+    ("bytes=5-x", 100, None),
+    # Closed and open ranges
+    ("bytes=0-0", 100, (0, 0)),
+    ("bytes=0-9", 100, (0, 9)),
+    ("bytes=10-", 100, (10, 99)),
+    ("bytes=90-200", 100, (90, 99)),
+    ("bytes=99-99", 100, (99, 99)),
+    # Suffix ranges
+    ("bytes=-10", 100, (90, 99)),
+    ("bytes=-100", 100, (0, 99)),
+    ("bytes=-500", 100, (0, 99)),
+    # Unsatisfiable: 416
+    ("bytes=100-", 100, False),
+    ("bytes=150-200", 100, False),
+    ("bytes=20-10", 100, False),
+    ("bytes=-0", 100, False),
+    ("bytes=0-", 0, False),
+    ("bytes=-5", 0, False),
+])
+def test_parse_range(header, length, expected):
+    assert server.parse_range(header, length) == expected
+
+
+# ============================================
+# media_file_response
+# ============================================
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def stored(tmp_path):
+    path = tmp_path / "image"
+    path.write_bytes(CONTENT)
+    # Served through StreamingResponse like GridFS/S3 files
+    return StoredFile(
+        key="img_320_webp",
+        length=len(CONTENT),
+        content_type="image/webp",
+        upload_date=datetime(2026, 1, 1, tzinfo=timezone.utc),
+        file_id="abc123",
+        reader=lambda start, end: _read(path, start, end)
+    )
+
+
+async def _read(path, start, end):
+    yield path.read_bytes()[start:end + 1]
+
+
+async def body(response) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+@pytest.mark.anyio
+async def test_media_file_response_serves_partial_content(stored, make_request):
+    response = server.media_file_response(make_request(), stored, "bytes=10-19")
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+    assert response.headers["content-length"] == "10"
+    assert response.headers["etag"] == '"abc123"'
+    assert await body(response) == CONTENT[10:20]
+
+
+@pytest.mark.anyio
+async def test_media_file_response_rejects_unsatisfiable_range(stored, make_request):
+    response = server.media_file_response(make_request(), stored, f"bytes={len(CONTENT)}-")
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+    # The error depends on the request: never cached
+    assert "cache-control" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_media_file_response_ignores_range_with_stale_if_range(stored, make_request):
+    request = make_request({"If-Range": '"other"'})
+    response = server.media_file_response(request, stored, "bytes=0-9")
+
+    assert response.status_code == 200
+    assert await body(response) == CONTENT
+
+
+def test_media_file_response_not_modified(stored, make_request):
+    request = make_request({"If-None-Match": '"abc123"'})
+    response = server.media_file_response(request, stored, "bytes=0-9")
+
+    assert response.status_code == 304
+    assert response.headers["cache-control"] == server.MEDIA_CACHE_CONTROL
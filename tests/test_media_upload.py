@@ -0,0 +1,128 @@
+from io import BytesIO
+
+import anyio
+import pytest
+from mongomock_motor import AsyncMongoMockClient, enabled_gridfs_integration
+from PIL import Image
+
+from cms_media_backends import GridFSMediaBackend, LocalMediaBackend
+from cms_storage import CMSStorage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def storage(tmp_path):
+    return CMSStorage(AsyncMongoMockClient()["cms_test"], backend=LocalMediaBackend(tmp_path))
+
+
+def jpeg(color: str) -> BytesIO:
+    buffer = BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, "JPEG")
+    buffer.seek(0)
+    return buffer
+
+
+async def test_upload_calls_on_stored_for_new_images_only(storage):
+    stored = []
+
+    async def on_stored(image_id):
+        stored.append(image_id)
+
+    image = await storage.upload_image(jpeg("red"), "a.jpg", "image/jpeg", on_stored=on_stored)
+    duplicate = await storage.upload_image(jpeg("red"), "b.jpg", "image/jpeg", on_stored=on_stored)
+
+    assert image["duplicate"] is False
+    assert duplicate["id"] == image["id"]
+    assert duplicate["duplicate"] is True
+    assert stored == [image["id"]]
+
+
+async def test_upload_reuses_precomputed_digest(storage):
+    source = jpeg("blue")
+    sha256 = await storage.hash_upload(source)
+
+    image = await storage.upload_image(source, "a.jpg", "image/jpeg", sha256=sha256)
+
+    meta = await storage.db.cms_media.find_one({"_id": image["id"]})
+    assert meta["sha256"] == sha256
+    assert meta["original"]["size"] == len(source.getvalue())
+
+
+async def test_hash_upload_rejects_oversized_files(storage):
+    storage.max_file_size = 100
+
+    with pytest.raises(ValueError):
+        await storage.hash_upload(jpeg("red"))
+
+
+async def test_cancelled_upload_still_queues_inserted_image(storage):
+    queued = []
+    inserted = anyio.Event()
+
+    async def on_stored(image_id):
+        inserted.set()
+        await anyio.sleep(0.05)
+        queued.append(image_id)
+
+    async with anyio.create_task_group() as tg:
+        async def upload():
+            await storage.upload_image(jpeg("green"), "a.jpg", "image/jpeg", on_stored=on_stored)
+
+        tg.start_soon(upload)
+        await inserted.wait()
+        # A client disconnect between the metadata insert and the job
+        tg.cancel_scope.cancel()
+
+    image_ids = [meta["_id"] for meta in await storage.db.cms_media.find({}, {"_id": 1}).to_list(length=None)]
+    assert len(image_ids) == 1
+    assert queued == image_ids
+
+
+class FakePool:
+    """Deterministic encoder output (as Pillow's for the same original); bump version to change it"""
+
+    version = 1
+
+    async def create_derivates(self, source, widths, image_format=None, formats=("webp",)):
+        return {width: ({fmt: f"{fmt}-{width}-v{self.version}".encode() for fmt in formats}, {}) for width in widths}
+
+
+@pytest.fixture
+async def gridfs_storage():
+    with enabled_gridfs_integration():
+        db = AsyncMongoMockClient()["cms_test"]
+        yield CMSStorage(db, image_pool=FakePool(), backend=GridFSMediaBackend(db))
+
+
+async def gridfs_revisions(storage) -> dict:
+    revisions = {}
+    async for doc in storage.backend.files.find({}, {"filename": 1}):
+        revisions[doc["filename"]] = revisions.get(doc["filename"], 0) + 1
+    return revisions
+
+
+async def test_reprocessing_does_not_store_gridfs_revisions(gridfs_storage):
+    image = await gridfs_storage.upload_image(jpeg("red"), "a.jpg", "image/jpeg")
+    await gridfs_storage.process_derivates(image["id"])
+    first = await gridfs_revisions(gridfs_storage)
+
+    await gridfs_storage.process_derivates(image["id"])
+
+    assert await gridfs_revisions(gridfs_storage) == first
+    assert set(first.values()) == {1}
+
+
+async def test_reprocessing_replaces_changed_derivates(gridfs_storage):
+    image = await gridfs_storage.upload_image(jpeg("red"), "a.jpg", "image/jpeg")
+    await gridfs_storage.process_derivates(image["id"])
+    first = set(await gridfs_revisions(gridfs_storage))
+
+    gridfs_storage.image_pool.version = 2
+    await gridfs_storage.process_derivates(image["id"])
+
+    second = await gridfs_revisions(gridfs_storage)
+    original = f"{image['id']}_original"
+    assert set(second.values()) == {1}
+    assert first & set(second) == {original}
+    assert len(second) == len(first)
@@ -0,0 +1,126 @@
+import struct
+import zlib
+from io import BytesIO
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from PIL import Image
+
+from cms_imaging import read_dimensions, sniff_image_type
+from cms_media_backends import LocalMediaBackend
+from cms_storage import CMSStorage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def storage(tmp_path):
+    return CMSStorage(AsyncMongoMockClient()["cms_test"], backend=LocalMediaBackend(tmp_path))
+
+
+def encoded(fmt: str, size=(64, 48)) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def png_header(width: int, height: int) -> bytes:
+    """PNG header declaring the size, followed by an empty IDAT: there is no pixel data to decode"""
+    def chunk(name: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + name + data + struct.pack(">I", zlib.crc32(name + data))
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) + chunk(b"IDAT", b"")
+
+
+async def stored_files(storage) -> list:
+    return [key async for key, _, _ in storage.backend.iter_files()]
+
+
+# ============================================
+# MAGIC BYTES
+# ============================================
+
+@pytest.mark.parametrize("fmt, expected", [
+    ("JPEG", "image/jpeg"),
+    ("PNG", "image/png"),
+    ("WEBP", "image/webp"),
+    ("GIF", None),
+    ("BMP", None),
+])
+def test_sniff_image_type_reads_the_signature(fmt, expected):
+    assert sniff_image_type(encoded(fmt)[:16]) == expected
+
+
+@pytest.mark.parametrize("head", [
+    b"",
+    b"hello, world\n",
+    b"<svg xmlns='http://www.w3.org/2000/svg'>",
+    b"RIFF\x00\x00\x00\x00WAVEfmt ",
+    b"\x89PNG",
+])
+def test_sniff_image_type_rejects_other_content(head):
+    assert sniff_image_type(head) is None
+
+
+def test_read_dimensions_reads_the_header_only():
+    # Decoding would fail (no pixel data), the header alone gives the size
+    assert read_dimensions(BytesIO(png_header(6000, 4000)), "image/png") == (6000, 4000)
+
+
+def test_read_dimensions_only_tries_the_sniffed_format():
+    with pytest.raises(OSError):
+        read_dimensions(BytesIO(encoded("PNG")), "image/jpeg")
+
+
+# ============================================
+# UPLOAD INSPECTION
+# ============================================
+
+async def test_spoofed_content_type_is_replaced_by_the_detected_type(storage):
+    image = await storage.upload_image(BytesIO(encoded("PNG")), "photo.jpg", "image/jpeg")
+
+    meta = await storage.db.cms_media.find_one({"_id": image["id"]})
+    assert meta["content_type"] == "image/png"
+    stored = await storage.backend.head(meta["original"]["key"])
+    assert stored.content_type == "image/png"
+
+
+async def test_text_declared_as_image_is_rejected(storage):
+    with pytest.raises(ValueError, match="Invalid file type"):
+        await storage.upload_image(BytesIO(b"<?php echo 'hi'; ?>" * 10), "shell.png", "image/png")
+
+    assert await stored_files(storage) == []
+    assert await storage.db.cms_media.count_documents({}) == 0
+
+
+@pytest.mark.parametrize("body", [
+    pytest.param(encoded("JPEG")[:20], id="truncated-jpeg"),
+    pytest.param(encoded("PNG")[:12], id="truncated-png"),
+    pytest.param(b"\xff\xd8\xff" + b"\x00" * 200, id="garbage-jpeg"),
+    pytest.param(b"\x89PNG\r\n\x1a\n" + b"garbage" * 30, id="garbage-png"),
+    pytest.param(b"RIFF\x10\x00\x00\x00WEBPVP8 " + b"\x00" * 8, id="garbage-webp"),
+])
+async def test_broken_header_is_rejected(storage, body):
+    with pytest.raises(ValueError, match="Invalid image file"):
+        await storage.upload_image(BytesIO(body), "broken.jpg", "image/jpeg")
+
+    assert await stored_files(storage) == []
+
+
+@pytest.mark.parametrize("width, height", [
+    pytest.param(8000, 6000, id="over-limit"),
+    # Pillow raises DecompressionBombError itself at twice its own limit
+    pytest.param(50000, 50000, id="pillow-bomb"),
+])
+async def test_pixel_limit_is_enforced_before_decoding(storage, width, height):
+    with pytest.raises(ValueError, match="Image too large. Max 40 megapixels"):
+        await storage.upload_image(BytesIO(png_header(width, height)), "bomb.png", "image/png")
+
+    assert await stored_files(storage) == []
+    assert await storage.db.cms_media.count_documents({}) == 0
+
+
+async def test_inspect_accepts_images_at_the_pixel_limit(storage):
+    source = BytesIO(png_header(8000, 5000))
+
+    assert storage._inspect(source) == (8000, 5000, "image/png")
+    assert source.tell() == 0
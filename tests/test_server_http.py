@@ -0,0 +1,139 @@
+import anyio
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from starlette.testclient import TestClient
+
+import server
+from cms_content import CMSContent
+
+
+# ============================================
+# ETag / 304 (public content)
+# ============================================
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ('"faq-abc"', True),
+    ('W/"faq-abc"', True),
+    ('"other", "faq-abc"', True),
+    ('*', True),
+    ('"faq-abd"', False),
+    ('faq-abc', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert server.etag_matches(if_none_match, '"faq-abc"') is expected
+
+
+def test_conditional_response_returns_json_with_validators(make_request):
+    response = server.conditional_response(make_request(), '"faq-abc"', {"success": True, "faq": []})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"faq-abc"'
+    assert response.headers["cache-control"] == server.PUBLIC_CONTENT_CACHE_CONTROL
+    assert response.body == b'{"success":true,"faq":[]}'
+
+
+def test_conditional_response_returns_304_for_current_etag(make_request):
+    request = make_request({"If-None-Match": '"faq-abc"'})
+    response = server.conditional_response(request, '"faq-abc"', {"success": True, "faq": []})
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == '"faq-abc"'
+
+
+def test_conditional_response_ignores_stale_etag(make_request):
+    request = make_request({"If-None-Match": '"faq-old"'})
+    response = server.conditional_response(request, '"faq-abc"', {"success": True})
+
+    assert response.status_code == 200
+
+
+# ============================================
+# Public bundle endpoint
+# ============================================
+
+@pytest.fixture
+def content(monkeypatch):
+    content = CMSContent(AsyncMongoMockClient()["cms_test"])
+    monkeypatch.setattr(server, "cms_content", content)
+
+    async def setup():
+        db = content.db
+        await db.cms_faq.insert_many([
+            {"_id": "f1", "locale": "de-CH", "question": "Q1", "answer": "A1", "order": 1, "visible": True, "updatedBy": "admin"},
+            {"_id": "f2", "locale": "de-CH", "question": "Q2", "answer": "A2", "order": 2, "visible": False},
+            {"_id": "f3", "locale": "fr-CH", "question": "Q3", "answer": "A3", "order": 1, "visible": True},
+        ])
+        await db.cms_team.insert_one({"_id": "t1", "locale": "de-CH", "name": "Anna", "order": 1, "visible": True})
+        await db.cms_events.insert_one({"_id": "e1", "monthGroup": "Mai", "items": [], "order": 1, "visible": True})
+
+    anyio.run(setup)
+    return content
+
+
+@pytest.fixture
+def client(content):
+    return TestClient(server.app)
+
+
+def test_bundle_contains_all_public_sections(client):
+    response = client.get("/api/content/de-CH/bundle")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"success", "locale", "siteGlobal", "site", "modules", "faq", "team", "events"}
+    assert body["success"] is True
+    assert body["locale"] == "de-CH"
+    # Visible documents of the locale, public fields only
+    assert body["faq"] == [{"_id": "f1", "question": "Q1", "answer": "A1", "order": 1}]
+    assert body["team"] == [{"_id": "t1", "name": "Anna", "order": 1}]
+    assert body["events"] == [{"_id": "e1", "monthGroup": "Mai", "items": [], "order": 1}]
+    assert body["modules"] == []
+    assert body["site"]["locale"] == "de-CH"
+    assert "_id" not in body["siteGlobal"]
+    assert response.headers["etag"].startswith('"bundle-')
+    assert response.headers["cache-control"] == server.PUBLIC_CONTENT_CACHE_CONTROL
+
+
+def test_bundle_sections_select_the_payload(client):
+    full = client.get("/api/content/de-CH/bundle")
+    response = client.get("/api/content/de-CH/bundle?sections=faq, team")
+
+    assert set(response.json()) == {"success", "locale", "faq", "team"}
+    assert response.headers["etag"] != full.headers["etag"]
+
+
+@pytest.mark.parametrize("path, error", [
+    ("/api/content/en/bundle", "Unsupported locale: en"),
+    ("/api/content/de-CH/bundle?sections=faq,admin,users", "Unknown sections: admin, users"),
+])
+def test_bundle_rejects_unknown_locale_and_sections(client, content, path, error):
+    response = client.get(path)
+
+    assert response.json() == {"success": False, "error": error}
+    assert "etag" not in response.headers
+    # Rejected before any section is loaded or cached
+    assert content.cache.stats()["entries"] == 0
+
+
+@pytest.mark.parametrize("validator", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_bundle_returns_304_for_current_etag(client, validator):
+    etag = client.get("/api/content/de-CH/bundle").headers["etag"]
+
+    response = client.get("/api/content/de-CH/bundle", headers={"If-None-Match": validator.format(etag=etag)})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_bundle_etag_changes_with_the_content(client, content):
+    etag = client.get("/api/content/de-CH/bundle").headers["etag"]
+    assert anyio.run(content.update_faq, "f1", {"answer": "A1 neu"}, "admin@example.ch")
+
+    response = client.get("/api/content/de-CH/bundle", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["faq"][0]["answer"] == "A1 neu"
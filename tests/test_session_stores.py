@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+import anyio
+import fakeredis
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from cms_sessions import MemorySessionStore, MongoSessionStore, RedisSessionStore, SessionStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=["memory", "mongo", "redis"])
+async def store(request):
+    if request.param == "memory":
+        yield MemorySessionStore()
+    elif request.param == "mongo":
+        yield MongoSessionStore(AsyncMongoMockClient()["cms_test"])
+    else:
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        yield RedisSessionStore(client=client)
+        await client.aclose()
+
+
+def make_session(session_id: str, expires_in: timedelta = timedelta(hours=1)) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "_id": session_id,
+        "userId": "user-1",
+        "email": "admin@example.ch",
+        "expiresAt": now + expires_in,
+        "lastActivity": now.isoformat()
+    }
+
+
+async def test_session_store_is_abstract():
+    with pytest.raises(TypeError):
+        SessionStore()
+
+
+async def test_create_and_get(store):
+    await store.create(make_session("s1"))
+
+    session = await store.get("s1")
+    assert session["_id"] == "s1"
+    assert session["email"] == "admin@example.ch"
+    assert isinstance(session["expiresAt"], datetime)
+    assert await store.get("unknown") is None
+
+
+async def test_get_skips_expired_session(store):
+    await store.create(make_session("s1"))
+    await store.create(make_session("old", expires_in=timedelta(milliseconds=50)))
+    # Past the expiry, but before a cleanup has run
+    await anyio.sleep(0.1)
+
+    assert await store.get("old") is None
+    assert await store.get("s1") is not None
+
+
+async def test_delete(store):
+    await store.create(make_session("s1"))
+
+    assert await store.delete("s1") is True
+    assert await store.get("s1") is None
+    assert await store.delete("s1") is False
+
+
+async def test_touch_many_updates_existing_sessions_only(store):
+    await store.create(make_session("s1"))
+    await store.create(make_session("s2"))
+
+    await store.touch_many({"s1": "2026-03-01T10:00:00+00:00", "gone": "2026-03-01T10:00:00+00:00"})
+
+    assert (await store.get("s1"))["lastActivity"] == "2026-03-01T10:00:00+00:00"
+    assert (await store.get("s2"))["lastActivity"] != "2026-03-01T10:00:00+00:00"
+    assert await store.get("gone") is None
+
+
+async def test_cleanup_expired_keeps_live_sessions(store):
+    await store.create(make_session("s1"))
+    await store.create(make_session("old", expires_in=timedelta(milliseconds=50)))
+    await anyio.sleep(0.1)
+
+    # Redis expires keys itself and reports nothing to clean up
+    expected = 0 if isinstance(store, RedisSessionStore) else 1
+    assert await store.cleanup_expired() == expected
+    assert await store.get("old") is None
+    assert await store.get("s1") is not None
+
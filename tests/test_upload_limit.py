@@ -0,0 +1,78 @@
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+import server
+
+
+LIMIT = 64 * 1024
+
+
+async def echo_upload(request):
+    form = await request.form()
+    data = await form["file"].read()
+    return JSONResponse({"name": form["file"].filename, "bytes": len(data), "alt_text": form.get("alt_text")})
+
+
+async def echo_body(request):
+    return JSONResponse({"bytes": len(await request.body())})
+
+
+def make_client() -> TestClient:
+    app = Starlette(routes=[
+        Route("/upload", echo_upload, methods=["POST"]),
+        Route("/body", echo_body, methods=["POST"]),
+        Route("/other", echo_body, methods=["POST"]),
+    ])
+    app.add_middleware(server.UploadSizeLimitMiddleware, limits={"/upload": LIMIT, "/body": LIMIT})
+    return TestClient(app)
+
+
+def chunks(total: int, size: int = 8 * 1024):
+    """Request body without Content-Length (sent with Transfer-Encoding: chunked)"""
+    for start in range(0, total, size):
+        yield b"x" * min(size, total - start)
+
+
+# ============================================
+# UPLOAD SIZE LIMIT
+# ============================================
+
+def test_upload_within_limit_passes_through_unchanged():
+    response = make_client().post(
+        "/upload",
+        files={"file": ("photo.jpg", b"\xff\xd8" + b"a" * 1000, "image/jpeg")},
+        data={"alt_text": "Team"}
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"name": "photo.jpg", "bytes": 1002, "alt_text": "Team"}
+
+
+def test_chunked_body_within_limit_passes_through():
+    response = make_client().post("/body", content=chunks(LIMIT))
+
+    assert response.status_code == 200
+    assert response.json() == {"bytes": LIMIT}
+
+
+def test_oversized_content_length_is_rejected_before_the_app_runs():
+    response = make_client().post("/upload", files={"file": ("big.jpg", b"a" * (LIMIT + 1), "image/jpeg")})
+
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Upload too large. Max 0.1MB"}
+
+
+def test_oversized_chunked_body_is_rejected_while_received():
+    response = make_client().post("/body", content=chunks(LIMIT * 4))
+
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Upload too large. Max 0.1MB"}
+
+
+def test_unlimited_paths_are_not_checked():
+    response = make_client().post("/other", content=b"x" * (LIMIT * 2))
+
+    assert response.status_code == 200
+    assert response.json() == {"bytes": LIMIT * 2}